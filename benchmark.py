@@ -0,0 +1,491 @@
+import argparse
+import gc
+import json
+import multiprocessing
+import os
+import platform
+import sys
+import tempfile
+import time
+
+# Qt penceresi açmadan ölçüm yapılabilmesi için türkline'dan önce ayarlanmalı
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+
+import türkline
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+
+USER_NAME = "Ölçüm"
+USER_PHONE = "+905550000000"
+
+
+def generate_history(contact_count, messages_per_contact, user_phone=USER_PHONE):
+    contacts = [(f"Kişi {i}", f"+90555{i + 1:07d}") for i in range(contact_count)]
+    messages = {}
+    for _, phone in contacts:
+        messages[phone] = [
+            {"sender": user_phone if j % 2 else phone, "text": f"Mesaj {j} " + "merhaba " * (j % 8)}
+            for j in range(messages_per_contact)
+        ]
+    return contacts, messages
+
+
+def use_workdir(workdir):
+    # Veriler geçici dizindeki ölçüm hesabının dizinine yazılır
+    os.chdir(workdir)
+    türkline.DATA_ROOT = os.path.join(workdir, "data")
+    return türkline.account_dir(USER_PHONE)
+
+
+def write_history(workdir, contact_count, messages_per_contact):
+    # Her backend ilk açılışta bu JSON snapshot'ı kendi biçimine aktarır
+    contacts, messages = generate_history(contact_count, messages_per_contact)
+    data = {"seq": 0, "contacts": contacts, "messages": messages}
+    path = os.path.join(use_workdir(workdir), türkline.DATA_FILE)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(data, f)
+
+
+def percentiles(samples):
+    ordered = sorted(samples)
+
+    def pick(q):
+        return round(ordered[min(len(ordered) - 1, int(q * len(ordered)))] * 1000, 3)
+
+    return {
+        "count": len(ordered),
+        "p50_ms": pick(0.50),
+        "p95_ms": pick(0.95),
+        "p99_ms": pick(0.99),
+        "max_ms": round(ordered[-1] * 1000, 3),
+    }
+
+
+def timed(func, repeat):
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        samples.append(time.perf_counter() - start)
+    return percentiles(samples)
+
+
+def peak_rss_mb():
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux KB, macOS byte döndürür
+    return round(peak / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+
+def current_rss_mb():
+    # Tepe değil o anki bellek; sadece Linux'ta /proc üzerinden okunabilir
+    try:
+        with open("/proc/self/statm") as f:
+            pages = int(f.read().split()[1])
+    except (OSError, IndexError, ValueError):
+        return None
+    return round(pages * os.sysconf("SC_PAGE_SIZE") / (1024 * 1024), 1)
+
+
+# ========== Helpers ==========
+def qt_app():
+    return türkline.QApplication.instance() or türkline.QApplication([])
+
+
+def open_window(app):
+    window = türkline.ChatUI(USER_NAME, USER_PHONE)
+    app.processEvents()
+    return window
+
+
+def close_window(app, window):
+    window.close()
+    app.processEvents()
+
+
+def contact_count(window):
+    return window.contact_model.rowCount()
+
+
+def select_row(window, row):
+    window.contact_list.setCurrentIndex(window.contact_model.index(row))
+
+
+class FakeAddContactDialog:
+    # AddContactDialog yerine geçer; her çağrıda yeni bir numara döndürür
+    counter = 0
+
+    def __init__(self):
+        FakeAddContactDialog.counter += 1
+        self.contact_name = f"Yeni Kişi {self.counter}"
+        self.contact_phone = f"+90599{self.counter:07d}"
+
+    def exec(self):
+        return türkline.QDialog.Accepted
+
+
+def patch_dialogs():
+    türkline.AddContactDialog = FakeAddContactDialog
+    türkline.QInputDialog.getText = staticmethod(lambda *args, **kwargs: (f"Düzenlendi {time.perf_counter()}", True))
+    türkline.QMessageBox.question = staticmethod(lambda *args, **kwargs: türkline.QMessageBox.Yes)
+    türkline.QMessageBox.warning = staticmethod(lambda *args, **kwargs: None)
+
+
+# ========== Scenarios ==========
+def bench_snapshot(args, app):
+    # Atomik snapshot (fsync + rename + yedek döndürme) ile eski doğrudan
+    # json.dump yazmasının ve mesaj başına journal ekleme maliyetinin karşılaştırması
+    contacts, messages = generate_history(args.contacts, args.messages)
+    data = {"seq": 1, "contacts": contacts, "messages": messages}
+    path = "snapshot.json"
+
+    def write_plain():
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(data, f, indent=4)
+
+    results = {"snapshot_plain": timed(write_plain, args.repeat)}
+
+    store = türkline.JsonStore(path)
+    results["snapshot_atomic"] = timed(lambda: store.write_snapshot(data), args.repeat)
+
+    store.load()
+    record = {"op": "message", "phone": contacts[0][1], "msg": {"sender": USER_PHONE, "text": "merhaba"}}
+    results["journal_append"] = timed(lambda: store.append(dict(record)), args.sends)
+    store.close()
+    results["file_bytes"] = os.path.getsize(path)
+    return results
+
+
+def bench_startup(args, app):
+    # İlk açılış (backend'e aktarma) ölçüme dahil edilmez
+    loader = türkline.StoreLoader(türkline.account_dir(USER_PHONE))
+    loader.run()
+    loader.result[0].close()
+
+    def load():
+        loader = türkline.StoreLoader(türkline.account_dir(USER_PHONE))
+        loader.run()
+        loader.result[0].close()
+
+    results = {"load": timed(load, args.repeat)}
+
+    samples = []
+    for _ in range(args.repeat):
+        start = time.perf_counter()
+        window = open_window(app)
+        samples.append(time.perf_counter() - start)
+        close_window(app, window)
+    results["window_open"] = percentiles(samples)
+    return results
+
+
+def bench_send(args, app):
+    window = open_window(app)
+    select_row(window, 0)
+
+    def send():
+        window.message_input.setText("Ölçüm mesajı merhaba")
+        window.send_message()
+        app.processEvents()
+
+    results = {"send": timed(send, args.sends)}
+    close_window(app, window)
+    return results
+
+
+def bench_switch(args, app):
+    window = open_window(app)
+    count = contact_count(window)
+    rows = iter(range(1, args.sends + 1))
+
+    def switch():
+        select_row(window, next(rows) % count)
+        app.processEvents()
+
+    results = {"switch": timed(switch, args.sends)}
+    close_window(app, window)
+    return results
+
+
+def bench_filter(args, app):
+    # Kişi filtresine harf harf yazma; her tuş bir ölçüm (büyük listeler için --contacts 100000)
+    window = open_window(app)
+    query = f"kişi {args.contacts // 2}"
+    samples = []
+    for _ in range(args.repeat):
+        for end in range(1, len(query) + 1):
+            start = time.perf_counter()
+            window.contact_filter.setText(query[:end])
+            app.processEvents()
+            samples.append(time.perf_counter() - start)
+        start = time.perf_counter()
+        window.contact_filter.clear()
+        app.processEvents()
+        samples.append(time.perf_counter() - start)
+    results = {"keystroke": percentiles(samples), "contacts": contact_count(window)}
+    close_window(app, window)
+    return results
+
+
+def bench_contacts(args, app):
+    patch_dialogs()
+    window = open_window(app)
+
+    def add():
+        window.add_contact()
+        app.processEvents()
+
+    def edit():
+        select_row(window, contact_count(window) - 1)
+        window.edit_contact()
+        app.processEvents()
+
+    def delete():
+        select_row(window, contact_count(window) - 1)
+        window.delete_contact()
+        app.processEvents()
+
+    results = {
+        "add": timed(add, args.sends),
+        "edit": timed(edit, args.sends),
+        "delete": timed(delete, args.sends),
+    }
+    close_window(app, window)
+    return results
+
+
+def bench_dialogs(args, app):
+    # Diyaloğun oluşturulup ilk kez çizilmesine kadar geçen süre
+    window = open_window(app)
+    results = {}
+    for name, dialog_class in (("login", türkline.LoginDialog), ("add_contact", türkline.AddContactDialog)):
+        def open_dialog():
+            dialog = dialog_class()
+            dialog.show()
+            app.processEvents()
+            dialog.close()
+
+        results[name] = timed(open_dialog, args.sends)
+    close_window(app, window)
+    return results
+
+
+def bench_memory(args, app):
+    # Tüm geçmiş RAM'e alındığında mesaj başına düşen bellek
+    gc.collect()
+    before = current_rss_mb()
+    store = türkline.create_store(türkline.account_dir(USER_PHONE))
+    contacts, messages = store.load()
+    total = sum(len(messages[phone]) for phone in list(messages))
+    gc.collect()
+    after = current_rss_mb()
+    results = {"messages": total, "rss_before_mb": before, "rss_loaded_mb": after}
+    if before is not None and total:
+        results["bytes_per_message"] = round((after - before) * 1024 * 1024 / total, 1)
+    store.close()
+    return results
+
+
+def bench_save(args, app):
+    # Tam snapshot (sıkıştırma) işçi thread'inde bitene kadar geçen süre
+    window = open_window(app)
+    select_row(window, 0)
+
+    def save():
+        window.message_input.setText("kaydet")
+        window.send_message()
+        window.save_messages()
+        window.persistence.flush()
+
+    results = {"save": timed(save, args.repeat)}
+    close_window(app, window)
+    return results
+
+
+def bench_scrollback(args, app):
+    # Bir sohbette en başa kadar sayfa sayfa kaydırma. Önce bir sıkıştırma ile
+    # eski mesajlar arşive taşınır (--messages TURKLINE_HOT_MESSAGES'tan büyükse);
+    # sıcak pencere bitince sayfalar arşiv segmentlerinden okunur.
+    window = open_window(app)
+    select_row(window, 1)
+    window.message_input.setText("arşivle")
+    window.send_message()
+    window.save_messages()
+    window.persistence.flush()
+    select_row(window, 1)  # gönderilen mesajla en üste çıkan kişiden bir önceki
+    model = window.chat_area.message_model
+    archived = model.archived
+    samples = []
+    while model.has_older():
+        start = time.perf_counter()
+        model.load_older()
+        app.processEvents()
+        samples.append(time.perf_counter() - start)
+    results = {"archived": archived, "rows": model.rowCount()}
+    if samples:
+        results["page"] = percentiles(samples)
+    close_window(app, window)
+    return results
+
+
+def bench_sync(args, app):
+    # Cihaz eşitleme: tüm geçmişin paketlenip boş bir cihaza alınması, --sends
+    # yeni mesajın farkının paketlenip alınması ve aynı farkın ikinci kez alınması
+    # (hiçbir şey eklenmemeli). Eş kendi hesap dizininde ayrı bir store'dur.
+    directory = türkline.account_dir(USER_PHONE)
+    store = türkline.create_store(directory)
+    contacts, messages = store.load()
+    state = türkline.SyncState(directory).load()
+    endpoint = türkline.SyncEndpoint(USER_PHONE, state, store, contacts, messages, store.append_many)
+    peer_directory = os.path.abspath("eş")
+    os.makedirs(peer_directory, exist_ok=True)
+    peer_store = türkline.create_store(peer_directory)
+    peer_contacts, peer_messages = peer_store.load()
+    peer = türkline.SyncEndpoint(USER_PHONE, türkline.SyncState(peer_directory).load(), peer_store,
+                                 peer_contacts, peer_messages, peer_store.append_many)
+
+    counts = []
+    results = {"full_export": timed(lambda: counts.append(türkline.write_sync_bundle("full.tlsync", endpoint)),
+                                    args.repeat)}
+    results["full_messages"] = counts[-1]
+    results["full_bytes"] = os.path.getsize("full.tlsync")
+    merged = []
+    results["full_import"] = timed(lambda: merged.append(türkline.read_sync_bundle("full.tlsync", peer)), 1)
+    results["full_merged"] = merged[-1]
+
+    # Eşin bir sonraki bağlantıda "since" ile bildireceği filigranlar
+    state.peer(peer.state.device)["acked"] = dict(peer.state.peer(state.device)["received"])
+    _, phone = next(iter(contacts))
+    records = []
+    for i in range(args.sends):
+        msg = {"sender": USER_PHONE, "text": f"eşitle {i}", "timestamp": time.time(), "id": türkline.new_message_id()}
+        messages[phone].append(msg)
+        contacts.note_message(phone, msg)
+        records.append({"op": "message", "phone": phone, "msg": msg})
+    store.append_many(records)
+
+    counts = []
+    results["delta_export"] = timed(
+        lambda: counts.append(türkline.write_sync_bundle("delta.tlsync", endpoint, peer.state.device)), args.repeat
+    )
+    results["delta_messages"] = counts[-1]
+    results["delta_bytes"] = os.path.getsize("delta.tlsync")
+    merged = []
+    results["delta_import"] = timed(lambda: merged.append(türkline.read_sync_bundle("delta.tlsync", peer)), 1)
+    results["delta_reimport"] = timed(lambda: merged.append(türkline.read_sync_bundle("delta.tlsync", peer)),
+                                      args.repeat)
+    results["delta_merged"] = merged[0]
+    results["reimport_merged"] = sum(merged[1:])
+    results["peer_in_sync"] = all(
+        len(peer_messages.get(phone, ())) == len(messages[phone]) for _, phone in contacts
+    )
+    peer_store.close()
+    store.close()
+    return results
+
+
+SCENARIOS = {
+    "snapshot": bench_snapshot,
+    "startup": bench_startup,
+    "send": bench_send,
+    "switch": bench_switch,
+    "contacts": bench_contacts,
+    "filter": bench_filter,
+    "dialogs": bench_dialogs,
+    "save": bench_save,
+    "scrollback": bench_scrollback,
+    "sync": bench_sync,
+    "memory": bench_memory,
+}
+
+
+def prepare_store(args, workdir):
+    # binary/sqlite ilk açılışta JSON geçmişini aktarır; bu iş ayrı bir süreçte
+    # yapılır ki senaryonun tepe belleğine karışmasın
+    türkline.STORAGE_BACKEND = args["backend"]
+    store = türkline.create_store(use_workdir(workdir))
+    store.load()
+    store.close()
+
+
+def run_scenario(name, args, workdir):
+    # Her senaryo temiz bir süreçte çalışır, böylece tepe bellek senaryoya aittir.
+    # Sentetik geçmiş ve backend'e aktarma önceki görevlerde yapılır, maliyetleri ölçüme karışmaz.
+    args = argparse.Namespace(**args)
+    türkline.STORAGE_BACKEND = args.backend
+    use_workdir(workdir)
+    app = qt_app()
+    baseline = peak_rss_mb()
+    results = SCENARIOS[name](args, app)
+    results["baseline_rss_mb"] = baseline
+    results["peak_rss_mb"] = peak_rss_mb()
+    return results
+
+
+# ========== Report ==========
+def print_report(report, baseline=None):
+    for scenario, results in report["results"].items():
+        print(f"== {scenario}")
+        for name, value in results.items():
+            if isinstance(value, dict):
+                stats = "  ".join(f"{k}={v}" for k, v in value.items())
+                old = (baseline or {}).get("results", {}).get(scenario, {}).get(name)
+                if isinstance(old, dict) and old.get("p50_ms"):
+                    stats += f"  (p50 {value['p50_ms'] / old['p50_ms']:.2f}x)"
+                print(f"  {name:<20} {stats}")
+            else:
+                print(f"  {name:<20} {value}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Türkline kalıcılık ve arayüz ölçümleri")
+    parser.add_argument("scenarios", nargs="*",
+                        help=f"çalıştırılacak senaryolar: {', '.join(SCENARIOS)} (varsayılan: hepsi)")
+    parser.add_argument("--backend", default=türkline.STORAGE_BACKEND, choices=["json", "binary", "sqlite", "sharded"])
+    parser.add_argument("--contacts", type=int, default=50)
+    parser.add_argument("--messages", type=int, default=1000, help="kişi başına mesaj sayısı")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--sends", type=int, default=200)
+    parser.add_argument("--json", dest="json_path", help="sonuçları bu dosyaya JSON olarak yaz")
+    parser.add_argument("--compare", help="önceki bir --json çıktısıyla karşılaştır")
+    args = parser.parse_args(argv)
+    unknown = [name for name in args.scenarios if name not in SCENARIOS]
+    if unknown:
+        parser.error(f"bilinmeyen senaryo: {', '.join(unknown)}")
+
+    params = {name: value for name, value in vars(args).items() if name not in ("scenarios", "json_path", "compare")}
+    report = {
+        "time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "params": params,
+        "results": {},
+    }
+    context = multiprocessing.get_context("spawn")
+    for scenario in args.scenarios or list(SCENARIOS):
+        with tempfile.TemporaryDirectory() as workdir, context.Pool(1, maxtasksperchild=1) as pool:
+            # Her görev yeni bir süreçte çalışır (maxtasksperchild=1); üst süreç küçük
+            # kalır, böylece fork edilen süreçler onun tepe belleğini devralmaz
+            pool.apply(write_history, (workdir, args.contacts, args.messages))
+            if args.backend != "json":
+                pool.apply(prepare_store, (params, workdir))
+            report["results"][scenario] = pool.apply(run_scenario, (scenario, params, workdir))
+
+    baseline = None
+    if args.compare:
+        with open(args.compare, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+    print_report(report, baseline)
+    if args.json_path:
+        with open(args.json_path, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=4)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
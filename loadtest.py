@@ -0,0 +1,286 @@
+import argparse
+import asyncio
+import json
+import multiprocessing
+import os
+import platform
+import random
+import socket
+import subprocess
+import sys
+import time
+
+import türkline
+from benchmark import percentiles
+
+
+# Simüle edilen istemciler türkline.py'deki çerçeveleme ve mesaj biçimini
+# ({"sender", "text"}) aynen kullanır. Metin alanı ölçüm verisini taşır:
+#   "<çalıştırma>:<gönderen index>:<sıra>:<monotonic ns>"
+# Gecikme aynı makinedeki süreçler arasında ortak olan monotonic saatle ölçülür.
+FANOUT_PATTERNS = ("pair", "random", "group")
+CONNECT_CONCURRENCY = 200
+
+
+def phone_of(index):
+    return f"+90599{index:07d}"
+
+
+def targets_of(index, args):
+    if args["fanout"] == "pair":
+        partner = index ^ 1
+        return [partner if partner < args["clients"] else 0]
+    if args["fanout"] == "random":
+        target = random.randrange(args["clients"] - 1)
+        return [target + 1 if target >= index else target]
+    # group: ardışık index'lerden oluşan gruplarda herkes herkese yazar
+    start = index - index % args["group_size"]
+    return [i for i in range(start, min(start + args["group_size"], args["clients"])) if i != index]
+
+
+class SimClient(asyncio.Protocol):
+    def __init__(self, worker, index):
+        self.worker = worker
+        self.index = index
+        self.phone = phone_of(index)
+        self.decoder = türkline.FrameDecoder()
+        self.transport = None
+        self.next_seq = 0
+        self.acked = 0  # alıcının kaydettiği ("delivered") mesajlar
+        self.seen = set()
+        self.closing = False
+
+    def connection_made(self, transport):
+        self.transport = transport
+        # Aynı numara yeniden bağlanabilsin diye token numaradan türetilir
+        token = türkline.token_digest(f"loadtest:{self.phone}")
+        hello = {"type": "hello", "phone": self.phone, "token": token}
+        transport.write(türkline.encode_frame(hello))
+
+    def data_received(self, data):
+        now = time.monotonic_ns()
+        worker = self.worker
+        last_ref = None
+        for frame in self.decoder.feed(data):
+            kind = frame.get("type")
+            if kind == "delivered":
+                self.acked += len(frame["ids"])
+            elif kind == "msg":
+                last_ref = frame["ref"]
+                run, sender, seq, sent_ns = frame["msg"]["text"].split(":")
+                if run != worker.run_id:
+                    worker.stale += 1  # önceki bir çalıştırmadan sunucuda bekleyen mesaj
+                    continue
+                key = (sender, seq)
+                if key in self.seen:
+                    worker.duplicates += 1
+                    continue
+                self.seen.add(key)
+                worker.received += 1
+                worker.latencies.append((now - int(sent_ns)) / 1e9)
+        if last_ref is not None:
+            # Simüle edilen istemci mesajları hemen "kaydetmiş" sayılır
+            self.transport.write(türkline.encode_frame({"type": "ack", "upto": last_ref}))
+
+    def connection_lost(self, exc):
+        if not self.closing:
+            self.worker.disconnected += 1
+
+    def send(self, args):
+        self.next_seq += 1
+        text = f"{self.worker.run_id}:{self.index}:{self.next_seq}:{time.monotonic_ns()}"
+        frames = []
+        for target in targets_of(self.index, args):
+            frames.append(türkline.encode_frame({
+                "type": "msg", "to": phone_of(target),
+                "msg": {"sender": self.phone, "text": text, "id": türkline.new_message_id()},
+            }))
+        self.transport.write(b"".join(frames))
+        self.worker.sent += len(frames)
+
+
+class Worker:
+    # Bir süreçteki istemcilerin hepsi tek bir asyncio döngüsünde çalışır
+    def __init__(self, args, first, count):
+        self.args = args
+        self.run_id = args["run_id"]
+        self.indexes = range(first, first + count)
+        self.clients = []
+        self.connect_errors = 0
+        self.disconnected = 0
+        self.sent = 0
+        self.received = 0
+        self.duplicates = 0
+        self.stale = 0
+        self.latencies = []
+
+    async def connect(self, index, limit):
+        host, port = türkline.parse_address(self.args["address"])
+        async with limit:
+            try:
+                _, client = await asyncio.get_running_loop().create_connection(
+                    lambda: SimClient(self, index), host, port
+                )
+            except OSError:
+                self.connect_errors += 1
+                return
+        self.clients.append(client)
+
+    async def drive(self, client, start, stop):
+        loop = asyncio.get_running_loop()
+        interval = 1 / self.args["rate"]
+        # Gönderimler aynı ana yığılmasın diye her istemci rastgele bir fazla başlar
+        await asyncio.sleep(max(0.0, start - time.time()) + random.random() * interval)
+        next_at = loop.time()
+        while time.time() < stop and not client.transport.is_closing():
+            client.send(self.args)
+            next_at += interval
+            await asyncio.sleep(max(0.0, next_at - loop.time()))
+
+    async def run(self):
+        limit = asyncio.Semaphore(CONNECT_CONCURRENCY)
+        await asyncio.gather(*(self.connect(index, limit) for index in self.indexes))
+        start = self.args["start_at"]
+        late = time.time() > start
+        stop = start + self.args["duration"]
+        await asyncio.gather(*(self.drive(client, start, stop) for client in self.clients))
+        await asyncio.sleep(max(0.0, stop + self.args["drain"] - time.time()))
+
+        acked = sum(client.acked for client in self.clients)
+        for client in self.clients:
+            client.closing = True
+            client.transport.close()
+        return {
+            "clients": len(self.indexes),
+            "connected": len(self.clients),
+            "connect_errors": self.connect_errors,
+            "late_start": late,
+            "disconnected": self.disconnected,
+            "sent": self.sent,
+            "acked": acked,
+            "received": self.received,
+            "duplicates": self.duplicates,
+            "stale": self.stale,
+            "latencies": self.latencies,
+        }
+
+
+def run_worker(args, first, count):
+    return asyncio.run(Worker(args, first, count).run())
+
+
+# ========== Server ==========
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def spawn_server(port):
+    script = os.path.join(os.path.dirname(os.path.abspath(__file__)), "türkline.py")
+    server = subprocess.Popen([sys.executable, script, "relay", "--port", str(port)])
+    deadline = time.time() + 10
+    while time.time() < deadline:
+        try:
+            socket.create_connection(("127.0.0.1", port), timeout=0.2).close()
+            return server
+        except OSError:
+            time.sleep(0.05)
+    server.kill()
+    raise RuntimeError("aktarma sunucusu başlatılamadı")
+
+
+# ========== Report ==========
+def summarize(results, args):
+    total = {key: sum(result[key] for result in results)
+             for key in ("clients", "connected", "connect_errors", "disconnected",
+                         "sent", "acked", "received", "duplicates", "stale")}
+    latencies = [latency for result in results for latency in result["latencies"]]
+    total["dropped"] = total["sent"] - total["received"]
+    total["send_rate_per_s"] = round(total["sent"] / args["duration"], 1)
+    total["delivery_rate_per_s"] = round(total["received"] / args["duration"], 1)
+    total["late_workers"] = sum(1 for result in results if result["late_start"])
+    if latencies:
+        total["latency"] = percentiles(latencies)
+    return total
+
+
+def print_summary(summary):
+    for name, value in summary.items():
+        if isinstance(value, dict):
+            value = "  ".join(f"{k}={v}" for k, v in value.items())
+        print(f"  {name:<22} {value}")
+    if summary["late_workers"]:
+        print("  uyarı: bazı süreçler bağlantıları başlangıç anına kadar kuramadı; --setup süresini artırın")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Türkline aktarma sunucusu yük testi")
+    parser.add_argument("--address", help="HOST:PORT; verilmezse yerelde bir sunucu başlatılır")
+    parser.add_argument("--clients", type=int, default=1000)
+    parser.add_argument("--processes", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--rate", type=float, default=1.0, help="istemci başına saniyede mesaj")
+    parser.add_argument("--duration", type=float, default=10.0, help="gönderim süresi (sn)")
+    parser.add_argument("--fanout", default="pair", choices=FANOUT_PATTERNS)
+    parser.add_argument("--group-size", type=int, default=5, help="--fanout group için grup büyüklüğü")
+    parser.add_argument("--setup", type=float, default=5.0, help="bağlantıların kurulması için süre (sn)")
+    parser.add_argument("--drain", type=float, default=2.0, help="gönderim bittikten sonra teslimat bekleme süresi (sn)")
+    parser.add_argument("--json", dest="json_path", help="sonuçları bu dosyaya JSON olarak yaz")
+    args = parser.parse_args(argv)
+    if args.clients < 2:
+        parser.error("en az 2 istemci gerekli")
+    if args.rate <= 0:
+        parser.error("--rate pozitif olmalı")
+
+    server = None
+    address = args.address
+    if address is None:
+        port = free_port()
+        server = spawn_server(port)
+        address = f"127.0.0.1:{port}"
+
+    processes = max(1, min(args.processes, args.clients))
+    params = {
+        "address": address,
+        "clients": args.clients,
+        "rate": args.rate,
+        "duration": args.duration,
+        "fanout": args.fanout,
+        "group_size": max(2, args.group_size),
+        "drain": args.drain,
+        "run_id": os.urandom(4).hex(),
+        "start_at": time.time() + args.setup,
+    }
+    share, extra = divmod(args.clients, processes)
+    jobs = []
+    first = 0
+    for i in range(processes):
+        count = share + (1 if i < extra else 0)
+        jobs.append((params, first, count))
+        first += count
+
+    try:
+        with multiprocessing.get_context("spawn").Pool(processes) as pool:
+            results = pool.starmap(run_worker, jobs)
+    finally:
+        if server is not None:
+            server.terminate()
+            server.wait()
+
+    summary = summarize(results, params)
+    print(f"== {args.clients} istemci, {processes} süreç, {args.fanout}, {args.rate}/sn, {args.duration} sn -> {address}")
+    print_summary(summary)
+    if args.json_path:
+        report = {
+            "time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "params": {key: value for key, value in params.items() if key not in ("run_id", "start_at")},
+            "results": summary,
+        }
+        with open(args.json_path, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=4)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,57 @@
+import os
+import sys
+
+import pytest
+
+# Testler pencere açmaz; Qt türkline import edilmeden önce ayarlanmalı
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import türkline  # noqa: E402
+
+
+@pytest.fixture(autouse=True)
+def default_backend(monkeypatch):
+    # TURKLINE_STORAGE ortam değişkeni testleri etkilemez
+    monkeypatch.setattr(türkline, "STORAGE_BACKEND", "json")
+
+
+@pytest.fixture(params=["json", "binary", "sqlite", "sharded"])
+def backend(request, monkeypatch):
+    monkeypatch.setattr(türkline, "STORAGE_BACKEND", request.param)
+    return request.param
+
+
+@pytest.fixture
+def open_store(tmp_path, monkeypatch):
+    # Açılan store'lar test sonunda kapatılır; close tekrar çağrılabilir
+    stores = []
+
+    def open_store(directory=tmp_path, backend=None):
+        if backend is not None:
+            monkeypatch.setattr(türkline, "STORAGE_BACKEND", backend)
+        os.makedirs(directory, exist_ok=True)
+        store = türkline.create_store(str(directory))
+        contacts, messages = store.load()
+        stores.append(store)
+        return store, contacts, messages
+
+    yield open_store
+    for store in stores:
+        store.close()
+
+
+@pytest.fixture
+def add():
+    # Arayüzün yaptığı gibi: önce bellekte uygula, sonra store'a yaz
+    def add(store, contacts, messages, records):
+        for record in records:
+            türkline.apply_record(contacts, messages, dict(record))
+        store.append_many(records)
+
+    return add
+
+
+@pytest.fixture(scope="session")
+def qapp():
+    return türkline.QApplication.instance() or türkline.QApplication([])
@@ -0,0 +1,46 @@
+import os
+import subprocess
+import sys
+
+import türkline
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def acquire_in_child(directory):
+    code = "import sys, türkline; print(türkline.AccountLock(sys.argv[1]).acquire())"
+    result = subprocess.run(
+        [sys.executable, "-c", code, str(directory)],
+        cwd=ROOT, capture_output=True, text=True, encoding="utf-8", timeout=60, check=True,
+    )
+    return result.stdout.strip()
+
+
+def test_second_lock_fails_until_release(tmp_path):
+    first = türkline.AccountLock(str(tmp_path))
+    second = türkline.AccountLock(str(tmp_path))
+    assert first.acquire()
+    try:
+        assert not second.acquire()
+    finally:
+        first.release()
+    assert second.acquire()
+    second.release()
+
+
+def test_lock_is_held_against_other_processes(tmp_path):
+    lock = türkline.AccountLock(str(tmp_path))
+    assert lock.acquire()
+    try:
+        assert acquire_in_child(tmp_path) == "False"
+    finally:
+        lock.release()
+    assert acquire_in_child(tmp_path) == "True"
+
+
+def test_release_without_acquire_is_harmless(tmp_path):
+    lock = türkline.AccountLock(str(tmp_path / "hesap"))
+    lock.release()
+    assert lock.acquire()
+    assert os.path.exists(lock.path)
+    lock.release()
@@ -0,0 +1,86 @@
+import threading
+import time
+
+import pytest
+
+import türkline
+
+ACCOUNT = "+905550000000"
+PHONE = "+905551112233"
+COUNT = 1400
+
+
+# Arşiv sadece snapshot tutan store'larda var
+@pytest.fixture(params=["json", "binary"])
+def backend(request, monkeypatch):
+    monkeypatch.setattr(türkline, "STORAGE_BACKEND", request.param)
+    return request.param
+
+
+def fill(store, contacts, messages, add):
+    start = time.time() - (türkline.ARCHIVE_AFTER_DAYS + 30) * 86400
+    records = [{"op": "add_contact", "name": "Ali", "phone": PHONE}]
+    records += [
+        {"op": "message", "phone": PHONE, "msg": {"sender": PHONE, "text": f"mesaj {i}", "timestamp": start + i}}
+        for i in range(COUNT)
+    ]
+    add(store, contacts, messages, records)
+    msgs = messages[PHONE]
+    return [msgs.message_id(i) for i in range(len(msgs))]
+
+
+def test_old_messages_move_to_archive(backend, open_store, add):
+    store, contacts, messages = open_store()
+    ids = fill(store, contacts, messages, add)
+    store.compact(store.prepare_compact(contacts, messages))
+    archived = messages[PHONE].archived
+    # Son sayfa her zaman sıcak kalır
+    assert archived == COUNT - türkline.MESSAGE_PAGE_SIZE
+    store.close()
+
+    store, contacts, messages = open_store()
+    msgs = messages[PHONE]
+    assert msgs.archived == archived
+    assert len(msgs) == COUNT - archived
+    assert msgs[0]["text"] == f"mesaj {archived}"
+
+    # Arşivin son segmenti, sıcak kısmın hemen öncesi
+    first, chunk = store.archive.read(PHONE, archived)
+    assert first == türkline.ARCHIVE_SEGMENT_MESSAGES
+    assert [msg["text"] for msg in chunk] == [f"mesaj {i}" for i in range(first, archived)]
+
+    # Eşleme arşiv ve sıcak kısmı birlikte, aynı kimliklerle döndürür
+    records = store.messages_since(messages, PHONE, 0)
+    assert [record["text"] for record in records] == [f"mesaj {i}" for i in range(COUNT)]
+    assert [record["seq"] for record in records] == list(range(1, COUNT + 1))
+    assert [record["id"] for record in records] == ids
+    assert [msgs.message_id(i) for i in range(len(msgs))] == ids[archived:]
+    store.close()
+
+
+def test_open_conversation_is_not_archived(backend, open_store, add):
+    store, contacts, messages = open_store()
+    fill(store, contacts, messages, add)
+    store.compact(store.prepare_compact(contacts, messages, keep={PHONE}))
+    assert messages[PHONE].archived == 0
+    assert len(messages[PHONE]) == COUNT
+    store.close()
+
+
+def test_sync_delta_waits_for_pending_compaction(backend, open_store, add, tmp_path):
+    store, contacts, messages = open_store(tmp_path / "hesap")
+    fill(store, contacts, messages, add)
+    worker = türkline.PersistenceWorker(store, debounce_ms=0)
+    worker.start()
+    # Arşiv yazımı gecikir: baş GUI thread'inde çıkarıldı ama henüz diskte değil
+    release = threading.Event()
+    compact = store.compact
+    store.compact = lambda job: release.wait(5) and compact(job)
+    worker.request_compact(contacts, messages)
+    assert messages[PHONE].archived > 0
+    threading.Timer(0.1, release.set).start()
+
+    endpoint = türkline.SyncEndpoint(ACCOUNT, türkline.SyncState(str(tmp_path)).load(), store, contacts, messages,
+                                     worker.submit_many, worker.flush)
+    assert türkline.write_sync_bundle(str(tmp_path / "paket.tlsync"), endpoint) == COUNT
+    worker.stop()
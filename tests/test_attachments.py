@@ -0,0 +1,53 @@
+import hashlib
+import os
+
+import türkline
+
+
+def write(path, data):
+    with open(path, "wb") as f:
+        f.write(data)
+    return str(path)
+
+
+def test_same_content_is_stored_once(tmp_path):
+    store = türkline.AttachmentStore(str(tmp_path / "ekler"))
+    data = os.urandom(3 * türkline.ATTACHMENT_CHUNK + 7)
+    first = store.add(write(tmp_path / "rapor.bin", data))
+    second = store.add(write(tmp_path / "kopya.bin", data))
+    digest = hashlib.sha256(data).hexdigest()
+    assert first == {"sha256": digest, "name": "rapor.bin", "size": len(data), "mime": "application/octet-stream"}
+    assert second["sha256"] == digest and second["name"] == "kopya.bin"
+    blobs = [name for _, _, names in os.walk(store.path) for name in names]
+    assert blobs == [digest]
+
+    store.export(digest, str(tmp_path / "dışa.bin"))
+    with open(tmp_path / "dışa.bin", "rb") as f:
+        assert f.read() == data
+
+
+def test_image_size_and_cached_thumbnail(qapp, tmp_path):
+    image = türkline.QImage(800, 400, türkline.QImage.Format_RGB32)
+    image.fill(türkline.QColor("#2980B9"))
+    source = str(tmp_path / "resim.png")
+    assert image.save(source, "PNG")
+    store = türkline.AttachmentStore(str(tmp_path / "ekler"))
+    attachment = store.add(source)
+    assert attachment["mime"] == "image/png"
+    assert (attachment["width"], attachment["height"]) == (800, 400)
+
+    thumbnail = store.thumbnail(attachment["sha256"])
+    assert max(thumbnail.width(), thumbnail.height()) == türkline.THUMBNAIL_SIZE
+    # İkinci istek disk önbelleğinden gelir
+    assert os.path.exists(store.thumbnail_path(attachment["sha256"]))
+    assert store.thumbnail(attachment["sha256"]).size() == thumbnail.size()
+
+
+def test_received_attachment_is_sanitized():
+    digest = "ab" * 32
+    assert türkline.received_attachment({"sha256": "../../etc/passwd"}) is None
+    assert türkline.received_attachment("yok") is None
+    attachment = türkline.received_attachment(
+        {"sha256": digest, "name": "a.png", "size": True, "mime": 5, "width": 10, "height": 0, "fazla": 1})
+    # Geçersiz alanlar atılır; boyutlardan biri geçersizse ikisi de atılır
+    assert attachment == {"sha256": digest, "name": "a.png"}
@@ -0,0 +1,63 @@
+import os
+
+import pytest
+
+import türkline
+
+PHONE = "+905551112233"
+
+
+@pytest.fixture(autouse=True)
+def binary(monkeypatch):
+    monkeypatch.setattr(türkline, "STORAGE_BACKEND", "binary")
+
+
+def message(text):
+    return {"op": "message", "phone": PHONE, "msg": {"sender": PHONE, "text": text, "timestamp": 1.0}}
+
+
+def write_two_snapshots(open_store, add):
+    store, contacts, messages = open_store()
+    add(store, contacts, messages, [{"op": "add_contact", "name": "Ali", "phone": PHONE}, message("bir")])
+    store.compact(store.prepare_compact(contacts, messages))
+    add(store, contacts, messages, [message("iki")])
+    store.compact(store.prepare_compact(contacts, messages))
+    store.close()
+    return store.path
+
+
+def corrupt_trailer(path):
+    with open(path, "r+b") as f:
+        f.seek(-len(türkline.BINARY_TRAILER_MAGIC), os.SEEK_END)
+        f.write(b"BOZUK\x00\x00\x00")
+
+
+def test_bad_trailer_is_rejected(open_store, add):
+    path = write_two_snapshots(open_store, add)
+    corrupt_trailer(path)
+    with pytest.raises(ValueError, match="snapshot sonu eksik"):
+        türkline.BinarySnapshot(path)
+
+
+def test_truncated_snapshot_is_rejected(open_store, add):
+    path = write_two_snapshots(open_store, add)
+    with open(path, "r+b") as f:
+        f.truncate(os.path.getsize(path) - 5)
+    with pytest.raises(ValueError):
+        türkline.BinarySnapshot(path)
+
+    open(path, "wb").close()
+    with pytest.raises(ValueError, match="boş dosya"):
+        türkline.BinarySnapshot(path)
+
+
+def test_bad_trailer_falls_back_to_backup(open_store, add):
+    path = write_two_snapshots(open_store, add)
+    corrupt_trailer(path)
+
+    store, contacts, messages = open_store()
+    # Yedek ilk sıkıştırmadan; "iki" saklanan journal segmentinden geri gelir
+    assert list(contacts) == [("Ali", PHONE)]
+    assert [msg["text"] for msg in messages[PHONE]] == ["bir", "iki"]
+    assert any("yedekten kurtarıldı" in warning for warning in store.load_warnings)
+    store.close()
@@ -0,0 +1,67 @@
+import türkline
+
+
+def registry(*entries):
+    contacts = türkline.ContactRegistry()
+    for name, phone in entries:
+        contacts.add(name, phone)
+    return contacts
+
+
+def shown(model):
+    return [model.data(model.index(row), türkline.PHONE_ROLE) for row in range(model.rowCount())]
+
+
+def test_filter_folds_turkish_case_and_matches_numbers(qapp):
+    model = türkline.ContactListModel(registry(
+        ("IŞIL Yılmaz", "+905551112233"),
+        ("İsmail Kaya", "+905554445566"),
+        ("Ilgaz", "+905557778899"),
+    ))
+    model.set_filter("ışıl")
+    assert shown(model) == ["+905551112233"]
+    model.set_filter("İSMAİL")
+    assert shown(model) == ["+905554445566"]
+    # Numara boşluk ve parantezle yazılsa da eşleşir
+    model.set_filter("(555) 777")
+    assert shown(model) == ["+905557778899"]
+    model.set_filter("")
+    assert shown(model) == ["+905551112233", "+905554445566", "+905557778899"]
+    assert not model.filtered()
+
+
+def test_typing_narrows_previous_matches(qapp):
+    model = türkline.ContactListModel(registry(("Ayşe", "+905551112233"), ("Ayla", "+905554445566")))
+    model.set_filter("ay")
+    assert shown(model) == ["+905551112233", "+905554445566"]
+    model.set_filter("ayş")
+    assert shown(model) == ["+905551112233"]
+    # Silinince tüm kişiler yeniden taranır
+    model.set_filter("a")
+    assert shown(model) == ["+905551112233", "+905554445566"]
+
+
+def test_changes_while_filtered_keep_rows_in_sync(qapp):
+    contacts = registry(("Ali", "+905551112233"), ("Veli", "+905554445566"))
+    model = türkline.ContactListModel(contacts)
+    model.set_filter("li")
+    assert shown(model) == ["+905551112233", "+905554445566"]
+
+    contacts.add("Selin", "+905557778899")
+    model.insert_contact("+905557778899")
+    assert shown(model) == ["+905551112233", "+905554445566", "+905557778899"]
+    contacts.add("Ayşe", "+905550000000")
+    model.insert_contact("+905550000000")
+    assert "+905550000000" not in shown(model)
+
+    # Yeniden adlandırılan kişi filtreden çıkar, eşleşen ad alan kişi girer
+    contacts.rename("+905554445566", "Mehmet")
+    model.refresh_contact("+905554445566")
+    contacts.rename("+905550000000", "Alime")
+    model.refresh_contact("+905550000000")
+    assert shown(model) == ["+905551112233", "+905557778899", "+905550000000"]
+
+    model.remove_contact("+905551112233")
+    assert shown(model) == ["+905557778899", "+905550000000"]
+    model.set_filter("")
+    assert shown(model) == ["+905554445566", "+905557778899", "+905550000000"]
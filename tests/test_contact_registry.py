@@ -0,0 +1,43 @@
+import türkline
+
+ALI = "+905551112233"
+AYSE = "+905554445566"
+MEHMET = "+905557778899"
+
+
+def test_registry_keeps_order_through_edits():
+    contacts = türkline.ContactRegistry([("Ali", ALI), ("Ayşe", AYSE)])
+    contacts.add("Mehmet", MEHMET)
+    contacts.rename(AYSE, "Ayşe Yılmaz")
+    contacts.rename("+900000000000", "Yok")  # bilinmeyen numara eklenmez
+    assert list(contacts) == [("Ali", ALI), ("Ayşe Yılmaz", AYSE), ("Mehmet", MEHMET)]
+    assert contacts.name(AYSE) == "Ayşe Yılmaz"
+    assert "+900000000000" not in contacts
+
+    contacts.remove(ALI)
+    contacts.remove(ALI)
+    assert list(contacts) == [("Ayşe Yılmaz", AYSE), ("Mehmet", MEHMET)]
+    assert len(contacts) == 2 and ALI not in contacts
+
+
+def test_records_are_applied_by_phone():
+    contacts, messages = türkline.ContactRegistry(), {}
+    for record in [
+        {"op": "add_contact", "name": "Ali", "phone": ALI},
+        {"op": "add_contact", "name": "Ayşe", "phone": AYSE},
+        {"op": "message", "phone": ALI, "msg": {"sender": ALI, "text": "selam", "timestamp": 1.0}},
+        {"op": "edit_contact", "name": "Ali Veli", "phone": ALI},
+        {"op": "delete_contact", "phone": AYSE},
+    ]:
+        türkline.apply_record(contacts, messages, record)
+    assert list(contacts) == [("Ali Veli", ALI)]
+    assert list(messages) == [ALI]
+    assert messages[ALI][0]["text"] == "selam"
+
+
+def test_summaries_follow_their_contacts():
+    # Kayıtlı özetlerden silinmiş kişilere ait olanlar yüklenmez
+    contacts = türkline.ContactRegistry([("Ali", ALI)], {ALI: ["selam", 5.0, 1], AYSE: ["eski", 3.0, 0]})
+    assert contacts.summary_state() == {ALI: ["selam", 5.0, 1]}
+    contacts.remove(ALI)
+    assert contacts.summary(ALI) == ("", 0, 0)
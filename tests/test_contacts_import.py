@@ -0,0 +1,145 @@
+import pytest
+
+import türkline
+
+
+@pytest.mark.parametrize("raw, expected", [
+    ("0555 111 22 33", "+905551112233"),
+    ("555-111-2233", "+905551112233"),
+    ("(0555) 111.22.33", "+905551112233"),
+    ("+90 555 111 22 33", "+905551112233"),
+    ("0090 555 111 22 33", "+905551112233"),
+    ("tel:+44 20 7946 0958", "+442079460958"),
+    ("+1 (212) 555-0100", "+12125550100"),
+    ("+999 1234567", None),
+    ("12", None),
+    ("", None),
+    (None, None),
+])
+def test_normalize_phone(raw, expected):
+    assert türkline.normalize_phone(raw) == expected
+
+
+def test_normalize_phone_default_code():
+    assert türkline.normalize_phone("030 1234567", "+49") == "+49301234567"
+
+
+def test_read_vcard_folded_and_quoted_printable(tmp_path):
+    path = tmp_path / "kişiler.vcf"
+    path.write_bytes((
+        "BEGIN:VCARD\r\n"
+        "VERSION:2.1\r\n"
+        "N;CHARSET=UTF-8;ENCODING=QUOTED-PRINTABLE:=C3=87EL=C4=B0K;Ay=\r\n"
+        "=C5=9Fe;;;\r\n"
+        "TEL;CELL:0555 111 22 33\r\n"
+        "END:VCARD\r\n"
+        "BEGIN:VCARD\r\n"
+        "VERSION:3.0\r\n"
+        "FN:Mehmet\r\n"
+        "  Yılmaz\r\n"
+        "TEL;TYPE=CELL:+90 555 999 88 77\r\n"
+        "TEL;TYPE=HOME:+90 212 555 00 00\r\n"
+        "END:VCARD\r\n"
+    ).encode("utf-8"))
+    assert list(türkline.read_contacts_file(str(path))) == [
+        ("Ayşe ÇELİK", "0555 111 22 33"),
+        ("Mehmet Yılmaz", "+90 555 999 88 77"),
+        ("Mehmet Yılmaz", "+90 212 555 00 00"),
+    ]
+
+
+def test_read_csv_with_header(tmp_path):
+    path = tmp_path / "kişiler.csv"
+    path.write_text("Telefon;Ad Soyad\n0555 111 22 33;Ali Veli\n+49 30 1234567;Hans\n", encoding="utf-8")
+    assert list(türkline.read_contacts_file(str(path))) == [
+        ("Ali Veli", "0555 111 22 33"),
+        ("Hans", "+49 30 1234567"),
+    ]
+
+
+def test_read_csv_without_header(tmp_path):
+    path = tmp_path / "kişiler.csv"
+    path.write_text("Ali,05551112233\nAyşe,05559998877\n", encoding="utf-8")
+    assert list(türkline.read_contacts_file(str(path))) == [
+        ("Ali", "05551112233"),
+        ("Ayşe", "05559998877"),
+    ]
+
+
+def test_collect_new_contacts_dedupes_and_skips_existing():
+    contacts = türkline.ContactRegistry([("Mevcut", "+905550000000")])
+    entries = [
+        ("Ali", "0555 111 22 33"),
+        ("Ali (iş)", "+90 555 111 22 33"),  # aynı numara, farklı yazım
+        ("Eski", "0555 000 00 00"),  # zaten kayıtlı
+        ("Bozuk", "12"),
+        ("", "0555 999 88 77"),  # isimsiz kişi numarasıyla eklenir
+    ]
+    added, skipped = türkline.collect_new_contacts(entries, contacts)
+    assert added == [("Ali", "+905551112233"), ("+905559998877", "+905559998877")]
+    assert skipped == 3
+
+
+def test_add_contact_dialog_stores_full_number(qapp):
+    dialog = türkline.AddContactDialog("+90")
+    dialog.name_input.setText("Ali")
+    dialog.phone_input.setText("0555 111 22 33")
+    dialog.accept_dialog()
+    assert dialog.contact_phone == "+905551112233"
+
+    dialog = türkline.AddContactDialog("+90")
+    dialog.name_input.setText("Hans")
+    dialog.phone_input.setText("+49 30 1234567")
+    dialog.accept_dialog()
+    assert dialog.contact_phone == "+49301234567"
+
+
+def test_bare_number_contacts_are_renumbered_and_merged(backend, open_store, add):
+    def message(phone, text, timestamp, unread=False):
+        return {"op": "message", "phone": phone, "unread": unread,
+                "msg": {"sender": "+905551112233", "text": text, "timestamp": timestamp}}
+
+    store, contacts, messages = open_store()
+    add(store, contacts, messages, [
+        # Eski sürümde elle eklenmiş kişi ve aktarma sunucusundan gelen mesajla oluşan kopyası
+        {"op": "add_contact", "name": "Ali", "phone": "5551112233"},
+        message("5551112233", "bir", 1.0),
+        message("5551112233", "üç", 3.0),
+        {"op": "add_contact", "name": "+905551112233", "phone": "+905551112233"},
+        message("+905551112233", "iki", 2.0, unread=True),
+        message("+905551112233", "dört", 4.0, unread=True),
+        {"op": "add_contact", "name": "Ayşe", "phone": "+905559998877"},
+    ])
+    ids = {msg["text"]: msg["id"] for msg in store.messages_since(messages, "5551112233", 0)}
+
+    assert türkline.renumber_bare_contacts(store, contacts, messages, "+90") == ["+905551112233"]
+    store.close()
+
+    store, contacts, messages = open_store()
+    assert sorted(contacts) == [("Ali", "+905551112233"), ("Ayşe", "+905559998877")]
+    records = store.messages_since(messages, "+905551112233", 0)
+    assert [record["text"] for record in records] == ["bir", "iki", "üç", "dört"]
+    # Mesaj kimlikleri korunur; eşitlemede aynı mesaj sayılır
+    assert records[0]["id"] == ids["bir"] and records[2]["id"] == ids["üç"]
+    assert contacts.summary("+905551112233")[2] == 2
+    assert türkline.renumber_bare_contacts(store, contacts, messages, "+90") == []
+
+
+def test_import_skips_manually_added_contact(qapp, open_store, add, tmp_path):
+    store, contacts, messages = open_store()
+    dialog = türkline.AddContactDialog("+90")
+    dialog.name_input.setText("Ali")
+    dialog.phone_input.setText("555 111 22 33")
+    dialog.accept_dialog()
+    add(store, contacts, messages, [
+        {"op": "add_contact", "name": dialog.contact_name, "phone": dialog.contact_phone},
+        # Ülke kodu olmadan kaydedilmiş eski kişi açılışta taşınır
+        {"op": "add_contact", "name": "Ayşe", "phone": "5559998877"},
+    ])
+    türkline.renumber_bare_contacts(store, contacts, messages, "+90")
+
+    path = tmp_path / "kişiler.csv"
+    path.write_text("Ali Veli;0555 111 22 33\nAyşe Y.;+90 555 999 88 77\nMehmet;0555 444 33 22\n", encoding="utf-8")
+    added, skipped = türkline.collect_new_contacts(türkline.read_contacts_file(str(path)), contacts)
+    assert added == [("Mehmet", "+905554443322")]
+    assert skipped == 2
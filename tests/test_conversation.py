@@ -0,0 +1,64 @@
+import json
+import os
+
+import türkline
+
+PHONE = "+905551112233"
+USER = "+905550000000"
+ATTACHMENT = {"sha256": "ab" * 32, "name": "a.txt", "size": 3, "mime": "text/plain"}
+
+
+def test_records_keep_the_json_message_shape():
+    msgs = türkline.Conversation([
+        {"sender": PHONE, "text": "selam", "timestamp": 1.5, "id": "00000000000000a1"},
+        {"sender": USER, "text": "a.txt", "timestamp": 2.0, "id": "00000000000000a2", "attachment": ATTACHMENT},
+        {"sender": PHONE, "text": "eski"},
+    ])
+    assert msgs[0] == {"sender": PHONE, "text": "selam", "timestamp": 1.5, "id": "00000000000000a1"}
+    assert msgs[1]["attachment"] == ATTACHMENT
+    # Zamanı bilinmeyen mesajda timestamp anahtarı yok; kimlik içerikten türetilir
+    assert set(msgs[2]) == {"sender", "text", "id"}
+    assert msgs[2]["id"] == türkline.Conversation([{"sender": PHONE, "text": "eski"}] * 3)[2]["id"]
+    assert msgs[-1] == msgs[2]
+    assert msgs[1:] == [msgs[1], msgs[2]]
+
+
+def test_senders_are_interned():
+    msgs = türkline.Conversation({"sender": PHONE, "text": str(i)} for i in range(100))
+    assert msgs.senders.itemsize == 4
+    assert set(msgs.senders) == {türkline.SENDERS.id(PHONE)}
+    assert all(msgs[i]["sender"] is msgs[0]["sender"] for i in range(100))
+
+
+def test_copy_and_archived_head():
+    msgs = türkline.Conversation([
+        {"sender": PHONE, "text": "bir", "timestamp": 1.0},
+        {"sender": PHONE, "text": "iki", "timestamp": 2.0},
+        {"sender": USER, "text": "a.txt", "timestamp": 3.0, "attachment": ATTACHMENT},
+    ])
+    ids = [msgs[i]["id"] for i in range(3)]
+    copy = msgs.copy()
+    msgs.drop_head(2)
+    assert len(msgs) == 1 and msgs.archived == 2
+    # Ek ve kimlik yer değiştirmez; sıra numarası arşivdekileri de sayar
+    assert msgs[0]["attachment"] == ATTACHMENT
+    assert msgs[0]["id"] == ids[2]
+    assert msgs.seq(0) == 3
+    assert len(copy) == 3 and [copy[i]["id"] for i in range(3)] == ids
+
+
+def test_snapshot_is_written_in_the_json_shape(open_store, add, tmp_path):
+    store, contacts, messages = open_store()
+    add(store, contacts, messages, [
+        {"op": "add_contact", "name": "Ali", "phone": PHONE},
+        {"op": "message", "phone": PHONE, "msg": {"sender": PHONE, "text": "selam", "timestamp": 1.5,
+                                                  "id": "00000000000000a1"}},
+    ])
+    store.compact(store.prepare_compact(contacts, messages))
+    with open(os.path.join(tmp_path, türkline.DATA_FILE), encoding="utf-8") as f:
+        data = json.load(f)
+    assert data["messages"] == {PHONE: [{"sender": PHONE, "text": "selam", "timestamp": 1.5, "id": "00000000000000a1"}]}
+
+    store, contacts, messages = open_store()
+    assert isinstance(messages[PHONE], türkline.Conversation)
+    assert messages[PHONE][0]["text"] == "selam"
@@ -0,0 +1,84 @@
+import json
+import os
+
+import türkline
+
+
+def texts(msgs):
+    return [msgs[i]["text"] for i in range(len(msgs))]
+
+
+def test_journal_replays_after_reopen(open_store):
+    store, contacts, messages = open_store()
+    store.append_many([
+        {"op": "add_contact", "name": "Ali", "phone": "+905551112233"},
+        {"op": "message", "phone": "+905551112233", "msg": {"sender": "+905551112233", "text": "selam", "timestamp": 1.0}},
+        {"op": "message", "phone": "+905551112233", "msg": {"sender": "+905550000000", "text": "merhaba", "timestamp": 2.0}},
+    ])
+    store.close()
+
+    store, contacts, messages = open_store()
+    assert list(contacts) == [("Ali", "+905551112233")]
+    assert texts(messages["+905551112233"]) == ["selam", "merhaba"]
+    assert store.pending == 3
+    store.close()
+
+
+def test_torn_last_line_is_dropped_and_truncated(open_store, tmp_path):
+    store, contacts, messages = open_store()
+    store.append_many([
+        {"op": "add_contact", "name": "Ali", "phone": "+905551112233"},
+        {"op": "message", "phone": "+905551112233", "msg": {"sender": "+905551112233", "text": "tam", "timestamp": 1.0}},
+    ])
+    store.close()
+    journal = tmp_path / (türkline.DATA_FILE + türkline.JOURNAL_SUFFIX)
+    good_size = journal.stat().st_size
+    # Çökme anında yarıda kalmış kayıt: satır sonu yok
+    with open(journal, "ab") as f:
+        f.write(b'{"seq": 3, "op": "message", "phone": "+905551112233", "msg": {"sender": "+9055')
+
+    store, contacts, messages = open_store()
+    assert texts(messages["+905551112233"]) == ["tam"]
+    assert journal.stat().st_size == good_size
+
+    # Yarım satır kesildiği için sonraki kayıt onunla birleşmez
+    store.append_many([
+        {"op": "message", "phone": "+905551112233", "msg": {"sender": "+905550000000", "text": "sonra", "timestamp": 2.0}},
+    ])
+    store.close()
+    store, contacts, messages = open_store()
+    assert texts(messages["+905551112233"]) == ["tam", "sonra"]
+    store.close()
+
+
+def test_read_journal_stops_at_invalid_line(tmp_path):
+    path = tmp_path / "journal"
+    lines = [json.dumps({"seq": 1, "op": "read", "phone": "+905551112233"}).encode() + b"\n",
+             b"{bozuk\n",
+             json.dumps({"seq": 3, "op": "read", "phone": "+905551112233"}).encode() + b"\n"]
+    path.write_bytes(b"".join(lines))
+    records, good_offset = türkline.read_journal(str(path))
+    assert [record["seq"] for record in records] == [1]
+    assert good_offset == len(lines[0])
+
+
+def test_records_already_in_snapshot_are_not_replayed(open_store):
+    store, contacts, messages = open_store()
+    records = [
+        {"op": "add_contact", "name": "Ali", "phone": "+905551112233"},
+        {"op": "message", "phone": "+905551112233", "msg": {"sender": "+905551112233", "text": "bir", "timestamp": 1.0}},
+    ]
+    for record in records:
+        türkline.apply_record(contacts, messages, dict(record))
+    store.append_many(records)
+    store.compact(store.prepare_compact(contacts, messages))
+    # Döndürülmüş segment yedekten kurtarma için saklanır; kayıtları snapshot'ta
+    # olduğu için açılışta tekrar uygulanmamalı
+    assert store.journal_segments()
+    store.close()
+
+    store, contacts, messages = open_store()
+    assert texts(messages["+905551112233"]) == ["bir"]
+    assert store.pending == 0
+    assert os.path.exists(store.path)
+    store.close()
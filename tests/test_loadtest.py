@@ -0,0 +1,48 @@
+import asyncio
+import time
+
+import loadtest
+import türkline
+
+
+def params(port, **overrides):
+    args = {
+        "address": f"127.0.0.1:{port}", "clients": 6, "rate": 20.0, "duration": 0.3, "fanout": "pair",
+        "group_size": 3, "drain": 0.3, "run_id": "test", "start_at": time.time() + 0.2,
+    }
+    args.update(overrides)
+    return args
+
+
+def test_fanout_targets():
+    args = {"clients": 5, "fanout": "pair", "group_size": 3}
+    assert [loadtest.targets_of(i, args) for i in range(5)] == [[1], [0], [3], [2], [0]]
+    args["fanout"] = "group"
+    assert loadtest.targets_of(4, args) == [3]
+    assert loadtest.targets_of(1, args) == [0, 2]
+    args["fanout"] = "random"
+    assert all(loadtest.targets_of(2, args) != [2] for _ in range(50))
+
+
+def test_simulated_clients_against_local_relay():
+    async def scenario(fanout):
+        server = türkline.RelayServer()
+        listener = await asyncio.get_running_loop().create_server(
+            lambda: türkline.RelayConnection(server), "127.0.0.1", 0)
+        port = listener.sockets[0].getsockname()[1]
+        try:
+            args = params(port, fanout=fanout)
+            return await loadtest.Worker(args, 0, args["clients"]).run(), args
+        finally:
+            listener.close()
+
+    for fanout in loadtest.FANOUT_PATTERNS:
+        result, args = asyncio.run(scenario(fanout))
+        assert result["connected"] == 6 and result["connect_errors"] == 0
+        assert result["sent"] > 0
+        # Her mesaj bir kez teslim edildi ve gönderene teslim onayı döndü
+        assert result["received"] == result["sent"] == result["acked"]
+        assert result["duplicates"] == 0 and result["stale"] == 0
+        summary = loadtest.summarize([result], args)
+        assert summary["dropped"] == 0
+        assert summary["latency"]["count"] == result["received"]
@@ -0,0 +1,91 @@
+import türkline
+
+USER = "+905550000000"
+PHONE = "+905551112233"
+
+
+def conversation(count, start=0):
+    return türkline.Conversation(
+        {"sender": PHONE, "text": f"m{i}", "timestamp": 1.0 + i} for i in range(start, start + count)
+    )
+
+
+def test_sending_inserts_only_the_new_row(qapp):
+    view = türkline.MessageListView(USER, page_size=50)
+    msgs = conversation(200)
+    view.set_conversation(msgs)
+    model = view.message_model
+    events = []
+    model.rowsInserted.connect(lambda parent, first, last: events.append(("insert", first, last)))
+    model.modelReset.connect(lambda: events.append(("reset",)))
+
+    view.append_message(msgs, {"sender": USER, "text": "yeni", "timestamp": 300.0})
+    # Görünüm yeniden kurulmaz; sadece sona bir satır eklenir
+    assert events == [("insert", 50, 50)]
+    assert model.rowCount() == 51
+    assert model.data(model.index(50)) == "yeni"
+    assert len(msgs) == 201
+
+
+def test_message_for_another_conversation_does_not_touch_view(qapp):
+    view = türkline.MessageListView(USER, page_size=50)
+    shown, other = conversation(10), conversation(3)
+    view.set_conversation(shown)
+    events = []
+    view.message_model.rowsInserted.connect(lambda *args: events.append(args))
+
+    view.append_message(other, {"sender": PHONE, "text": "başka", "timestamp": 20.0})
+    assert events == []
+    assert view.message_model.rowCount() == 10
+    assert other[-1]["text"] == "başka"
+
+
+def texts(model):
+    return [model.data(model.index(row)) for row in range(model.rowCount())]
+
+
+def test_only_last_page_is_shown_and_older_pages_load_on_demand(qapp):
+    model = türkline.MessageListModel(page_size=100)
+    model.set_conversation(conversation(1000))
+    assert model.rowCount() == 100
+    assert texts(model)[0] == "m900"
+    assert model.load_older() == 100
+    assert model.rowCount() == 200 and texts(model)[0] == "m800"
+    while model.has_older():
+        model.load_older()
+    assert texts(model) == [f"m{i}" for i in range(1000)]
+    assert model.load_older() == 0
+
+
+def test_archived_messages_are_paged_in_from_disk(qapp):
+    archive = list(conversation(250))
+    reads = []
+
+    def read_archive(end):
+        reads.append(end)
+        start = max(end - 100, 0)
+        return start, archive[start:end]
+
+    msgs = conversation(30, start=250)
+    msgs.archived = 250
+    model = türkline.MessageListModel(page_size=20)
+    model.set_conversation(msgs, read_archive)
+    assert texts(model) == [f"m{i}" for i in range(260, 280)]
+    model.load_older()
+    assert reads == []  # sıcak kısım bitmeden arşive gidilmez
+    model.load_older()
+    assert reads == [250]
+    assert texts(model)[0] == "m230"
+    while model.has_older():
+        model.load_older()
+    assert reads == [250, 150, 50]
+    assert texts(model) == [f"m{i}" for i in range(280)]
+
+
+def test_scrolling_to_a_search_hit_loads_its_page(qapp):
+    view = türkline.MessageListView(USER, page_size=50)
+    view.set_conversation(conversation(500))
+    view.scroll_to_message(120)
+    model = view.message_model
+    assert model.first <= 120
+    assert model.rowCount() == 500 - model.first
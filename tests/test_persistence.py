@@ -0,0 +1,96 @@
+import os
+
+import pytest
+
+import türkline
+
+PHONE = "+905551112233"
+
+
+@pytest.fixture(params=["json", "binary", "sharded"])
+def backend(request, monkeypatch):
+    monkeypatch.setattr(türkline, "STORAGE_BACKEND", request.param)
+    return request.param
+
+
+def failing_fsync(monkeypatch, count):
+    # İlk count fsync "disk dolu" hatası verir; veri dosyaya yazılmış ama kalıcı değildir
+    real_fsync = os.fsync
+    failures = [OSError("disk dolu")] * count
+
+    def fsync(fd):
+        if failures:
+            raise failures.pop()
+        real_fsync(fd)
+
+    monkeypatch.setattr(os, "fsync", fsync)
+
+
+def test_failed_write_is_reported_kept_and_retried(backend, open_store, qapp, monkeypatch):
+    monkeypatch.setattr(türkline, "SAVE_RETRY_MS", 20)
+    store, contacts, messages = open_store()
+    worker = türkline.PersistenceWorker(store, debounce_ms=0)
+    events = []
+    worker.signals.failed.connect(lambda error: events.append(("failed", error)))
+    worker.signals.recovered.connect(lambda: events.append(("recovered", None)))
+    worker.start()
+
+    failing_fsync(monkeypatch, 2)
+    worker.submit_many([
+        {"op": "add_contact", "name": "Ali", "phone": PHONE},
+        {"op": "message", "phone": PHONE, "msg": {"sender": PHONE, "text": "bir", "timestamp": 1.0}},
+    ])
+    # İlk yazma ve flush'taki deneme başarısız: kayıtlar atılmaz, bekler
+    assert not worker.flush()
+    assert worker.error is not None
+    worker.submit({"op": "message", "phone": PHONE, "msg": {"sender": PHONE, "text": "iki", "timestamp": 2.0}})
+    assert worker.flush()
+    worker.stop()
+    qapp.processEvents()  # sinyaller işçi thread'inden kuyruklu gelir
+    assert events == [("failed", "disk dolu"), ("recovered", None)]
+
+    store, contacts, messages = open_store()
+    assert list(contacts) == [("Ali", PHONE)]
+    # Yarım kalan yazma geri alındığı için hiçbir kayıt iki kez girmez
+    assert [msg["text"] for msg in messages[PHONE]] == ["bir", "iki"]
+    assert store.last_seq(messages, PHONE) == 2
+
+
+def test_snapshot_covers_records_that_could_not_be_written(open_store, add, monkeypatch):
+    store, contacts, messages = open_store()
+    worker = türkline.PersistenceWorker(store, debounce_ms=0)
+    worker.start()
+    add(store, contacts, messages, [{"op": "add_contact", "name": "Ali", "phone": PHONE}])
+
+    record = {"op": "message", "phone": PHONE, "msg": {"sender": PHONE, "text": "bir", "timestamp": 1.0}}
+    türkline.apply_record(contacts, messages, dict(record))
+    failing_fsync(monkeypatch, 3)  # ilk yazma, flush ve sıkıştırma öncesi deneme
+    worker.submit(record)
+    assert not worker.flush()
+    # Snapshot bellekteki mesajı içerir; bekleyen kayıt ayrıca yazılmaz
+    worker.request_compact(contacts, messages)
+    assert worker.flush()
+    worker.stop()
+
+    store, contacts, messages = open_store()
+    assert [msg["text"] for msg in messages[PHONE]] == ["bir"]
+
+
+def test_after_saved_waits_for_failed_records(open_store, monkeypatch):
+    monkeypatch.setattr(türkline, "SAVE_RETRY_MS", 20)
+    store, contacts, messages = open_store()
+    worker = türkline.PersistenceWorker(store, debounce_ms=0)
+    worker.start()
+    saved = []
+    failing_fsync(monkeypatch, 3)  # ilk yazma, after_saved ve flush'taki denemeler
+    worker.submit({"op": "add_contact", "name": "Ali", "phone": PHONE})
+    worker.after_saved(lambda: saved.append(worker.error))
+    assert not worker.flush()
+    # Kayıt yazılamadıkça gelen mesajlar sunucuya onaylanmaz
+    assert saved == []
+    assert worker.flush()
+    assert saved == [None]
+    worker.after_saved(lambda: saved.append("boş"))
+    worker.flush()
+    worker.stop()
+    assert saved == [None, "boş"]
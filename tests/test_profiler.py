@@ -0,0 +1,67 @@
+import json
+import time
+
+import türkline
+
+
+class Window:
+    def __init__(self):
+        self.sent = []
+
+    def send_message(self):
+        self.sent.append(True)
+
+    def on_clicked(self, checked):
+        return checked
+
+
+def read_log(path):
+    with open(path, encoding="utf-8") as f:
+        return [json.loads(line) for line in f]
+
+
+def test_instrumented_slots_are_timed_once(tmp_path):
+    profiler = türkline.Profiler()
+    profiler.enable(str(tmp_path / "profil.jsonl"))
+    profiler.instrument(Window, ["send_message", "on_clicked"])
+    profiler.instrument(Window, ["send_message"])  # ikinci kez sarılmaz
+    try:
+        window = Window()
+        window.send_message()
+        # Qt'nin fazladan gönderdiği sinyal argümanları slot imzasına göre kırpılır
+        window.send_message(False)
+        assert window.on_clicked(True, "fazla") is True
+    finally:
+        for name in ("send_message", "on_clicked"):
+            setattr(Window, name, getattr(Window, name).__wrapped__)
+    stats = profiler.stats()
+    assert stats["slots"]["send_message"]["calls"] == 2
+    assert stats["slots"]["on_clicked"]["calls"] == 1
+    assert window.sent == [True, True]
+    assert profiler.last_slot == "on_clicked"
+
+
+def test_stalls_and_summary_are_logged(tmp_path):
+    path = str(tmp_path / "profil.jsonl")
+    profiler = türkline.Profiler()
+    profiler.enable(path)
+    profiler.count_io(read=10, written=5)
+    profiler.record_slot("change_contact", 0.2)
+    profiler.last_beat = time.perf_counter() - (türkline.STALL_CHECK_MS + türkline.STALL_THRESHOLD_MS + 50) / 1000
+    profiler.check_stall()
+    profiler.stop()
+
+    stall, summary = read_log(path)
+    assert stall["event"] == "stall" and stall["last_slot"] == "change_contact"
+    assert stall["ms"] >= türkline.STALL_THRESHOLD_MS
+    assert summary["event"] == "summary"
+    assert summary["bytes_read"] == 10 and summary["bytes_written"] == 5
+    assert summary["slots"]["change_contact"]["max_ms"] == 200.0
+    assert summary["stalls"] == 1
+
+
+def test_disabled_profiler_writes_nothing(tmp_path):
+    profiler = türkline.Profiler()
+    profiler.log_path = str(tmp_path / "profil.jsonl")
+    profiler.stop()
+    assert not (tmp_path / "profil.jsonl").exists()
@@ -0,0 +1,71 @@
+import os
+
+import türkline
+
+
+def contact(name, phone):
+    return {"op": "add_contact", "name": name, "phone": phone}
+
+
+def test_corrupt_snapshot_falls_back_to_backup(open_store, add):
+    store, contacts, messages = open_store()
+    add(store, contacts, messages, [contact("Ali", "+905551112233")])
+    store.compact(store.prepare_compact(contacts, messages))
+    add(store, contacts, messages, [contact("Ayşe", "+905559998877")])
+    store.compact(store.prepare_compact(contacts, messages))
+    store.close()
+    with open(store.path, "wb") as f:
+        f.write(b'{"seq": 2, "contacts": [["Al')
+
+    store, contacts, messages = open_store()
+    # Yedek bir önceki sıkıştırmadan; sonraki kayıtlar saklanan journal segmentinden gelir
+    assert list(contacts) == [("Ali", "+905551112233"), ("Ayşe", "+905559998877")]
+    assert any("okunamadı" in warning for warning in store.load_warnings)
+    assert any("yedekten kurtarıldı" in warning for warning in store.load_warnings)
+    store.close()
+
+
+def test_all_snapshots_corrupt_keeps_file_and_replays_journal(open_store, add, tmp_path):
+    store, contacts, messages = open_store()
+    add(store, contacts, messages, [contact("Ali", "+905551112233")])
+    store.compact(store.prepare_compact(contacts, messages))
+    add(store, contacts, messages, [
+        contact("Ayşe", "+905559998877"),
+        {"op": "message", "phone": "+905559998877", "msg": {"sender": "+905559998877", "text": "selam", "timestamp": 1.0}},
+    ])
+    store.close()
+    for path in store.snapshot_paths():
+        if os.path.exists(path):
+            with open(path, "wb") as f:
+                f.write(b"\x00bozuk")
+
+    store, contacts, messages = open_store()
+    # Journal'da kalan her şey kurtarılır, bozuk dosya incelenmek üzere saklanır
+    assert ("Ayşe", "+905559998877") in list(contacts)
+    assert messages["+905559998877"][0]["text"] == "selam"
+    assert [name for name in os.listdir(tmp_path) if ".corrupt-" in name]
+    assert store.load_warnings
+    store.close()
+
+
+def test_interrupted_snapshot_write_leaves_old_file(open_store, add):
+    store, contacts, messages = open_store()
+    add(store, contacts, messages, [contact("Ali", "+905551112233")])
+    store.compact(store.prepare_compact(contacts, messages))
+    before = open(store.path, "rb").read()
+
+    def fail(f):
+        f.write(b'{"seq": 99, "contacts": [')
+        raise OSError("disk dolu")
+
+    try:
+        türkline.write_atomic(store.path, fail, türkline.SNAPSHOT_BACKUPS)
+    except OSError:
+        pass
+    assert open(store.path, "rb").read() == before
+    store.close()
+
+    store, contacts, messages = open_store()
+    assert list(contacts) == [("Ali", "+905551112233")]
+    assert not store.load_warnings
+    store.close()
@@ -0,0 +1,205 @@
+import asyncio
+import json
+
+import türkline
+
+OWNER = "+905551112233"
+FRIEND = "+905554445566"
+
+
+class Peer:
+    # Sunucuyla ham çerçeve konuşan en basit istemci
+    def __init__(self, reader, writer):
+        self.reader = reader
+        self.writer = writer
+        self.decoder = türkline.FrameDecoder()
+        self.frames = []
+
+    @classmethod
+    async def connect(cls, port, phone, token):
+        reader, writer = await asyncio.open_connection("127.0.0.1", port)
+        peer = cls(reader, writer)
+        peer.send({"type": "hello", "phone": phone, "token": token})
+        return peer
+
+    def send(self, obj):
+        self.writer.write(türkline.encode_frame(obj))
+
+    async def receive(self, kind):
+        while True:
+            for i, frame in enumerate(self.frames):
+                if frame.get("type") == kind:
+                    return self.frames.pop(i)
+            data = await asyncio.wait_for(self.reader.read(65536), 2)
+            if not data:
+                return None
+            self.frames.extend(self.decoder.feed(data))
+
+    async def closed(self):
+        while True:
+            data = await asyncio.wait_for(self.reader.read(65536), 2)
+            if not data:
+                return True
+            self.frames.extend(self.decoder.feed(data))
+
+
+async def start(server):
+    listener = await asyncio.get_running_loop().create_server(
+        lambda: türkline.RelayConnection(server), "127.0.0.1", 0)
+    return listener, listener.sockets[0].getsockname()[1]
+
+
+def test_wrong_token_neither_kicks_owner_nor_receives_queue():
+    async def scenario():
+        server = türkline.RelayServer()
+        listener, port = await start(server)
+        owner = await Peer.connect(port, OWNER, "a" * 32)
+        friend = await Peer.connect(port, FRIEND, "b" * 32)
+        await asyncio.sleep(0.05)
+        owner.writer.close()
+        await asyncio.sleep(0.05)
+        friend.send({"type": "msg", "to": OWNER, "msg": {"text": "gizli", "id": "00000000000000a1"}})
+        await asyncio.sleep(0.05)
+
+        thief = await Peer.connect(port, OWNER, "c" * 32)
+        error = await thief.receive("error")
+        assert await thief.closed()
+        assert error["message"]
+        assert thief.frames == []  # bekleyen mesaj sızmadı
+        assert server.rejected == 1
+
+        owner = await Peer.connect(port, OWNER, "a" * 32)
+        msg = await owner.receive("msg")
+        assert msg["msg"]["text"] == "gizli"
+        # Sahip bağlıyken de yanlış token onu düşüremez
+        thief = await Peer.connect(port, OWNER, "c" * 32)
+        assert await thief.closed()
+        assert server.clients[OWNER].transport.is_closing() is False
+        for peer in (owner, friend):
+            peer.writer.close()
+        listener.close()
+
+    asyncio.run(scenario())
+
+
+def test_invalid_hello_is_rejected():
+    async def scenario():
+        server = türkline.RelayServer()
+        listener, port = await start(server)
+        for phone, token in [(OWNER, None), (OWNER, "kısa"), (123, "a" * 32), ("", "a" * 32)]:
+            peer = await Peer.connect(port, phone, token)
+            assert await peer.receive("error") is not None
+        assert server.accounts == {}
+        listener.close()
+
+    asyncio.run(scenario())
+
+
+def test_accounts_are_persisted(tmp_path, monkeypatch):
+    monkeypatch.setattr(türkline, "RELAY_ACCOUNTS_SAVE_DELAY", 0)
+    path = str(tmp_path / "accounts.json")
+
+    async def scenario():
+        server = türkline.RelayServer(accounts_path=path)
+        listener, port = await start(server)
+        peer = await Peer.connect(port, OWNER, "a" * 32)
+        await asyncio.sleep(0.1)
+        peer.writer.close()
+        listener.close()
+
+    asyncio.run(scenario())
+    with open(path, encoding="utf-8") as f:
+        assert json.load(f) == {OWNER: türkline.token_digest("a" * 32)}
+    # Yeniden başlayan sunucu numarayı aynı token'a bağlı tutar
+    server = türkline.RelayServer(accounts_path=path)
+    assert not server.authenticate(OWNER, "c" * 32)
+    assert server.authenticate(OWNER, "a" * 32)
+
+
+def test_relay_token_is_created_once(tmp_path):
+    token = türkline.relay_token(str(tmp_path))
+    assert len(token) == 64
+    assert türkline.relay_token(str(tmp_path)) == token
+
+
+def message(text, message_id):
+    return {"sender": FRIEND, "text": text, "id": message_id}
+
+
+def test_message_is_kept_until_recipient_acknowledges():
+    async def scenario():
+        server = türkline.RelayServer()
+        listener, port = await start(server)
+        friend = await Peer.connect(port, FRIEND, "b" * 32)
+        owner = await Peer.connect(port, OWNER, "a" * 32)
+        await asyncio.sleep(0.05)
+        friend.send({"type": "msg", "to": OWNER, "msg": message("bir", "00000000000000a1")})
+        first = await owner.receive("msg")
+        # Alıcı kaydetmeden koptu: mesaj kaybolmaz, sonraki bağlantıda tekrar gelir
+        owner.writer.close()
+        await asyncio.sleep(0.05)
+        owner = await Peer.connect(port, OWNER, "a" * 32)
+        again = await owner.receive("msg")
+        assert again["msg"] == first["msg"]
+        # Onaylanmamışken gönderenin tekrarı ikinci kez iletilmez
+        friend.send({"type": "msg", "to": OWNER, "msg": message("bir", "00000000000000a1")})
+        await asyncio.sleep(0.05)
+        assert server.duplicates == 1
+
+        friend.writer.close()
+        await asyncio.sleep(0.05)
+        owner.send({"type": "ack", "upto": "yanlış"})  # geçersiz onay yok sayılır
+        owner.send({"type": "ack", "upto": again["ref"]})
+        await asyncio.sleep(0.05)
+        assert server.pending == set() and server.queues == {}
+        # Gönderen çevrimdışıyken gelen teslim onayı bağlanınca iletilir
+        friend = await Peer.connect(port, FRIEND, "b" * 32)
+        delivered = await friend.receive("delivered")
+        assert delivered["ids"] == ["00000000000000a1"]
+        assert owner.frames == []
+        for peer in (owner, friend):
+            peer.writer.close()
+        listener.close()
+
+    asyncio.run(scenario())
+
+
+def test_recipient_window_limits_unacknowledged_messages():
+    async def scenario():
+        server = türkline.RelayServer(window=2)
+        listener, port = await start(server)
+        owner = await Peer.connect(port, OWNER, "a" * 32)
+        friend = await Peer.connect(port, FRIEND, "b" * 32)
+        await asyncio.sleep(0.05)
+        for i in range(3):
+            friend.send({"type": "msg", "to": OWNER, "msg": message(f"m{i}", f"{i + 1:016x}")})
+        friend.send({"type": "msg", "to": OWNER, "msg": {"text": "kimliksiz"}})
+        await asyncio.sleep(0.05)
+        received = [(await owner.receive("msg"))["msg"]["text"] for _ in range(2)]
+        assert received == ["m0", "m1"] and owner.frames == []
+        owner.send({"type": "ack", "upto": 2})
+        assert (await owner.receive("msg"))["msg"]["text"] == "m2"
+        assert (await friend.receive("delivered"))["ids"] == [f"{1:016x}", f"{2:016x}"]
+        for peer in (owner, friend):
+            peer.writer.close()
+        listener.close()
+
+    asyncio.run(scenario())
+
+
+def test_outbox_keeps_undelivered_messages(tmp_path):
+    path = str(tmp_path / türkline.RELAY_OUTBOX_FILE)
+    outbox = türkline.RelayOutbox(path)
+    assert outbox.load() == []
+    outbox.add(OWNER, message("bir", "00000000000000a1"))
+    outbox.add(OWNER, message("iki", "00000000000000a2"))
+    outbox.done(["00000000000000a1"])
+    outbox.close()
+    with open(path, "a", encoding="utf-8") as f:
+        f.write('{"to": "+90')  # kapanırken yarım kalmış satır
+
+    outbox = türkline.RelayOutbox(path)
+    assert outbox.load() == [(OWNER, message("iki", "00000000000000a2"))]
+    outbox.clear()
+    outbox.close()
+    assert türkline.RelayOutbox(path).load() == []
@@ -0,0 +1,89 @@
+import pytest
+
+import türkline
+
+
+@pytest.mark.parametrize("text, expected", [
+    ("İSTANBUL", "istanbul"),
+    ("ILIK", "ılık"),
+    ("IĞDIR", "ığdır"),
+    ("İzmir ve Isparta", "izmir ve ısparta"),
+    ("ÇĞÖŞÜ", "çğöşü"),
+])
+def test_turkish_fold(text, expected):
+    assert türkline.turkish_fold(text) == expected
+
+
+def conversation(*texts):
+    msgs = türkline.Conversation()
+    for text in texts:
+        msgs.append({"sender": "+905551112233", "text": text, "timestamp": 1.0})
+    return msgs
+
+
+def test_search_matches_turkish_case(tmp_path):
+    index = türkline.SearchIndex(str(tmp_path / "index.json"))
+    messages = {
+        "+905551112233": conversation("istanbul'a geldim", "hava ılık", "İzmir'de"),
+        "+905559998877": conversation("ISTANBUL değil", "ilik suyu"),
+    }
+    assert türkline.search_messages(index, messages, "İSTANBUL") == [("+905551112233", [0])]
+    assert türkline.search_messages(index, messages, "ILIK") == [("+905551112233", [1])]
+    assert türkline.search_messages(index, messages, "ılık İZMİR") == []
+    assert türkline.search_messages(index, messages, "istanbul") == [("+905551112233", [0])]
+
+
+def test_search_index_survives_reload(tmp_path):
+    path = str(tmp_path / "index.json")
+    messages = {"+905551112233": conversation("Işık geldi mi", "geldi")}
+    index = türkline.SearchIndex(path)
+    assert türkline.search_messages(index, messages, "ışık") == [("+905551112233", [0])]
+    index.save()
+
+    index = türkline.SearchIndex(path)
+    index.load()
+    assert index.counts == {"+905551112233": 2}
+    assert türkline.search_messages(index, messages, "GELDİ") == [("+905551112233", [0, 1])]
+
+
+@pytest.mark.parametrize("backend", ["binary", "sqlite", "sharded"])
+def test_first_search_does_not_cache_conversations(backend, open_store, add):
+    store, contacts, messages = open_store(backend=backend)
+    add(store, contacts, messages, [
+        {"op": "add_contact", "name": "Ali", "phone": "+905551112233"},
+        {"op": "add_contact", "name": "Ayşe", "phone": "+905559998877"},
+        {"op": "message", "phone": "+905551112233", "msg": {"sender": "+905551112233", "text": "istanbul"}},
+        {"op": "message", "phone": "+905559998877", "msg": {"sender": "+905559998877", "text": "izmir"}},
+    ])
+    store.compact(store.prepare_compact(contacts, messages))
+    store.close()
+
+    store, contacts, messages = open_store()
+    index = türkline.SearchIndex(store.path + türkline.SEARCH_INDEX_SUFFIX)
+    assert türkline.search_messages(index, messages, "İZMİR") == [("+905559998877", [0])]
+    # İndekslenen ama eşleşmeyen sohbet RAM'e alınmadı
+    assert list(türkline.loaded_conversations(messages)) == ["+905559998877"]
+    assert set(index.counts) == {"+905551112233", "+905559998877"}
+
+
+def test_index_is_saved_by_persistence_worker(tmp_path, open_store):
+    store, contacts, messages = open_store()
+    worker = türkline.PersistenceWorker(store, debounce_ms=0)
+    worker.start()
+    path = str(tmp_path / "index.json")
+    msgs = conversation("Işık geldi mi")
+    index = türkline.SearchIndex(path)
+    index.sync("+905551112233", msgs)
+    worker.save_index(index)
+    # Kopya alındıktan sonra eklenen mesaj kayda girmez; yeniden açılışta indekslenir
+    msgs.append({"sender": "+905551112233", "text": "geldi", "timestamp": 2.0})
+    index.sync("+905551112233", msgs)
+    assert worker.flush()
+    worker.stop()
+    assert index.dirty
+
+    saved = türkline.SearchIndex(path)
+    saved.load()
+    assert saved.counts == {"+905551112233": 1}
+    assert saved.search("geldi") == {"+905551112233": [0]}
+    assert türkline.search_messages(saved, {"+905551112233": msgs}, "geldi") == [("+905551112233", [0, 1])]
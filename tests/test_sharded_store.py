@@ -0,0 +1,122 @@
+import pytest
+
+import türkline
+
+PHONES = ["+905551112233", "+905554445566", "+905557778899"]
+
+
+@pytest.fixture(autouse=True)
+def sharded(monkeypatch):
+    monkeypatch.setattr(türkline, "STORAGE_BACKEND", "sharded")
+
+
+def message(phone, text, unread=False):
+    record = {"op": "message", "phone": phone, "msg": {"sender": phone, "text": text, "timestamp": 1.0}}
+    if unread:
+        record["unread"] = True
+    return record
+
+
+def fill(store, contacts, messages, add):
+    add(store, contacts, messages, [{"op": "add_contact", "name": f"Kişi {i}", "phone": phone}
+                                    for i, phone in enumerate(PHONES)])
+    add(store, contacts, messages, [message(phone, f"{phone} {i}") for phone in PHONES for i in range(2)])
+
+
+def texts(msgs):
+    return [msg["text"] for msg in msgs]
+
+
+def test_least_recently_used_conversations_are_evicted(open_store, add):
+    store, contacts, messages = open_store()
+    fill(store, contacts, messages, add)
+    store.close()
+
+    store, contacts, messages = open_store()
+    messages.max_messages = 4
+    for phone in PHONES:
+        assert texts(messages[phone]) == [f"{phone} 0", f"{phone} 1"]
+    # Üçüncü sohbet sınırı aştı: en eski kullanılan atıldı
+    assert list(messages.loaded()) == PHONES[1:]
+    assert texts(messages[PHONES[0]]) == [f"{PHONES[0]} 0", f"{PHONES[0]} 1"]
+    assert list(messages.loaded()) == PHONES[2:] + PHONES[:1]
+
+
+def test_unsaved_conversation_is_kept_until_written(open_store, add):
+    store, contacts, messages = open_store()
+    fill(store, contacts, messages, add)
+    store.close()
+
+    store, contacts, messages = open_store()
+    messages.max_messages = 2
+    dirty = message(PHONES[0], "yazılmadı")
+    türkline.apply_record(contacts, messages, dict(dirty))
+    # Diske inmemiş mesajı olan sohbet atılsaydı tekrar okununca mesaj kaybolurdu
+    messages[PHONES[1]], messages[PHONES[2]]
+    assert PHONES[0] in messages.loaded()
+    assert texts(messages[PHONES[0]])[-1] == "yazılmadı"
+
+    store.append_many([dirty])
+    messages[PHONES[1]], messages[PHONES[2]]
+    assert PHONES[0] not in messages.loaded()
+    assert texts(messages[PHONES[0]]) == [f"{PHONES[0]} 0", f"{PHONES[0]} 1", "yazılmadı"]
+    assert store.last_seq(messages, PHONES[0]) == 3
+
+
+def test_pinned_conversation_is_not_evicted(open_store, add):
+    store, contacts, messages = open_store()
+    fill(store, contacts, messages, add)
+    store.close()
+
+    store, contacts, messages = open_store()
+    messages.max_messages = 2
+    messages[PHONES[0]]
+    türkline.pin_conversation(messages, PHONES[0])
+    messages[PHONES[1]], messages[PHONES[2]]
+    assert PHONES[0] in messages.loaded()
+
+
+def test_unloaded_conversation_is_read_from_tail(open_store, add):
+    store, contacts, messages = open_store()
+    fill(store, contacts, messages, add)
+    store.close()
+
+    store, contacts, messages = open_store()
+    records = store.messages_since(messages, PHONES[1], 1)
+    assert [(record["seq"], record["text"]) for record in records] == [(2, f"{PHONES[1]} 1")]
+    assert not messages.loaded()
+
+
+def test_manifest_is_recovered_from_backup(open_store, add, tmp_path):
+    store, contacts, messages = open_store()
+    fill(store, contacts, messages, add)
+    add(store, contacts, messages, [{"op": "edit_contact", "phone": PHONES[0], "name": "Yeni Ad"}])
+    store.close()
+
+    with open(store.manifest_path, "wb") as f:
+        f.write(b'{"contacts": [')
+    store, contacts, messages = open_store()
+    assert any("yedekten" in warning for warning in store.load_warnings)
+    # Yedek bir önceki kişi listesidir; mesajlar kişi dosyalarından okunur
+    assert contacts.name(PHONES[0]) == "Kişi 0"
+    assert texts(messages[PHONES[2]]) == [f"{PHONES[2]} 0", f"{PHONES[2]} 1"]
+    assert contacts.summary(PHONES[2])[0] == f"{PHONES[2]} 1"
+
+
+def test_messages_written_after_manifest_are_recovered(open_store, add):
+    store, contacts, messages = open_store()
+    fill(store, contacts, messages, add)
+    store.close()
+
+    # Manifest'e yansımamış bir mesaj ve çökme sırasında yarım kalmış bir satır
+    with open(store.shard_path(PHONES[0]), "ab") as f:
+        f.write(b'{"sender": "+905551112233", "text": "son", "timestamp": 2.0}\n{"sender": "+90')
+    store, contacts, messages = open_store()
+    assert store.last_seq(messages, PHONES[0]) == 3
+    assert list(contacts.summary(PHONES[0]))[:1] == ["son"]
+    assert texts(messages[PHONES[0]]) == [f"{PHONES[0]} 0", f"{PHONES[0]} 1", "son"]
+    add(store, contacts, messages, [message(PHONES[0], "sonraki")])
+    store.close()
+
+    store, contacts, messages = open_store()
+    assert texts(messages[PHONES[0]])[-2:] == ["son", "sonraki"]
@@ -0,0 +1,42 @@
+import türkline
+
+PHONE = "+905551112233"
+
+
+def message(text, timestamp, unread=False):
+    record = {"op": "message", "phone": PHONE, "msg": {"sender": PHONE, "text": text, "timestamp": timestamp}}
+    if unread:
+        record["unread"] = True
+    return record
+
+
+def test_json_data_is_imported_with_summaries(open_store, add, tmp_path):
+    store, contacts, messages = open_store()
+    add(store, contacts, messages, [
+        {"op": "add_contact", "name": "Ali", "phone": PHONE},
+        message("bir", 2.0),
+        message("iki", 1.0, unread=True),
+    ])
+    store.close()
+
+    store, contacts, messages = open_store(backend="sqlite")
+    assert list(contacts) == [("Ali", PHONE)]
+    # Sıra zamana göre değil, yazılış sırasına göre korunur
+    assert [msg["text"] for msg in messages[PHONE]] == ["bir", "iki"]
+    assert list(contacts.summary(PHONE)) == ["iki", 2.0, 1]
+    assert store.last_seq(messages, PHONE) == 2
+
+
+def test_unloaded_conversation_is_read_from_database(open_store, add):
+    store, contacts, messages = open_store(backend="sqlite")
+    add(store, contacts, messages, [{"op": "add_contact", "name": "Ali", "phone": PHONE}]
+        + [message(f"m{i}", 1.0 + i) for i in range(5)])
+    store.close()
+
+    store, contacts, messages = open_store(backend="sqlite")
+    assert store.last_seq(messages, PHONE) == 5
+    records = store.messages_since(messages, PHONE, 3)
+    assert [(record["seq"], record["text"]) for record in records] == [(4, "m3"), (5, "m4")]
+    # Okuma sohbeti önbelleğe almaz
+    assert not messages.loaded()
+    assert contacts.summary(PHONE)[0] == "m4"
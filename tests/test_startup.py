@@ -0,0 +1,59 @@
+import json
+import threading
+import time
+
+import türkline
+
+
+def test_startup_report_is_quiet_unless_profiling(tmp_path, capsys, monkeypatch):
+    path = tmp_path / "startup.jsonl"
+    timer = türkline.StartupTimer()
+    timer.mark("login_shown")
+    timer.report(str(path))
+    assert capsys.readouterr().err == ""
+
+    monkeypatch.setattr(türkline.PROFILER, "enabled", True)
+    timer.report(str(path))
+    assert "login_shown" in capsys.readouterr().err
+    # Dosyaya her açılışta yazılır
+    lines = path.read_text(encoding="utf-8").splitlines()
+    assert len(lines) == 2
+    assert "login_shown" in json.loads(lines[0])["marks_ms"]
+
+
+def test_discard_does_not_wait_for_loading(tmp_path, qapp, monkeypatch):
+    release = threading.Event()
+    real_load = türkline.JsonStore.load
+
+    def slow_load(store):
+        release.wait(10)
+        return real_load(store)
+
+    monkeypatch.setattr(türkline.JsonStore, "load", slow_load)
+    loader = türkline.StoreLoader(str(tmp_path))
+    finished = []
+    loader.finished.connect(lambda: finished.append(True))
+    loader.start()
+
+    closed = threading.Event()
+    started = time.monotonic()
+    loader.discard(closed.set)
+    # Yükleme sürerken GUI thread'i bloklanmaz; store'u thread kendisi kapatır
+    assert time.monotonic() - started < 1
+    assert not closed.is_set()
+    release.set()
+    assert closed.wait(10)
+    loader.thread.join(10)
+    qapp.processEvents()
+    assert loader.result is None
+    assert not finished
+
+
+def test_discard_after_loading_closes_store(tmp_path):
+    loader = türkline.StoreLoader(str(tmp_path))
+    loader.start()
+    loader.thread.join(10)
+    closed = []
+    loader.discard(lambda: closed.append(True))
+    assert closed == [True]
+    assert loader.result[0].journal_file is None
@@ -0,0 +1,60 @@
+import türkline
+
+ALI = "+905551112233"
+AYSE = "+905554445566"
+
+
+def message(phone, text, timestamp, unread=False):
+    record = {"op": "message", "phone": phone, "msg": {"sender": phone, "text": text, "timestamp": timestamp}}
+    if unread:
+        record["unread"] = True
+    return record
+
+
+def test_summary_tracks_last_message_and_unread():
+    contacts, messages = türkline.ContactRegistry([("Ali", ALI)]), {}
+    for record in [message(ALI, "bir", 2.0, unread=True), message(ALI, "x" * 500, 1.0, unread=True)]:
+        türkline.apply_record(contacts, messages, record)
+    text, timestamp, unread = contacts.summary(ALI)
+    assert text == "x" * türkline.SUMMARY_PREVIEW_CHARS
+    assert timestamp == 2.0  # zamanı eski mesaj sırayı geri almaz
+    assert unread == 2
+    türkline.apply_record(contacts, messages, {"op": "read", "phone": ALI})
+    assert contacts.summary(ALI)[2] == 0
+    assert not contacts.mark_read(ALI)
+
+
+def test_summaries_are_stored_with_contacts(backend, open_store, add):
+    store, contacts, messages = open_store()
+    add(store, contacts, messages, [
+        {"op": "add_contact", "name": "Ali", "phone": ALI},
+        {"op": "add_contact", "name": "Ayşe", "phone": AYSE},
+        message(ALI, "selam", 5.0, unread=True),
+        message(AYSE, "merhaba", 6.0, unread=True),
+        {"op": "read", "phone": AYSE},
+    ])
+    store.compact(store.prepare_compact(contacts, messages))
+    add(store, contacts, messages, [message(ALI, "naber", 7.0, unread=True)])
+    store.close()
+
+    store, contacts, messages = open_store()
+    assert list(contacts.summary(ALI)) == ["naber", 7.0, 2]
+    assert list(contacts.summary(AYSE)) == ["merhaba", 6.0, 0]
+
+
+def test_new_message_moves_contact_to_top(qapp):
+    contacts = türkline.ContactRegistry([("Ali", ALI), ("Ayşe", AYSE)])
+    contacts.note_message(ALI, {"text": "eski", "timestamp": 2.0})
+    contacts.note_message(AYSE, {"text": "daha eski", "timestamp": 1.0})
+    model = türkline.ContactListModel(contacts)
+    assert [model.data(model.index(row), türkline.PHONE_ROLE) for row in range(2)] == [ALI, AYSE]
+    events = []
+    model.rowsMoved.connect(lambda *args: events.append("move"))
+    model.modelReset.connect(lambda: events.append("reset"))
+
+    contacts.note_message(AYSE, {"text": "yeni", "timestamp": 3.0}, unread=True)
+    model.update_contact(AYSE)
+    assert events == ["move"]
+    assert [model.data(model.index(row), türkline.PHONE_ROLE) for row in range(2)] == [AYSE, ALI]
+    assert model.data(model.index(0), türkline.UNREAD_ROLE) == 1
+    assert "•1" in model.data(model.index(0))
@@ -0,0 +1,105 @@
+import gzip
+import os
+
+import pytest
+
+import türkline
+
+ACCOUNT = "+905550000000"
+PHONE = "+905551112233"
+
+
+class Device:
+    def __init__(self, open_store, add, directory):
+        self.store, self.contacts, self.messages = open_store(directory)
+        self.state = türkline.SyncState(str(directory)).load()
+        self.endpoint = türkline.SyncEndpoint(ACCOUNT, self.state, self.store, self.contacts, self.messages,
+                                              self.store.append_many)
+        self.add_records = add
+
+    def add(self, records):
+        self.add_records(self.store, self.contacts, self.messages, records)
+
+    def texts(self, phone):
+        msgs = self.messages[phone]
+        return [msgs[i]["text"] for i in range(len(msgs))]
+
+    def ids(self, phone):
+        msgs = self.messages[phone]
+        return [msgs.message_id(i) for i in range(len(msgs))]
+
+
+@pytest.fixture
+def device(backend, open_store, add):
+    return lambda directory: Device(open_store, add, directory)
+
+
+def message(text, timestamp):
+    return {"op": "message", "phone": PHONE, "msg": {"sender": PHONE, "text": text, "timestamp": timestamp}}
+
+
+def test_bundle_delta_and_idempotent_reimport(device, tmp_path):
+    laptop = device(tmp_path / "dizüstü")
+    phone = device(tmp_path / "telefon")
+    laptop.add([{"op": "add_contact", "name": "Ali", "phone": PHONE}] + [message(f"m{i}", 1000.0 + i) for i in range(3)])
+
+    full = str(tmp_path / "tam.tlsync")
+    assert türkline.write_sync_bundle(full, laptop.endpoint) == 3
+    assert türkline.read_sync_bundle(full, phone.endpoint) == 3
+    assert list(phone.contacts) == [("Ali", PHONE)]
+    assert phone.texts(PHONE) == ["m0", "m1", "m2"]
+    assert phone.ids(PHONE) == laptop.ids(PHONE)
+    # Aynı paket ikinci kez alınınca hiçbir şey eklenmez
+    assert türkline.read_sync_bundle(full, phone.endpoint) == 0
+    assert len(phone.messages[PHONE]) == 3
+
+    # Eşin bir sonraki bağlantıda bildireceği filigran: sadece yeni mesajlar paketlenir
+    laptop.state.peer(phone.state.device)["acked"] = dict(phone.state.peer(laptop.state.device)["received"])
+    laptop.add([message("m3", 2000.0), message("m4", 2001.0)])
+    delta = str(tmp_path / "fark.tlsync")
+    assert türkline.write_sync_bundle(delta, laptop.endpoint, phone.state.device) == 2
+    assert türkline.read_sync_bundle(delta, phone.endpoint) == 2
+    assert türkline.read_sync_bundle(delta, phone.endpoint) == 0
+    assert türkline.read_sync_bundle(full, phone.endpoint) == 0
+    phone.store.close()
+
+    # Alınan mesajlar diske yazılmış, kimlikleri korunmuş olmalı
+    phone = device(tmp_path / "telefon")
+    assert phone.texts(PHONE) == ["m0", "m1", "m2", "m3", "m4"]
+    assert phone.ids(PHONE) == laptop.ids(PHONE)
+    phone.store.close()
+    laptop.store.close()
+
+
+def test_bundle_from_same_device_is_rejected(device, tmp_path):
+    laptop = device(tmp_path / "dizüstü")
+    laptop.add([{"op": "add_contact", "name": "Ali", "phone": PHONE}, message("m0", 1000.0)])
+    path = str(tmp_path / "tam.tlsync")
+    türkline.write_sync_bundle(path, laptop.endpoint)
+    with pytest.raises(ValueError, match="cihaz kimliği"):
+        türkline.read_sync_bundle(path, laptop.endpoint)
+    laptop.store.close()
+
+
+def test_truncated_bundle_is_rejected(device, tmp_path):
+    laptop = device(tmp_path / "dizüstü")
+    phone = device(tmp_path / "telefon")
+    laptop.add([{"op": "add_contact", "name": "Ali", "phone": PHONE}] + [message(f"m{i}", 1000.0 + i) for i in range(50)])
+    path = str(tmp_path / "tam.tlsync")
+    türkline.write_sync_bundle(path, laptop.endpoint)
+
+    # Sıkıştırılmış akış yarıda kesilmiş
+    with open(path, "r+b") as f:
+        f.truncate(os.path.getsize(path) // 2)
+    with pytest.raises(ValueError, match="yarım"):
+        türkline.read_sync_bundle(path, phone.endpoint)
+
+    # Akış sağlam ama "done" çerçevesi yok: filigran ilerlemez
+    with gzip.open(path, "wb") as f:
+        f.write(b'{"type":"hello","version":%d,"device":"%s","account":"%s"}\n'
+                % (türkline.SYNC_VERSION, laptop.state.device.encode(), ACCOUNT.encode()))
+    with pytest.raises(ValueError, match="yarım"):
+        türkline.read_sync_bundle(path, phone.endpoint)
+    assert phone.state.peer(laptop.state.device)["received"] == {}
+    phone.store.close()
+    laptop.store.close()
@@ -0,0 +1,35 @@
+import pytest
+
+import türkline
+
+
+@pytest.fixture
+def app(qapp):
+    # Uygulama nesnesi oturum boyunca ortak; tema test sonunda geri alınır
+    theme, stylesheet = qapp.property("theme"), qapp.styleSheet()
+    yield qapp
+    qapp.setProperty("theme", theme)
+    qapp.setStyleSheet(stylesheet)
+
+
+def test_themes_fill_every_placeholder():
+    assert set(türkline.THEMES["dark"]) == set(türkline.THEMES["light"])
+    for name in türkline.THEMES:
+        assert "$" not in türkline.theme_stylesheet(name)
+    # Stil sayfası tema başına bir kez üretilir
+    assert türkline.theme_stylesheet("dark") is türkline.theme_stylesheet("dark")
+
+
+def test_switching_theme_restyles_without_widget_stylesheets(app):
+    assert türkline.apply_theme(app, "light") == "light"
+    assert türkline.current_theme() == "light"
+    assert app.styleSheet() == türkline.theme_stylesheet("light")
+    dialog = türkline.AddContactDialog()
+    view = türkline.MessageListView("+905550000000")
+    # Widget'lar kendi stil sayfalarını taşımaz; görünüm uygulama temasından gelir
+    assert dialog.styleSheet() == "" and view.styleSheet() == ""
+
+    assert türkline.apply_theme(app, "yok") == "dark"
+    assert app.styleSheet() == türkline.theme_stylesheet("dark")
+    view.set_theme("dark")
+    assert view.itemDelegate().own_color == türkline.theme_color("dark", "own_message")
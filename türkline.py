@@ -2,17 +2,111 @@ import sys
 import os
 import json
 import re
+import argparse
+import asyncio
+import bisect
+import contextlib
+import base64
+import csv
+import quopri
+import glob
+import gzip
+import shutil
+import hashlib
+import hmac
+import itertools
+import sqlite3
+import mmap
+import platform
+import queue
+import random
+import struct
+import threading
+import time
+import zlib
+import functools
+import string
+from array import array
+from collections import OrderedDict, deque
+from collections.abc import MutableMapping, Sequence
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
 from PySide6.QtWidgets import (
     QApplication, QWidget, QLabel, QDialog, QFormLayout, QLineEdit, QComboBox,
     QDialogButtonBox, QMessageBox, QHBoxLayout, QVBoxLayout, QPushButton,
-    QListWidget, QTextBrowser, QMainWindow, QInputDialog
+    QListWidget, QListWidgetItem, QListView, QMainWindow, QInputDialog, QAbstractItemView,
+    QStyledItemDelegate, QFileDialog, QPlainTextEdit
 )
-from PySide6.QtCore import Qt, QTimer
-from PySide6.QtGui import QPainter, QColor, QFont, QTextCursor
+from PySide6.QtCore import Qt, QTimer, QAbstractListModel, QModelIndex, QRect, QSize, QObject, Signal
+from PySide6.QtGui import QPainter, QColor, QFont, QShortcut, QKeySequence, QImage, QImageReader
+from PySide6.QtNetwork import QLocalServer, QLocalSocket, QTcpServer, QTcpSocket, QHostAddress, QAbstractSocket
 
 
 # --- Constants ---
-DATA_FILE = "data/messages.json"
+# Veriler çalışma dizinine değil uygulamanın yanındaki data/ dizinine yazılır;
+# her hesabın kendi dizini vardır: DATA_ROOT/accounts/<telefon>/. Aşağıdaki
+# store ve ek yolları hesap dizinine göredir.
+DATA_ROOT = os.environ.get("TURKLINE_DATA") or os.path.join(os.path.dirname(os.path.abspath(__file__)), "data")
+ACCOUNTS_DIR = "accounts"
+LAST_ACCOUNT_FILE = "last_account"  # açılışta hangi hesabın önceden yükleneceği
+LOCK_FILE = "lock"
+LEGACY_DATA = ("messages.*", "shards", "attachments")  # hesap dizinlerinden önceki düzen
+ACTIVATION_TIMEOUT_MS = 1000
+DATA_FILE = "messages.json"
+JOURNAL_SUFFIX = ".journal"
+COMPACT_EVERY = 1000  # bu kadar journal kaydından sonra snapshot alınır
+COMPACT_INTERVAL_MS = 60000
+SNAPSHOT_BACKUPS = 3  # messages.json.1 ... messages.json.N
+SQLITE_FILE = "messages.db"
+BINARY_FILE = "messages.tlb"
+SHARD_DIR = "shards"  # kişi başına bir mesaj dosyası + contacts.json
+SHARD_CACHE_MESSAGES = int(os.environ.get("TURKLINE_CACHE_MESSAGES", "200000"))
+SHARD_CACHE_BYTES = int(os.environ.get("TURKLINE_CACHE_MB", "64")) * 1024 * 1024
+STORAGE_BACKEND = os.environ.get("TURKLINE_STORAGE", "json")  # "json", "binary", "sqlite" veya "sharded"
+SAVE_DEBOUNCE_MS = int(os.environ.get("TURKLINE_SAVE_DEBOUNCE_MS", "200"))
+SAVE_RETRY_MS = 5000  # yazılamayan kayıtlar bu aralıkla yeniden denenir
+SEARCH_INDEX_SUFFIX = ".index"
+ARCHIVE_SUFFIX = ".archive"  # store dosyasının yanında, kişi başına bir arşiv dosyası içeren dizin
+ARCHIVE_KEEP_MESSAGES = int(os.environ.get("TURKLINE_HOT_MESSAGES", "5000"))  # sohbet başına RAM'de tutulan en fazla mesaj
+ARCHIVE_AFTER_DAYS = float(os.environ.get("TURKLINE_ARCHIVE_DAYS", "180"))  # bundan eski mesajlar arşive taşınır
+ARCHIVE_MIN_MESSAGES = 500  # daha az soğuk mesaj için segment yazılmaz
+ARCHIVE_SEGMENT_MESSAGES = 1000  # bir segmentteki en fazla mesaj; geri yüklemenin birimi
+SEARCH_RESULT_LIMIT = 200
+CONTACT_LAYOUT_BATCH = 2000  # kişi listesi bir olay döngüsü turunda en fazla bu kadar satır yerleştirir
+SUMMARY_PREVIEW_CHARS = 80  # kişi özetinde saklanan son mesaj uzunluğu
+ATTACHMENT_DIR = "attachments"
+ATTACHMENT_CHUNK = 1024 * 1024  # dosyalar bu büyüklükte parçalarla okunur/kopyalanır
+THUMBNAIL_SIZE = 240  # küçük resmin en uzun kenarı (px)
+THUMBNAIL_CACHE = 200  # bellekte tutulan küçük resim sayısı
+STARTUP_REPORT_FILE = "startup.jsonl"  # DATA_ROOT altında, tüm hesaplar için ortak
+MESSAGE_PAGE_SIZE = int(os.environ.get("TURKLINE_PAGE_SIZE", "200"))
+THEME = os.environ.get("TURKLINE_THEME", "dark")  # "dark" veya "light"
+PROFILE_ENABLED = os.environ.get("TURKLINE_PROFILE", "") not in ("", "0")  # veya --profile
+PROFILE_LOG_FILE = "profile.jsonl"  # DATA_ROOT altında
+PROFILE_LOG_INTERVAL_MS = 5000
+PROFILE_WINDOW = 500  # slot başına saklanan son ölçüm sayısı
+STALL_CHECK_MS = 20
+STALL_THRESHOLD_MS = int(os.environ.get("TURKLINE_STALL_MS", "100"))
+RELAY_ADDRESS = os.environ.get("TURKLINE_RELAY", "")  # ör. "127.0.0.1:8765"; boşsa sadece yerel
+RELAY_DEFAULT_PORT = 8765
+RELAY_MAX_FRAME = 1024 * 1024
+RELAY_QUEUE_LIMIT = 10000  # alıcı başına sunucuda bekletilen en fazla mesaj
+RELAY_WINDOW = 256  # alıcıya gönderilip kaydettiği henüz onaylanmamış en fazla mesaj
+RELAY_BACKOFF_MIN = 0.5  # saniye
+RELAY_BACKOFF_MAX = 30.0
+RELAY_TOKEN_FILE = "relay_token"  # hesap dizininde: hesabın aktarma sunucusundaki gizli anahtarı
+RELAY_OUTBOX_FILE = "relay_outbox.jsonl"  # hesap dizininde: teslim onayı beklenen gönderilmiş mesajlar
+RELAY_ACCOUNTS_SAVE_DELAY = 1.0  # saniye; yeni kayıtlar toplanıp tek yazmada saklanır
+SYNC_FILE = "sync.json"  # hesap dizininde: cihaz kimliği ve eşlerin filigranları
+SYNC_LISTEN = os.environ.get("TURKLINE_SYNC_LISTEN", "")  # ör. "127.0.0.1:8766"; boşsa eşitleme bağlantısı kabul edilmez
+SYNC_DEFAULT_PORT = 8766
+SYNC_VERSION = 1
+SYNC_BATCH_MESSAGES = 1000  # bir "messages" çerçevesindeki en fazla mesaj
+SYNC_MAX_FRAME = 64 * 1024 * 1024
+SYNC_BUNDLE_SUFFIX = ".tlsync"
 COUNTRY_CODES = [
     ("Türkiye", "+90"),
     ("ABD", "+1"),
@@ -27,6 +121,3872 @@ COUNTRY_CODES = [
     ("Japonya", "+81"),
     ("Meksika", "+52"),
 ]
+# Numara normalizasyonunda en uzun ön ek önce denenir
+COUNTRY_CALLING_CODES = sorted({code for _, code in COUNTRY_CODES}, key=len, reverse=True)
+
+# ========== Message Store ==========
+# Her değişiklik (mesaj / kişi işlemi) DATA_FILE yanındaki journal dosyasına tek
+# satır olarak eklenir; tam snapshot sadece sıkıştırma (compaction) sırasında,
+# arka planda yazılır. Kayıtlardaki "seq" alanı, snapshot'a zaten işlenmiş
+# kayıtların replay sırasında tekrar uygulanmasını engeller.
+class ContactRegistry:
+    # phone -> isim; dict ekleme sırasını koruduğu için liste sırası da korunur.
+    # Tüm kişi işlemleri O(1), iterasyon eski [(name, phone), ...] biçimini verir.
+    # Kişi başına özet (son mesaj, zamanı, okunmamış sayısı) mesaj geldikçe
+    # güncellenir ve kişilerle birlikte saklanır; sohbetleri taramaya gerek kalmaz.
+    def __init__(self, contacts=(), summaries=None):
+        self.names = {}
+        for name, phone in contacts:
+            self.names[phone] = name
+        self.summaries = {}  # phone -> [son mesaj, timestamp, okunmamış]
+        for phone, summary in (summaries or {}).items():
+            if phone in self.names:
+                self.summaries[phone] = list(summary)
+
+    def __contains__(self, phone):
+        return phone in self.names
+
+    def __iter__(self):
+        return ((name, phone) for phone, name in self.names.items())
+
+    def __len__(self):
+        return len(self.names)
+
+    def name(self, phone):
+        return self.names.get(phone)
+
+    def add(self, name, phone):
+        self.names[phone] = name
+
+    def rename(self, phone, name):
+        if phone in self.names:
+            self.names[phone] = name
+
+    def remove(self, phone):
+        self.names.pop(phone, None)
+        self.summaries.pop(phone, None)
+
+    def summary(self, phone):
+        return self.summaries.get(phone, ("", 0, 0))
+
+    def last_activity(self, phone):
+        return self.summary(phone)[1]
+
+    def note_message(self, phone, msg, unread=False):
+        if phone not in self.names:
+            return
+        summary = self.summaries.get(phone)
+        if summary is None:
+            summary = self.summaries[phone] = ["", 0, 0]
+        summary[0] = msg.get("text", "")[:SUMMARY_PREVIEW_CHARS]
+        # Zamanı bilinmeyen eski mesajlar sıralamada öne geçmez
+        summary[1] = max(summary[1], msg.get("timestamp", 0) or 0)
+        if unread:
+            summary[2] += 1
+
+    def mark_read(self, phone):
+        summary = self.summaries.get(phone)
+        if summary is None or summary[2] == 0:
+            return False
+        summary[2] = 0
+        return True
+
+    def summary_state(self):
+        # Snapshot için kopya; GUI thread'i özetleri yerinde değiştirir
+        return {phone: list(summary) for phone, summary in self.summaries.items()}
+
+
+class SenderTable:
+    # Her gönderen numarası bir kez saklanır; mesajlar 4 baytlık id tutar
+    def __init__(self):
+        self.phones = []
+        self.ids = {}
+        self.lock = threading.Lock()  # StoreLoader ve GUI thread'i aynı anda ekleyebilir
+
+    def id(self, phone):
+        sender_id = self.ids.get(phone)
+        if sender_id is None:
+            with self.lock:
+                sender_id = self.ids.get(phone)
+                if sender_id is None:
+                    sender_id = self.ids[phone] = len(self.phones)
+                    self.phones.append(phone)
+        return sender_id
+
+
+SENDERS = SenderTable()
+
+
+MESSAGE_ID_PATTERN = re.compile(r"[0-9a-f]{16}")
+
+
+def new_message_id():
+    return os.urandom(8).hex()
+
+
+def message_digest(seq, sender, timestamp, text):
+    # Kimliği saklanmamış eski mesajların kimliği içerikten ve sohbet içi sıradan
+    # türetilir: aynı dosyanın iki kopyasında aynı çıkar, eşitlemede tekrar oluşmaz
+    seed = f"{seq}\0{sender}\0{float(timestamp or 0)!r}\0{text}".encode("utf-8")
+    return int.from_bytes(hashlib.blake2b(seed, digest_size=8).digest(), "big") or 1
+
+
+class Conversation(Sequence):
+    # Bir sohbetin mesajları sütunlar halinde tutulur: gönderen id'leri, metinler,
+    # zamanlar ve 64 bitlik mesaj kimlikleri. Mesaj başına dict yerine ~24 bayt +
+    # metnin kendisi harcanır. Dışarıya {"sender", "text", "id"} kayıtları olarak
+    # görünür ve JSON'a aynı biçimde yazılır; "timestamp" sadece biliniyorsa
+    # eklenir. Az sayıdaki dosya eki mesaj sırasına göre seyrek bir dict'te tutulur.
+    # Sohbet içi sıra numarası (seq) saklanmaz: arşivdekiler dahil mesajın
+    # sohbetteki yeridir, mesajlar sadece sona eklendiği için değişmez.
+    __slots__ = ("senders", "texts", "times", "ids", "attachments", "archived")
+
+    def __init__(self, msgs=()):
+        self.senders = array("I")
+        self.texts = []
+        self.times = array("d")
+        self.ids = array("Q")  # 0: kimliği saklanmamış eski mesaj, ilk istenişte türetilir
+        self.attachments = {}  # mesaj sırası -> ek bilgisi
+        self.archived = 0  # bu mesajlardan önce arşive taşınmış mesaj sayısı
+        self.extend(msgs)
+
+    def __len__(self):
+        return len(self.texts)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self.record(i) for i in range(*index.indices(len(self.texts)))]
+        return self.record(index)
+
+    def record(self, index):
+        msg = {"sender": SENDERS.phones[self.senders[index]], "text": self.texts[index]}
+        timestamp = self.times[index]
+        if timestamp:
+            msg["timestamp"] = timestamp
+        msg["id"] = self.message_id(index)
+        if self.attachments:
+            attachment = self.attachments.get(index % len(self.texts))
+            if attachment is not None:
+                msg["attachment"] = attachment
+        return msg
+
+    def records(self):
+        return [self.record(i) for i in range(len(self.texts))]
+
+    def seq(self, index):
+        # 1'den başlar; arşive taşınan mesajlar da sayılır
+        return self.archived + index % len(self.texts) + 1
+
+    def message_id(self, index):
+        message_id = self.ids[index]
+        if not message_id:
+            message_id = self.ids[index] = message_digest(
+                self.seq(index), SENDERS.phones[self.senders[index]], self.times[index], self.texts[index]
+            )
+        return f"{message_id:016x}"
+
+    def add(self, sender, text, timestamp=0, attachment=None, message_id=None):
+        # Metin en son eklenir: uzunluk metin listesinden okunduğu için diğer
+        # thread'ler yarım eklenmiş bir mesaj görmez
+        self.senders.append(SENDERS.id(sender))
+        self.times.append(timestamp or 0)
+        self.ids.append(int(message_id, 16) if message_id else 0)
+        if attachment is not None:
+            self.attachments[len(self.texts)] = attachment
+        self.texts.append(text)
+
+    def append(self, msg):
+        self.add(msg.get("sender", ""), msg.get("text", ""), msg.get("timestamp", 0), msg.get("attachment"), msg.get("id"))
+
+    def extend(self, msgs):
+        for msg in msgs:
+            self.append(msg)
+
+    def copy(self):
+        # Sıkıştırma için tutarlı kopya: sütunlar memcpy, metinler sadece referans
+        conversation = Conversation()
+        conversation.senders = array("I", self.senders)
+        conversation.times = array("d", self.times)
+        conversation.ids = array("Q", self.ids)
+        conversation.texts = list(self.texts)
+        conversation.attachments = dict(self.attachments)
+        conversation.archived = self.archived
+        return conversation
+
+    def contains_id(self, message_id):
+        # Kimliği türetilmiş (0 saklanan) eski mesajlar dışarıdan tekrar gelmez
+        return int(message_id, 16) in self.ids
+
+    def drop_head(self, count):
+        # Arşive taşınan ilk count mesaj çıkarılır; mesaj sıraları count kadar kayar
+        del self.senders[:count], self.times[:count], self.ids[:count], self.texts[:count]
+        if self.attachments:
+            self.attachments = {i - count: attachment for i, attachment in self.attachments.items() if i >= count}
+        self.archived += count
+
+    def __repr__(self):
+        return f"Conversation({self.records()!r})"
+
+
+MESSAGE_KEYS = frozenset(("sender", "text", "timestamp", "id", "attachment"))
+MESSAGE_SLOT = object()
+
+
+def decode_json_messages(raw):
+    # Snapshot'taki mesaj nesneleri dict olarak oluşturulmadan doğrudan bir
+    # Conversation'ın sütunlarına yazılır; listede yerlerine tek bir işaretçi
+    # kalır. "messages" nesnesi kapanınca sütunlar liste uzunluklarına göre
+    # sohbetlere bölünür. Böylece yükleme sırasındaki tepe bellek de küçülür.
+    pending = Conversation()
+
+    def hook(pairs):
+        obj = dict(pairs)
+        if obj and obj.keys() <= MESSAGE_KEYS:
+            pending.add(obj.get("sender", ""), obj.get("text", ""), obj.get("timestamp", 0), obj.get("attachment"), obj.get("id"))
+            return MESSAGE_SLOT
+        if obj and all(type(value) is list and value.count(MESSAGE_SLOT) == len(value) for value in obj.values()):
+            messages = {}
+            start = 0
+            for phone, slots in pairs:
+                conversation = Conversation()
+                end = start + len(slots)
+                conversation.senders = pending.senders[start:end]
+                conversation.times = pending.times[start:end]
+                conversation.ids = pending.ids[start:end]
+                conversation.texts = pending.texts[start:end]
+                if pending.attachments:
+                    conversation.attachments = {
+                        i - start: attachment for i, attachment in pending.attachments.items() if start <= i < end
+                    }
+                messages[phone] = conversation
+                start = end
+            del pending.senders[:start], pending.times[:start], pending.ids[:start], pending.texts[:start]
+            pending.attachments = {i - start: attachment for i, attachment in pending.attachments.items() if i >= start}
+            return messages
+        return obj
+
+    data = json.loads(raw, object_pairs_hook=hook)
+    if not all(isinstance(msgs, Conversation) for msgs in data.get("messages", {}).values()):
+        raise ValueError("geçersiz mesaj kaydı")
+    return data
+
+
+def apply_record(contacts, messages, record):
+    op = record.get("op")
+    phone = record.get("phone")
+    if op == "message":
+        messages.setdefault(phone, Conversation()).append(record["msg"])
+        contacts.note_message(phone, record["msg"], record.get("unread", False))
+    elif op == "read":
+        contacts.mark_read(phone)
+    elif op == "add_contact":
+        contacts.add(record["name"], phone)
+        messages.setdefault(phone, Conversation())
+    elif op == "edit_contact":
+        contacts.rename(phone, record["name"])
+    elif op == "delete_contact":
+        contacts.remove(phone)
+        messages.pop(phone, None)
+
+
+def backfill_summaries(contacts, last_message):
+    # Özet saklamayan eski verilerde kişi başına son mesaj bir kez okunur
+    for _, phone in contacts:
+        msg = last_message(phone)
+        if msg is not None:
+            contacts.note_message(phone, msg)
+
+
+def read_journal(path):
+    # Yarım kalmış son satırda (çökme anında yazılan) okumayı bırakır ve
+    # sağlam kısmın bittiği offset'i döndürür.
+    records = []
+    good_offset = 0
+    with open(path, "rb") as f:
+        for line in f:
+            if not line.endswith(b"\n"):
+                break
+            try:
+                records.append(json.loads(line))
+            except ValueError:
+                break
+            good_offset += len(line)
+    if PROFILER.enabled:
+        PROFILER.count_io(read=good_offset)
+    return records, good_offset
+
+
+def fsync_dir(path):
+    # Windows dizin fsync'ini desteklemez; orada rename zaten kalıcıdır
+    if os.name == "nt":
+        return
+    fd = os.open(path or ".", os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+def write_atomic(path, write, backups=0, before_replace=None):
+    # Geçici dosyaya yaz, fsync et, sonra rename: yarıda kalan yazma eski dosyayı bozmaz
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "wb") as f:
+        write(f)
+        f.flush()
+        os.fsync(f.fileno())
+        if PROFILER.enabled:
+            PROFILER.count_io(written=f.tell())
+    if before_replace is not None:
+        before_replace()
+    if backups and os.path.exists(path):
+        for i in range(backups - 1, 0, -1):
+            if os.path.exists(f"{path}.{i}"):
+                os.replace(f"{path}.{i}", f"{path}.{i + 1}")
+        os.replace(path, f"{path}.1")
+    os.replace(tmp_path, path)
+    fsync_dir(os.path.dirname(path))
+
+
+def read_snapshot_seq(path):
+    # "seq" snapshot'ın ilk anahtarıdır; tüm dosyayı parse etmeye gerek yok
+    with open(path, "rb") as f:
+        match = re.search(rb'"seq":\s*(\d+)', f.read(64))
+    return int(match.group(1)) if match else 0
+
+
+class JsonStore:
+    def __init__(self, path):
+        self.path = path
+        self.journal_path = path + JOURNAL_SUFFIX
+        self.seq = 0
+        self.pending = 0  # son snapshot'tan beri journal'a eklenen kayıt sayısı
+        self.journal_file = None
+        self.load_warnings = []
+        self.archive = MessageArchive(path + ARCHIVE_SUFFIX)
+        self.unarchived = []  # yazılamamış arşiv segmentleri; sonraki sıkıştırmada yeniden denenir
+
+    def snapshot_paths(self):
+        return [self.path] + [f"{self.path}.{i}" for i in range(1, SNAPSHOT_BACKUPS + 1)]
+
+    def read_snapshot(self):
+        # En yeni geçerli snapshot'ı bulur; bozuk olanlar atlanır ve raporlanır
+        existing = [path for path in self.snapshot_paths() if os.path.exists(path)]
+        for path in existing:
+            try:
+                data = self.decode_snapshot(path)
+            except (OSError, ValueError) as e:
+                self.load_warnings.append(f"{path} okunamadı: {e}")
+                continue
+            if path != self.path:
+                self.load_warnings.append(f"Veriler yedekten kurtarıldı: {path}")
+            return data
+        if existing:
+            # Hiçbiri okunamadı: bozuk dosyayı sakla, journal'dan kurtarılabilen kadarını yükle
+            if os.path.exists(self.path):
+                os.replace(self.path, f"{self.path}.corrupt-{int(time.time())}")
+        return None
+
+    def decode_snapshot(self, path):
+        with open(path, "rb") as f:
+            raw = f.read()
+        if PROFILER.enabled:
+            PROFILER.count_io(read=len(raw))
+        data = decode_json_messages(raw)
+        messages = data.get("messages", {})
+        for phone, count in data.get("archived", {}).items():
+            if phone in messages:
+                messages[phone].archived = count
+        return data
+
+    def encode_snapshot(self, f, data):
+        f.write(json.dumps(data, indent=4, default=Conversation.records).encode("utf-8"))
+
+    def snapshot_seq(self, path):
+        return read_snapshot_seq(path)
+
+    def journal_segments(self):
+        # Döndürülmüş segmentler "<journal>.<son seq>" adını taşır
+        segments = []
+        for segment in glob.glob(glob.escape(self.journal_path) + ".*"):
+            suffix = segment.rsplit(".", 1)[1]
+            if suffix.isdigit():
+                segments.append((int(suffix), segment))
+        segments.sort()
+        return segments
+
+    def load(self):
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        self.load_warnings = []
+        data = self.read_snapshot()
+        if data is None:
+            data = {"seq": 0, "contacts": [], "summaries": {}, "messages": {}}
+            if not os.path.exists(self.path):
+                write_atomic(self.path, lambda f: self.encode_snapshot(f, data))
+                data = self.decode_snapshot(self.path)
+
+        contacts = ContactRegistry(data.get("contacts", []), data.get("summaries"))
+        messages = data.get("messages", {})
+        if data.get("summaries") is None:
+            backfill_summaries(contacts, lambda phone: self.last_message(messages, phone))
+        self.seq = data.get("seq", 0)
+        self.pending = 0
+
+        paths = [segment for _, segment in self.journal_segments()]
+        if os.path.exists(self.journal_path):
+            paths.append(self.journal_path)
+        for path in paths:
+            records, good_offset = read_journal(path)
+            for record in records:
+                if record.get("seq", 0) <= self.seq:
+                    continue
+                apply_record(contacts, messages, record)
+                self.seq = record["seq"]
+                self.pending += 1
+            if path == self.journal_path and good_offset < os.path.getsize(path):
+                # yarım satırı at, yoksa sonraki kayıt onunla birleşir
+                with open(path, "r+b") as f:
+                    f.truncate(good_offset)
+
+        self.ensure_open()
+        return contacts, messages
+
+    def last_message(self, messages, phone):
+        msgs = messages.get(phone)
+        return msgs[-1] if msgs else None
+
+    def last_seq(self, messages, phone):
+        msgs = messages.get(phone)
+        return msgs.archived + len(msgs) if msgs else 0
+
+    def messages_since(self, messages, phone, seq):
+        return conversation_since(messages[phone], seq, functools.partial(self.archive.read, phone))
+
+    def ensure_open(self):
+        if self.journal_file is None:
+            self.journal_file = open(self.journal_path, "ab")
+
+    def append(self, record):
+        self.append_many([record])
+
+    def append_many(self, records):
+        # Birikmiş kayıtlar tek write çağrısıyla eklenir
+        lines = []
+        for record in records:
+            self.seq += 1
+            lines.append(json.dumps({"seq": self.seq, **record}, ensure_ascii=False).encode("utf-8") + b"\n")
+        data = b"".join(lines)
+        start = self.journal_file.tell()
+        try:
+            self.journal_file.write(data)
+            self.journal_file.flush()
+            os.fsync(self.journal_file.fileno())
+        except OSError:
+            # Yarım kalan yazma geri alınır; PersistenceWorker aynı batch'i aynı
+            # seq'lerle yeniden dener, açılışta tekrar eden seq'ler atlanır
+            self.seq -= len(records)
+            self.reopen_journal(start)
+            raise
+        if PROFILER.enabled:
+            PROFILER.count_io(written=len(data))
+        self.pending += len(records)
+
+    def reopen_journal(self, size):
+        # Tampondaki yazılamamış veri sonradan diske inmesin diye dosya kapatılıp kesilir
+        try:
+            self.journal_file.close()
+        except OSError:
+            pass
+        self.journal_file = None
+        try:
+            os.truncate(self.journal_path, size)
+        except OSError:
+            pass
+        self.ensure_open()
+
+    def prepare_compact(self, contacts, messages, keep=()):
+        # GUI thread'inde çağrılır. Mesaj dict'leri eklendikten sonra değişmez,
+        # listelerin kopyası tutarlı bir snapshot için yeterli. Soğuk mesajlar
+        # önce sohbetlerden ayrılır, snapshot'a sadece sıcak kuyruk girer.
+        cold = split_cold(messages, keep)
+        return (list(contacts), contacts.summary_state(),
+                {phone: msgs.copy() for phone, msgs in messages.items()}, cold)
+
+    def compact(self, payload):
+        # True: yazılan snapshot, hazırlandığı andaki bellek durumunu (journal'a
+        # yazılamamış kayıtlar dahil) kapsıyor
+        contacts, summaries, messages, cold = payload
+        self.unarchived.extend(cold)
+        if self.pending == 0 and not self.unarchived:
+            return False
+        # Arşiv segmentleri snapshot'tan önce diske iner; snapshot onları
+        # kapsamayan mesaj sayılarıyla yazılırsa fazlası sonraki eklemede kesilir
+        self.archive.append_many(self.unarchived)
+        self.unarchived = []
+        # Aktif journal'ı döndür; snapshot yazılırken gelen kayıtlar yeni dosyaya gider
+        self.journal_file.close()
+        os.replace(self.journal_path, f"{self.journal_path}.{self.seq:012d}")
+        self.journal_file = open(self.journal_path, "ab")
+        self.pending = 0
+        self.write_snapshot({
+            "seq": self.seq,
+            "contacts": contacts,
+            "summaries": summaries,
+            "archived": self.archived_counts(messages),
+            "messages": messages,
+        })
+        return True
+
+    def archived_counts(self, messages):
+        return {phone: msgs.archived for phone, msgs in messages.items() if msgs.archived}
+
+    def write_snapshot(self, data):
+        write_atomic(self.path, lambda f: self.encode_snapshot(f, data), SNAPSHOT_BACKUPS)
+        self.remove_old_segments(data["seq"])
+        self.archive.prune(data.get("archived", {}))
+
+    def remove_old_segments(self, seq):
+        # Yedek snapshot'lardan kurtarma yapılabilmesi için journal segmentleri
+        # en eski yedeğin seq'ine kadar saklanır
+        oldest_seq = seq
+        for path in self.snapshot_paths()[1:]:
+            if os.path.exists(path):
+                try:
+                    oldest_seq = min(oldest_seq, self.snapshot_seq(path))
+                except (OSError, ValueError):
+                    oldest_seq = 0
+        for last_seq, segment in self.journal_segments():
+            if last_seq <= oldest_seq:
+                os.remove(segment)
+
+    def close(self):
+        if self.journal_file is not None:
+            self.journal_file.close()
+            self.journal_file = None
+
+# ========== Message Archive ==========
+# Sıcak/soğuk katman: sohbet başına son ARCHIVE_KEEP_MESSAGES mesaj ve son
+# ARCHIVE_AFTER_DAYS günün mesajları RAM'de ve snapshot'ta kalır, daha eskileri
+# sıkıştırma sırasında kişi başına bir arşiv dosyasına taşınır. Dosya sadece
+# sona eklenen segmentlerden oluşur:
+#
+#   [u64 ilk mesaj sırası][u32 mesaj sayısı][u32 uzunluk][zlib(mesaj JSON listesi)] ...
+#
+# Conversation.archived, sohbetin sıcak kısmından önce arşivde kaç mesaj
+# olduğunu tutar ve snapshot'a yazılır. Snapshot yazılmadan çökülürse arşivde
+# snapshot'ın bilmediği segmentler kalabilir: okurken bu sayının ötesi yok
+# sayılır, sonraki eklemede dosya o noktadan kesilir. Arşiv sadece kullanıcı
+# sohbetin sıcak kısmının başını geçecek kadar yukarı kaydırınca, segment
+# segment okunur.
+ARCHIVE_HEADER = struct.Struct("<QII")
+ARCHIVE_SEGMENT_SUFFIX = ".seg"
+
+
+def cold_count(msgs, cutoff):
+    # Baştan itibaren arşive taşınabilecek mesaj sayısı; son sayfa her zaman sıcak kalır
+    limit = len(msgs) - MESSAGE_PAGE_SIZE
+    count = max(0, len(msgs) - ARCHIVE_KEEP_MESSAGES)
+    times = msgs.times
+    while count < limit and 0 < times[count] < cutoff:  # zamanı bilinmeyen mesaj yaşa göre taşınmaz
+        count += 1
+    return min(count, max(limit, 0)) if count >= ARCHIVE_MIN_MESSAGES else 0
+
+
+def split_cold(messages, keep=()):
+    # GUI thread'inde: soğuk mesajlar sohbetlerden çıkarılır, [(phone, ilk sıra, mesajlar), ...]
+    # döner. Açık sohbet (keep) görünümü bozulmasın diye ayrılmaz.
+    cutoff = time.time() - ARCHIVE_AFTER_DAYS * 86400
+    cold = []
+    for phone, msgs in list(loaded_conversations(messages).items()):
+        if phone in keep or len(msgs) <= MESSAGE_PAGE_SIZE:
+            continue
+        count = cold_count(msgs, cutoff)
+        if count:
+            cold.append((phone, msgs.archived, msgs[:count]))
+            msgs.drop_head(count)
+    return cold
+
+
+class MessageArchive:
+    def __init__(self, directory):
+        self.directory = directory
+        self.lock = threading.Lock()  # GUI okur, işçi thread'i yazar
+        self.segments = {}  # phone -> [(ilk sıra, sayı, offset, uzunluk), ...]; ilk erişimde taranır
+
+    def path(self, phone):
+        return os.path.join(self.directory, shard_file_name(phone, ARCHIVE_SEGMENT_SUFFIX))
+
+    def scan(self, phone):
+        # Sadece başlıklar okunur; yarım kalmış son segment listeye girmez
+        segments = self.segments.get(phone)
+        if segments is not None:
+            return segments
+        segments = []
+        try:
+            with open(self.path(phone), "rb") as f:
+                size = os.fstat(f.fileno()).st_size
+                offset = 0
+                while offset + ARCHIVE_HEADER.size <= size:
+                    f.seek(offset)
+                    start, count, length = ARCHIVE_HEADER.unpack(f.read(ARCHIVE_HEADER.size))
+                    if offset + ARCHIVE_HEADER.size + length > size:
+                        break
+                    segments.append((start, count, offset, length))
+                    offset += ARCHIVE_HEADER.size + length
+        except FileNotFoundError:
+            pass
+        self.segments[phone] = segments
+        return segments
+
+    def read(self, phone, end):
+        # end sırasından hemen önceki segment: (segmentin ilk sırası, mesajlar)
+        with self.lock:
+            segment = next((s for s in reversed(self.scan(phone)) if s[0] < end), None)
+            if segment is None:
+                return 0, []
+            start, count, offset, length = segment
+            with open(self.path(phone), "rb") as f:
+                f.seek(offset + ARCHIVE_HEADER.size)
+                blob = f.read(length)
+        if PROFILER.enabled:
+            PROFILER.count_io(read=len(blob))
+        return start, json.loads(zlib.decompress(blob))[:end - start]
+
+    def append(self, phone, base, msgs):
+        # base: snapshot'taki arşiv sayısı; ötesindeki segmentler hiçbir snapshot'a
+        # girmemiş demektir (yarıda kalan sıkıştırma, silinip yeniden eklenen kişi)
+        with self.lock:
+            segments = [s for s in self.scan(phone) if s[0] + s[1] <= base]
+            end = segments[-1][2] + ARCHIVE_HEADER.size + segments[-1][3] if segments else 0
+            path = self.path(phone)
+            created = not os.path.exists(path)
+            os.makedirs(self.directory, exist_ok=True)
+            with open(path, "ab") as f:
+                if f.tell() != end:
+                    f.truncate(end)
+                written = 0
+                for first in range(0, len(msgs), ARCHIVE_SEGMENT_MESSAGES):
+                    chunk = msgs[first:first + ARCHIVE_SEGMENT_MESSAGES]
+                    blob = zlib.compress(json.dumps(chunk, ensure_ascii=False, separators=(",", ":")).encode("utf-8"))
+                    f.write(ARCHIVE_HEADER.pack(base + first, len(chunk), len(blob)) + blob)
+                    segments.append((base + first, len(chunk), end, len(blob)))
+                    end += ARCHIVE_HEADER.size + len(blob)
+                    written += ARCHIVE_HEADER.size + len(blob)
+                f.flush()
+                os.fsync(f.fileno())
+                if PROFILER.enabled:
+                    PROFILER.count_io(written=written)
+            self.segments[phone] = segments
+        if created:
+            fsync_dir(self.directory)
+
+    def append_many(self, batches):
+        for phone, base, msgs in batches:
+            self.append(phone, base, msgs)
+
+    def prune(self, archived):
+        # Snapshot'ta arşivi olmayan kişilerin (silinmiş) dosyaları atılır
+        if not os.path.isdir(self.directory):
+            return
+        live = {shard_file_name(phone, ARCHIVE_SEGMENT_SUFFIX) for phone in archived}
+        with self.lock:
+            for entry in os.scandir(self.directory):
+                if entry.name.endswith(ARCHIVE_SEGMENT_SUFFIX) and entry.name not in live:
+                    os.remove(entry.path)
+            self.segments = {phone: segments for phone, segments in self.segments.items() if phone in archived}
+
+# ========== Binary Snapshot Store ==========
+# Girintisiz, uzunluk önekli kayıtlardan oluşan kompakt snapshot biçimi:
+#
+#   BINARY_MAGIC
+#   her kişi için bir blok: [u32 uzunluk][mesaj JSON] [u32 uzunluk][mesaj JSON] ...
+#   index JSON: {"contacts": [...], "summaries": {...}, "archived": {...}, "index": {phone: [offset, length, count]}}
+#   trailer: [u64 seq][u64 index offset][u64 index length][BINARY_TRAILER_MAGIC]
+#
+# Dosya memory-map edilir; açılışta sadece trailer ve index okunur, bir kişinin
+# mesajları ilk erişimde çözülür. Trailer en sona yazıldığı için yarım kalan
+# dosya geçersiz sayılır ve yedeğe dönülür.
+BINARY_MAGIC = b"TRKL1\n"
+BINARY_TRAILER = struct.Struct("<QQQ8s")
+BINARY_TRAILER_MAGIC = b"TRKLEND\n"
+RECORD_HEADER = struct.Struct("<I")
+
+
+class BinarySnapshot:
+    def __init__(self, path):
+        self.path = path
+        self.file = open(path, "rb")
+        try:
+            self.map = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            self.file.close()
+            raise ValueError("boş dosya")
+        try:
+            if self.map[:len(BINARY_MAGIC)] != BINARY_MAGIC or len(self.map) < BINARY_TRAILER.size:
+                raise ValueError("geçersiz snapshot başlığı")
+            self.seq, index_offset, index_length, magic = BINARY_TRAILER.unpack(self.map[-BINARY_TRAILER.size:])
+            if magic != BINARY_TRAILER_MAGIC:
+                raise ValueError("snapshot sonu eksik")
+            header = json.loads(self.map[index_offset:index_offset + index_length])
+        except Exception:
+            self.close()
+            raise
+        self.contacts = [tuple(contact) for contact in header["contacts"]]
+        self.summaries = header["summaries"]
+        self.archived = header["archived"]
+        self.index = header["index"]
+
+    def block(self, phone):
+        offset, length, _ = self.index[phone]
+        return self.map[offset:offset + length]
+
+    def decode(self, phone):
+        block = self.block(phone)
+        if PROFILER.enabled:
+            PROFILER.count_io(read=len(block))
+        msgs = Conversation()
+        pos = 0
+        while pos < len(block):
+            (length,) = RECORD_HEADER.unpack_from(block, pos)
+            pos += RECORD_HEADER.size
+            msgs.append(json.loads(block[pos:pos + length]))
+            pos += length
+        msgs.archived = self.archived.get(phone, 0)
+        return msgs
+
+    def records_from(self, phone, start):
+        # İlk start kaydın sadece uzunluk başlıkları atlanır, gerisi çözülür
+        offset, length, _ = self.index[phone]
+        pos, end, index = offset, offset + length, 0
+        records = []
+        while pos < end:
+            (size,) = RECORD_HEADER.unpack_from(self.map, pos)
+            pos += RECORD_HEADER.size
+            if index >= start:
+                records.append(json.loads(self.map[pos:pos + size]))
+            pos += size
+            index += 1
+        return records
+
+    def close(self):
+        self.map.close()
+        self.file.close()
+
+
+def encode_messages(msgs):
+    parts = []
+    for msg in msgs:
+        body = json.dumps(msg, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+        parts.append(RECORD_HEADER.pack(len(body)))
+        parts.append(body)
+    return b"".join(parts)
+
+
+class LazyMessages(MutableMapping):
+    # self.messages yerine geçer: sadece açılan ya da değişen sohbetler çözülüp
+    # RAM'de tutulur, diğerleri snapshot'ta blok olarak kalır.
+    def __init__(self, snapshot):
+        self.lock = threading.Lock()
+        self.snapshot = snapshot
+        self.undecoded = set(snapshot.index)
+        self.decoded = {}
+
+    def __getitem__(self, phone):
+        msgs = self.decoded.get(phone)
+        if msgs is not None:
+            return msgs
+        with self.lock:
+            if phone not in self.undecoded:
+                raise KeyError(phone)
+            msgs = self.decoded[phone] = self.snapshot.decode(phone)
+            self.undecoded.discard(phone)
+        return msgs
+
+    def peek(self, phone):
+        # Çözülür ama RAM'de tutulmaz (arama indeksini kurmak için)
+        msgs = self.decoded.get(phone)
+        if msgs is not None:
+            return msgs
+        with self.lock:
+            if phone not in self.undecoded:
+                raise KeyError(phone)
+            return self.snapshot.decode(phone)
+
+    def __setitem__(self, phone, msgs):
+        self.decoded[phone] = msgs
+        self.undecoded.discard(phone)
+
+    def __delitem__(self, phone):
+        if phone not in self:
+            raise KeyError(phone)
+        self.decoded.pop(phone, None)
+        self.undecoded.discard(phone)
+
+    def __contains__(self, phone):
+        return phone in self.decoded or phone in self.undecoded
+
+    def __iter__(self):
+        return iter(list(self.decoded) + list(self.undecoded))
+
+    def __len__(self):
+        return len(self.decoded) + len(self.undecoded)
+
+    def loaded(self):
+        return self.decoded
+
+    def snapshot_state(self):
+        # Çözülmemiş sohbetler None ile işaretlenir; yazarken ham blok kopyalanır
+        state = {phone: msgs.copy() for phone, msgs in self.decoded.items()}
+        state.update(dict.fromkeys(self.undecoded))
+        return state
+
+    def replace_snapshot(self, snapshot):
+        self.snapshot = snapshot
+        self.undecoded &= set(snapshot.index)
+
+
+class BinaryStore(JsonStore):
+    def __init__(self, path, json_path=None):
+        super().__init__(path)
+        self.json_path = json_path or os.path.join(os.path.dirname(path), DATA_FILE)  # ilk açılışta aktarılacak veri
+        self.messages = None  # load() sonrası LazyMessages
+
+    def load(self):
+        # İlk açılışta mevcut JSON verisi (journal dahil) ikili biçime aktarılır
+        if not any(os.path.exists(path) for path in self.snapshot_paths()) and os.path.exists(self.json_path):
+            json_store = JsonStore(self.json_path)
+            try:
+                contacts, messages = json_store.load()
+            finally:
+                json_store.close()
+            data = {
+                "seq": 0,
+                "contacts": list(contacts),
+                "summaries": contacts.summary_state(),
+                "archived": json_store.archived_counts(messages),
+                "messages": messages,
+            }
+            if data["archived"] and not os.path.exists(self.archive.directory):
+                shutil.copytree(json_store.archive.directory, self.archive.directory)
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            write_atomic(self.path, lambda f: self.encode_snapshot(f, data))
+
+        contacts, messages = super().load()
+        self.messages = messages
+        return contacts, messages
+
+    def decode_snapshot(self, path):
+        snapshot = BinarySnapshot(path)
+        return {
+            "seq": snapshot.seq,
+            "contacts": list(snapshot.contacts),
+            "summaries": snapshot.summaries,
+            "messages": LazyMessages(snapshot),
+        }
+
+    def last_seq(self, messages, phone):
+        # Çözülmemiş sohbetin mesaj sayısı index'ten okunur
+        with messages.lock:
+            if phone in messages.undecoded:
+                return messages.snapshot.archived.get(phone, 0) + messages.snapshot.index[phone][2]
+        return super().last_seq(messages, phone)
+
+    def messages_since(self, messages, phone, seq):
+        # Çözülmemiş sohbet RAM'e alınmaz, bloktan sadece yeni kayıtlar okunur
+        with messages.lock:
+            archived = messages.snapshot.archived.get(phone, 0)
+            if phone in messages.undecoded and seq >= archived:
+                return numbered(messages.snapshot.records_from(phone, seq - archived), seq + 1)
+        return super().messages_since(messages, phone, seq)
+
+    def encode_snapshot(self, f, data):
+        f.write(BINARY_MAGIC)
+        offset = len(BINARY_MAGIC)
+        index = {}
+        source = self.messages.snapshot if self.messages is not None else None
+        for phone, msgs in data["messages"].items():
+            if msgs is None:
+                block = source.block(phone)
+                count = source.index[phone][2]
+            else:
+                block = encode_messages(msgs)
+                count = len(msgs)
+            f.write(block)
+            index[phone] = [offset, len(block), count]
+            offset += len(block)
+        header = {"contacts": data["contacts"], "summaries": data["summaries"], "archived": data.get("archived", {}), "index": index}
+        header = json.dumps(header, ensure_ascii=False).encode("utf-8")
+        f.write(header)
+        f.write(BINARY_TRAILER.pack(data["seq"], offset, len(header), BINARY_TRAILER_MAGIC))
+
+    def snapshot_seq(self, path):
+        with open(path, "rb") as f:
+            f.seek(-BINARY_TRAILER.size, os.SEEK_END)
+            seq, _, _, magic = BINARY_TRAILER.unpack(f.read(BINARY_TRAILER.size))
+        if magic != BINARY_TRAILER_MAGIC:
+            raise ValueError("snapshot sonu eksik")
+        return seq
+
+    def prepare_compact(self, contacts, messages, keep=()):
+        # Sadece çözülmüş sohbetler arşivlenebilir; diğerleri ham blok olarak kopyalanır
+        cold = split_cold(messages, keep)
+        return list(contacts), contacts.summary_state(), messages.snapshot_state(), cold
+
+    def archived_counts(self, messages):
+        source = self.messages.snapshot.archived if self.messages is not None else {}
+        counts = {}
+        for phone, msgs in messages.items():
+            count = source.get(phone, 0) if msgs is None else msgs.archived
+            if count:
+                counts[phone] = count
+        return counts
+
+    def write_snapshot(self, data):
+        # Eşlenmiş dosya açıkken rename Windows'ta başarısız olur: yeni snapshot
+        # hazır olunca eskisi kilit altında kapatılır, yenisi açılıp devreye alınır.
+        lazy = self.messages
+        released = []
+
+        def release_old_snapshot():
+            lazy.lock.acquire()
+            released.append(True)
+            lazy.snapshot.close()
+
+        try:
+            write_atomic(self.path, lambda f: self.encode_snapshot(f, data), SNAPSHOT_BACKUPS, release_old_snapshot)
+        finally:
+            if released:
+                try:
+                    lazy.replace_snapshot(BinarySnapshot(self.path))
+                finally:
+                    lazy.lock.release()
+        self.remove_old_segments(data["seq"])
+        self.archive.prune(data.get("archived", {}))
+
+    def close(self):
+        super().close()
+        if self.messages is not None:
+            self.messages.snapshot.close()
+            self.messages = None
+
+# ========== SQLite Store ==========
+SQLITE_SCHEMA = """
+    CREATE TABLE IF NOT EXISTS meta (
+        key TEXT PRIMARY KEY,
+        value TEXT NOT NULL
+    );
+    CREATE TABLE IF NOT EXISTS contacts (
+        phone TEXT PRIMARY KEY,
+        name TEXT NOT NULL,
+        position INTEGER NOT NULL
+    );
+    CREATE TABLE IF NOT EXISTS messages (
+        id INTEGER PRIMARY KEY,
+        phone TEXT NOT NULL,
+        sender TEXT NOT NULL,
+        text TEXT NOT NULL,
+        timestamp REAL NOT NULL,
+        attachment TEXT,
+        uid TEXT,
+        seq INTEGER NOT NULL DEFAULT 0
+    );
+    CREATE INDEX IF NOT EXISTS messages_phone_seq ON messages (phone, seq);
+    CREATE TABLE IF NOT EXISTS summaries (
+        phone TEXT PRIMARY KEY,
+        text TEXT NOT NULL,
+        timestamp REAL NOT NULL,
+        unread INTEGER NOT NULL
+    );
+"""
+
+
+class SqliteMessages(MutableMapping):
+    # self.messages yerine geçer: bir sohbetin mesajları ilk erişimde
+    # (phone, seq) indeksinden okunur, tüm geçmiş RAM'e alınmaz.
+    def __init__(self, conn, phones):
+        self.conn = conn
+        self.phones = set(phones)
+        self.cache = {}
+
+    def __getitem__(self, phone):
+        if phone not in self.cache:
+            self.cache[phone] = self.peek(phone)
+        return self.cache[phone]
+
+    def peek(self, phone):
+        # Önbelleğe alınmadan okunur
+        if phone not in self.phones:
+            raise KeyError(phone)
+        if phone in self.cache:
+            return self.cache[phone]
+        rows = self.conn.execute(
+            "SELECT sender, text, timestamp, attachment, uid FROM messages WHERE phone = ? ORDER BY seq",
+            (phone,)
+        )
+        msgs = Conversation()
+        for sender, text, timestamp, attachment, uid in rows:
+            msgs.add(sender, text, timestamp, json.loads(attachment) if attachment else None, uid)
+        return msgs
+
+    def __setitem__(self, phone, msgs):
+        self.phones.add(phone)
+        self.cache[phone] = msgs
+
+    def __delitem__(self, phone):
+        if phone not in self.phones:
+            raise KeyError(phone)
+        self.phones.discard(phone)
+        self.cache.pop(phone, None)
+
+    def __contains__(self, phone):
+        return phone in self.phones
+
+    def __iter__(self):
+        return iter(self.phones)
+
+    def __len__(self):
+        return len(self.phones)
+
+    def loaded(self):
+        return self.cache
+
+
+class SqliteStore:
+    def __init__(self, path, json_path=None):
+        self.path = path
+        self.json_path = json_path or os.path.join(os.path.dirname(path), DATA_FILE)  # ilk açılışta aktarılacak veri
+        self.pending = 0  # SQLite her batch'i hemen commit eder
+        self.conn = None
+        self.write_conn = None
+        self.load_warnings = []
+        self.archive = None  # snapshot yeniden yazılmadığı için arşiv katmanı yok
+
+    def ensure_open(self):
+        if self.conn is None:
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            self.conn = self.connect()
+            self.conn.executescript(SQLITE_SCHEMA)
+
+    def connect(self):
+        # Okumalar GUI thread'inde, yazmalar PersistenceWorker'da ayrı bağlantıyla yapılır
+        conn = sqlite3.connect(self.path, check_same_thread=False)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        return conn
+
+    def load(self):
+        self.ensure_open()
+        imported = self.conn.execute("SELECT value FROM meta WHERE key = 'imported_from'").fetchone()
+        if imported is None:
+            if os.path.exists(self.json_path):
+                import_json_to_sqlite(self.json_path, self.conn)
+            with self.conn:
+                self.conn.execute("INSERT OR REPLACE INTO meta VALUES ('imported_from', ?)", (self.json_path,))
+
+        contacts = ContactRegistry(self.conn.execute("SELECT name, phone FROM contacts ORDER BY position"))
+        for phone, text, timestamp, unread in self.conn.execute("SELECT * FROM summaries"):
+            if phone in contacts:
+                contacts.summaries[phone] = [text, timestamp, unread]
+        return contacts, SqliteMessages(self.conn, contacts.names)
+
+    def last_seq(self, messages, phone):
+        # Önbellekteki sohbet yazılmamış mesajları da içerir; yoksa veritabanı günceldir
+        msgs = messages.cache.get(phone)
+        if msgs is not None:
+            return len(msgs)
+        row = self.conn.execute("SELECT MAX(seq) FROM messages WHERE phone = ?", (phone,)).fetchone()
+        return row[0] or 0
+
+    def messages_since(self, messages, phone, seq):
+        msgs = messages.cache.get(phone)
+        if msgs is not None:
+            return conversation_since(msgs, seq)
+        rows = self.conn.execute(
+            "SELECT sender, text, timestamp, attachment, uid FROM messages WHERE phone = ? AND seq > ? ORDER BY seq",
+            (phone, seq)
+        )
+        records = []
+        for sender, text, timestamp, attachment, uid in rows:
+            msg = {"sender": sender, "text": text}
+            if timestamp:
+                msg["timestamp"] = timestamp
+            if uid:
+                msg["id"] = uid
+            if attachment:
+                msg["attachment"] = json.loads(attachment)
+            records.append(msg)
+        return numbered(records, seq + 1)
+
+    def append(self, record):
+        self.append_many([record])
+
+    def append_many(self, records):
+        # Tüm kayıtlar tek transaction içinde yazılır
+        if self.write_conn is None:
+            self.write_conn = self.connect()
+        with self.write_conn:
+            for record in records:
+                self.execute_record(self.write_conn, record)
+
+    def execute_record(self, conn, record):
+        op = record.get("op")
+        phone = record.get("phone")
+        if op == "message":
+            msg = record["msg"]
+            timestamp = msg.get("timestamp") or time.time()
+            conn.execute(
+                "INSERT INTO messages (phone, sender, text, timestamp, attachment, uid, seq) VALUES (?, ?, ?, ?, ?, ?, "
+                "(SELECT COALESCE(MAX(seq), 0) + 1 FROM messages WHERE phone = ?))",
+                (phone, msg.get("sender", ""), msg.get("text", ""), timestamp, encode_attachment(msg), msg.get("id"), phone)
+            )
+            conn.execute(
+                "INSERT INTO summaries VALUES (?, ?, ?, ?) ON CONFLICT (phone) DO UPDATE SET "
+                "text = excluded.text, timestamp = MAX(timestamp, excluded.timestamp), unread = unread + excluded.unread",
+                (phone, msg.get("text", "")[:SUMMARY_PREVIEW_CHARS], timestamp, 1 if record.get("unread") else 0)
+            )
+        elif op == "read":
+            conn.execute("UPDATE summaries SET unread = 0 WHERE phone = ?", (phone,))
+        elif op == "add_contact":
+            conn.execute(
+                "INSERT OR REPLACE INTO contacts (phone, name, position) "
+                "VALUES (?, ?, (SELECT COALESCE(MAX(position), 0) + 1 FROM contacts))",
+                (phone, record["name"])
+            )
+        elif op == "edit_contact":
+            conn.execute("UPDATE contacts SET name = ? WHERE phone = ?", (record["name"], phone))
+        elif op == "delete_contact":
+            conn.execute("DELETE FROM contacts WHERE phone = ?", (phone,))
+            conn.execute("DELETE FROM messages WHERE phone = ?", (phone,))
+            conn.execute("DELETE FROM summaries WHERE phone = ?", (phone,))
+
+    def prepare_compact(self, contacts, messages, keep=()):
+        return None
+
+    def compact(self, payload):
+        # JSON snapshot'ın karşılığı: WAL dosyasını veritabanına aktar
+        if self.write_conn is not None:
+            self.write_conn.execute("PRAGMA wal_checkpoint(PASSIVE)")
+
+    def close(self):
+        for conn in (self.write_conn, self.conn):
+            if conn is not None:
+                conn.close()
+        self.conn = None
+        self.write_conn = None
+
+
+def encode_attachment(msg):
+    attachment = msg.get("attachment")
+    return None if attachment is None else json.dumps(attachment, ensure_ascii=False)
+
+
+def import_json_to_sqlite(json_path, conn):
+    # Mevcut {"contacts": [...], "messages": {...}} verisini (journal dahil) tek
+    # transaction'da aktarır. Zamanı bilinmeyen eski mesajlar için timestamp 0
+    # yazılır; sıralamayı id korur.
+    json_store = JsonStore(json_path)
+    try:
+        contacts, messages = json_store.load()
+    finally:
+        json_store.close()
+
+    with conn:
+        conn.executemany(
+            "INSERT OR REPLACE INTO contacts (phone, name, position) VALUES (?, ?, ?)",
+            [(phone, name, position) for position, (name, phone) in enumerate(contacts, 1)]
+        )
+        for phone, msgs in messages.items():
+            conn.executemany(
+                "INSERT INTO messages (phone, sender, text, timestamp, attachment, uid, seq) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                [(phone, msg["sender"], msg["text"], msg.get("timestamp", 0), encode_attachment(msg), msg["id"], seq)
+                 for seq, msg in enumerate(msgs, 1)]
+            )
+        conn.executemany(
+            "INSERT OR REPLACE INTO summaries VALUES (?, ?, ?, ?)",
+            [(phone, *summary) for phone, summary in contacts.summaries.items()]
+        )
+
+
+# ========== Sharded Store ==========
+# Her kişinin mesajları SHARD_DIR altında kendi dosyasında (her satır bir
+# {"sender", "text"} kaydı) tutulur; kişi listesi küçük bir manifest'tedir.
+# Mesaj göndermek sadece o kişinin dosyasına bir satır ekler, sohbet açmak
+# sadece o dosyayı okur. Sıkıştırma gerekmez.
+SHARD_MANIFEST = "contacts.json"
+SHARD_SUFFIX = ".jsonl"
+
+
+def shard_file_name(phone, suffix=SHARD_SUFFIX):
+    # Ağdan gelen numaralar da dosya adı olur; rakam ve + dışındaki her şey kaçırılır
+    return re.sub(r"[^0-9+]", lambda m: f"%{ord(m.group()):X}%", phone) + suffix
+
+
+class ShardedMessages(MutableMapping):
+    # self.messages yerine geçer: sohbet ilk erişimde kendi dosyasından okunur ve
+    # LRU önbellekte tutulur. Önbellek mesaj/bayt sınırını aşınca en uzun süredir
+    # kullanılmayan sohbetler atılır; açık sohbet ile henüz diske yazılmamış
+    # mesajı olan sohbetler atılmaz (tekrar okununca kaybolurlardı).
+    def __init__(self, store, phones, max_messages=SHARD_CACHE_MESSAGES, max_bytes=SHARD_CACHE_BYTES):
+        self.store = store
+        self.phones = set(phones)
+        self.max_messages = max_messages
+        self.max_bytes = max_bytes
+        self.cache = OrderedDict()  # phone -> Conversation; en son kullanılan sonda
+        self.sizes = {}  # phone -> dosyadaki bayt (bellek tahmini)
+        self.on_disk = {}  # phone -> dosyaya yazılmış mesaj sayısı
+        self.pinned = None
+        # Dosya okuma ile PersistenceWorker'ın yazıp on_disk'i güncellemesi birbirini dışlar
+        self.lock = threading.Lock()
+
+    def __getitem__(self, phone):
+        msgs = self.cache.get(phone)
+        if msgs is not None:
+            self.cache.move_to_end(phone)
+            return msgs
+        if phone not in self.phones:
+            raise KeyError(phone)
+        with self.lock:
+            msgs, size = self.store.read_shard(phone)
+            self.cache[phone] = msgs
+            self.sizes[phone] = size
+            self.on_disk[phone] = len(msgs)
+            self.evict()
+        return msgs
+
+    def peek(self, phone):
+        # Önbelleğe alınmadan okunur; önbellekteki başka bir sohbeti de attırmaz
+        msgs = self.cache.get(phone)
+        if msgs is not None:
+            return msgs
+        if phone not in self.phones:
+            raise KeyError(phone)
+        with self.lock:
+            return self.store.read_shard(phone)[0]
+
+    def __setitem__(self, phone, msgs):
+        with self.lock:
+            self.phones.add(phone)
+            self.cache[phone] = msgs
+            self.cache.move_to_end(phone)
+            self.sizes[phone] = 0
+            self.on_disk[phone] = 0
+
+    def __delitem__(self, phone):
+        if phone not in self.phones:
+            raise KeyError(phone)
+        with self.lock:
+            self.phones.discard(phone)
+            self.cache.pop(phone, None)
+            self.sizes.pop(phone, None)
+            self.on_disk.pop(phone, None)
+
+    def __contains__(self, phone):
+        return phone in self.phones
+
+    def __iter__(self):
+        return iter(list(self.phones))
+
+    def __len__(self):
+        return len(self.phones)
+
+    def loaded(self):
+        return self.cache
+
+    def pin(self, phone):
+        self.pinned = phone
+
+    def written(self, phone, count, size):
+        # PersistenceWorker, self.lock tutulurken çağırır
+        if phone in self.cache:
+            self.on_disk[phone] += count
+            self.sizes[phone] += size
+
+    def evict(self):
+        total_messages = sum(len(msgs) for msgs in self.cache.values())
+        total_bytes = sum(self.sizes.values())
+        for phone in list(self.cache):
+            if total_messages <= self.max_messages and total_bytes <= self.max_bytes:
+                break
+            msgs = self.cache[phone]
+            if phone == self.pinned or len(msgs) > self.on_disk[phone]:
+                continue
+            del self.cache[phone]
+            total_messages -= len(msgs)
+            total_bytes -= self.sizes.pop(phone)
+            del self.on_disk[phone]
+
+
+class ShardedStore:
+    def __init__(self, path, json_path=None):
+        self.path = path
+        self.manifest_path = os.path.join(path, SHARD_MANIFEST)
+        self.json_path = json_path or os.path.join(os.path.dirname(path), DATA_FILE)  # ilk açılışta aktarılacak veri
+        self.pending = 0  # her batch hemen kendi dosyasına yazılır
+        self.load_warnings = []
+        self.contacts = None  # işçi thread'inin kişi listesi kopyası
+        self.messages = None
+        self.sizes = {}  # phone -> kişi özetinin kapsadığı dosya boyu
+        self.counts = {}  # phone -> dosyadaki mesaj sayısı
+        self.summaries_dirty = False
+        self.archive = None  # sohbetler zaten ayrı dosyalarda ve önbellekten atılabiliyor
+
+    def shard_path(self, phone):
+        return os.path.join(self.path, shard_file_name(phone))
+
+    def ensure_open(self):
+        os.makedirs(self.path, exist_ok=True)
+        if self.contacts is None:
+            self.contacts = ContactRegistry()
+
+    def load(self):
+        self.ensure_open()
+        self.load_warnings = []
+        if not os.path.exists(self.manifest_path) and os.path.exists(self.json_path):
+            self.import_json()
+        manifest = self.read_manifest()
+        contacts = ContactRegistry(manifest.get("contacts", []), manifest.get("summaries"))
+        self.sizes = manifest.get("sizes", {})
+        self.counts = manifest.get("counts", {})
+        if self.recover_summaries(contacts):
+            self.contacts = contacts
+            self.write_manifest()
+        self.contacts = ContactRegistry(list(contacts), contacts.summary_state())
+        self.messages = ShardedMessages(self, contacts.names)
+        return contacts, self.messages
+
+    def recover_summaries(self, contacts):
+        # Özetler manifest'le birlikte sadece kişi değişikliğinde, sıkıştırmada ve
+        # kapanışta yazılır; mesaj göndermek manifest'e dokunmaz. Çökme sonrası
+        # dosya boyu kayıtlıdan farklı olan kişilerin sadece yeni satırları okunur.
+        actual = {}
+        with os.scandir(self.path) as entries:
+            for entry in entries:
+                if entry.name.endswith(SHARD_SUFFIX):
+                    actual[entry.name] = entry.stat().st_size
+        changed = False
+        for _, phone in contacts:
+            size = actual.get(shard_file_name(phone), 0)
+            recorded = self.sizes.get(phone, 0)
+            if size == recorded:
+                continue
+            changed = True
+            if size < recorded:
+                # Dosya kısalmış: özet son mesajdan yeniden kurulur
+                contacts.summaries.pop(phone, None)
+                records, good_offset = self.read_shard_from(phone, 0)
+                if records:
+                    contacts.note_message(phone, records[-1])
+                self.counts[phone] = len(records)
+            else:
+                records, good_offset = self.read_shard_from(phone, recorded)
+                for msg in records:
+                    contacts.note_message(phone, msg, msg.get("sender") == phone)
+                self.counts[phone] = self.counts.get(phone, 0) + len(records)
+            if good_offset < size:
+                with open(self.shard_path(phone), "r+b") as f:
+                    f.truncate(good_offset)
+            self.sizes[phone] = good_offset
+        return changed
+
+    def read_shard_from(self, phone, offset):
+        records = []
+        path = self.shard_path(phone)
+        if not os.path.exists(path):
+            return records, 0
+        with open(path, "rb") as f:
+            f.seek(offset)
+            for line in f:
+                if not line.endswith(b"\n"):
+                    break
+                try:
+                    records.append(json.loads(line))
+                except ValueError:
+                    break
+                offset += len(line)
+        return records, offset
+
+    def read_manifest(self):
+        paths = [self.manifest_path] + [f"{self.manifest_path}.{i}" for i in range(1, SNAPSHOT_BACKUPS + 1)]
+        for path in paths:
+            if not os.path.exists(path):
+                continue
+            try:
+                with open(path, "rb") as f:
+                    raw = f.read()
+                if PROFILER.enabled:
+                    PROFILER.count_io(read=len(raw))
+                manifest = json.loads(raw)
+                manifest["contacts"]
+            except (OSError, ValueError, KeyError) as e:
+                self.load_warnings.append(f"{path} okunamadı: {e}")
+                continue
+            if path != self.manifest_path:
+                self.load_warnings.append(f"Kişi listesi yedekten kurtarıldı: {path}")
+            return manifest
+        return {}
+
+    def write_manifest(self):
+        manifest = {
+            "contacts": list(self.contacts),
+            "summaries": self.contacts.summaries,
+            "sizes": {phone: size for phone, size in self.sizes.items() if phone in self.contacts},
+            "counts": {phone: count for phone, count in self.counts.items() if phone in self.contacts},
+        }
+        data = json.dumps(manifest, ensure_ascii=False).encode("utf-8")
+        write_atomic(self.manifest_path, lambda f: f.write(data), SNAPSHOT_BACKUPS)
+        self.summaries_dirty = False
+
+    def read_shard(self, phone):
+        # ShardedMessages.lock altında çağrılır
+        path = self.shard_path(phone)
+        if not os.path.exists(path):
+            return Conversation(), 0
+        records, good_offset = read_journal(path)
+        if good_offset < os.path.getsize(path):
+            # yarım kalmış son satırı at, yoksa sonraki kayıt onunla birleşir
+            with open(path, "r+b") as f:
+                f.truncate(good_offset)
+            self.sizes[phone] = min(self.sizes.get(phone, 0), good_offset)
+        self.counts[phone] = len(records)
+        return Conversation(records), good_offset
+
+    def read_shard_tail(self, phone, count):
+        # Dosyanın sonundan geriye doğru blok blok okunur; son count satır döner.
+        # ShardedMessages.lock altında çağrılır (yarım satır açılışta kesilmiştir)
+        with open(self.shard_path(phone), "rb") as f:
+            pos = f.seek(0, os.SEEK_END)
+            data = b""
+            while pos > 0 and data.count(b"\n") <= count:
+                step = min(ATTACHMENT_CHUNK, pos)
+                pos -= step
+                f.seek(pos)
+                data = f.read(step) + data
+        if PROFILER.enabled:
+            PROFILER.count_io(read=len(data))
+        lines = data.split(b"\n")[:-1]
+        return [json.loads(line) for line in lines[max(len(lines) - count, 0):]] if count else []
+
+    def last_seq(self, messages, phone):
+        # Önbellekte olmayan sohbetin tüm mesajları diskte, sayısı manifest'te
+        msgs = messages.cache.get(phone)
+        return self.counts.get(phone, 0) if msgs is None else len(msgs)
+
+    def messages_since(self, messages, phone, seq):
+        with messages.lock:
+            if phone not in messages.cache:
+                count = self.counts.get(phone, 0) - seq
+                return numbered(self.read_shard_tail(phone, count), seq + 1) if count > 0 else []
+        return conversation_since(messages[phone], seq)
+
+    def append(self, record):
+        self.append_many([record])
+
+    def append_many(self, records):
+        # Mesajlar kişi başına gruplanır; her dosyaya tek write + fsync.
+        # Manifest sadece kişi değişikliği varsa yeniden yazılır; özetler
+        # (son mesaj, okunmamış) bellekte güncellenip sıkıştırmada yazılır.
+        shards = {}
+        deleted = []
+        manifest_changed = False
+        before = {}  # phone -> (özet, boy, sayı); yazma başarısız olursa geri alınır
+        for record in records:
+            op = record.get("op")
+            phone = record.get("phone")
+            if op == "message":
+                if phone not in before:
+                    summary = self.contacts.summaries.get(phone)
+                    before[phone] = (summary and list(summary), self.sizes.get(phone), self.counts.get(phone))
+                line = json.dumps(record["msg"], ensure_ascii=False).encode("utf-8") + b"\n"
+                shards.setdefault(phone, []).append(line)
+                self.contacts.note_message(phone, record["msg"], record.get("unread", False))
+                self.summaries_dirty = True
+                continue
+            apply_record(self.contacts, {}, record)
+            if op == "read":
+                self.summaries_dirty = True
+                continue
+            manifest_changed = True
+            if op == "delete_contact":
+                shards.pop(phone, None)
+                deleted.append(phone)
+
+        with self.messages.lock if self.messages is not None else contextlib.nullcontext():
+            # Manifest'teki boylar bu batch'in sonrasını gösterir; yazma yarıda
+            # kalırsa açılışta dosya kısa bulunur ve özet yeniden kurulur
+            for phone in deleted:
+                self.sizes.pop(phone, None)
+                self.counts.pop(phone, None)
+            blobs = {phone: b"".join(lines) for phone, lines in shards.items()}
+            for phone, data in blobs.items():
+                self.counts[phone] = self.counts.get(phone, 0) + len(shards[phone])
+                self.sizes[phone] = self.sizes.get(phone, 0) + len(data)
+            offsets = {}  # phone -> yazmadan önceki dosya boyu
+            try:
+                if manifest_changed:
+                    self.write_manifest()
+                # Silinen kişinin dosyası, aynı batch'te yeniden eklenip yazılmadan önce kaldırılır
+                for phone in deleted:
+                    if os.path.exists(self.shard_path(phone)):
+                        os.remove(self.shard_path(phone))
+                created = False
+                for phone, data in blobs.items():
+                    path = self.shard_path(phone)
+                    created = created or not os.path.exists(path)
+                    with open(path, "ab") as f:
+                        offsets[phone] = f.tell()
+                        f.write(data)
+                        f.flush()
+                        os.fsync(f.fileno())
+                    if PROFILER.enabled:
+                        PROFILER.count_io(written=len(data))
+                if created:
+                    fsync_dir(self.path)
+            except OSError:
+                # PersistenceWorker batch'i yeniden dener: kişi işlemleri tekrar
+                # uygulanabilir, mesajların etkisi ise geri alınır
+                self.rollback(before, offsets)
+                raise
+            if self.messages is not None:
+                for phone, data in blobs.items():
+                    self.messages.written(phone, len(shards[phone]), len(data))
+
+    def rollback(self, before, offsets):
+        for phone, offset in offsets.items():
+            try:
+                os.truncate(self.shard_path(phone), offset)
+            except OSError:
+                pass
+        for phone, (summary, size, count) in before.items():
+            if summary is not None:
+                self.contacts.summaries[phone] = summary
+            else:
+                self.contacts.summaries.pop(phone, None)
+            for values, value in ((self.sizes, size), (self.counts, count)):
+                if value is None:
+                    values.pop(phone, None)
+                else:
+                    values[phone] = value
+
+    def import_json(self):
+        # İlk açılışta mevcut JSON verisi (journal dahil) kişi dosyalarına bölünür.
+        # Manifest en son yazılır: varlığı aktarmanın tamamlandığını gösterir.
+        json_store = JsonStore(self.json_path)
+        try:
+            contacts, messages = json_store.load()
+        finally:
+            json_store.close()
+        for phone, msgs in messages.items():
+            if not msgs:
+                continue
+            data = b"".join(json.dumps(msg, ensure_ascii=False).encode("utf-8") + b"\n" for msg in msgs)
+            with open(self.shard_path(phone), "wb") as f:
+                f.write(data)
+                if not hasattr(os, "sync"):
+                    f.flush()
+                    os.fsync(f.fileno())
+            self.sizes[phone] = len(data)
+            self.counts[phone] = len(msgs)
+        if hasattr(os, "sync"):
+            os.sync()  # binlerce dosya için tek tek fsync yerine
+        self.contacts = contacts
+        self.write_manifest()
+
+    def prepare_compact(self, contacts, messages, keep=()):
+        return None
+
+    def compact(self, payload):
+        if self.summaries_dirty:
+            with self.messages.lock if self.messages is not None else contextlib.nullcontext():
+                self.write_manifest()
+
+    def close(self):
+        if self.summaries_dirty:
+            self.write_manifest()
+        self.messages = None
+
+
+def create_store(directory):
+    if STORAGE_BACKEND == "sqlite":
+        return SqliteStore(os.path.join(directory, SQLITE_FILE))
+    if STORAGE_BACKEND == "binary":
+        return BinaryStore(os.path.join(directory, BINARY_FILE))
+    if STORAGE_BACKEND == "sharded":
+        return ShardedStore(os.path.join(directory, SHARD_DIR))
+    return JsonStore(os.path.join(directory, DATA_FILE))
+
+# ========== Message Search ==========
+# Sohbet başına ters indeks: token -> sohbetteki mesaj sıraları. Mesajlar
+# sadece sona eklendiği için indeks sayaçla artımlı güncellenir; kişi silinince
+# sadece o sohbetin girdisi atılır. İndeks store dosyasının yanına yazılır ve
+# açılışta sadece değişen sohbetler yeniden indekslenir. Arşive taşınmış
+# mesajlar indekste yoktur; arama sıcak katmanla sınırlıdır.
+
+
+def turkish_fold(text):
+    # str.lower() "I"yı "i"ye, "İ"yi "i̇"ye çevirir; Türkçe kurallarını önce uygula
+    # (str.translate sözlük tablosuyla ASCII dışı metinlerde birkaç kat yavaş)
+    return text.replace("I", "ı").replace("İ", "i").lower()
+
+
+def tokenize(text):
+    return re.findall(r"\w+", turkish_fold(text))
+
+
+def loaded_conversations(messages):
+    # Tembel store'larda sadece RAM'e alınmış sohbetler
+    if isinstance(messages, dict):
+        return messages
+    return messages.loaded()
+
+
+def peek_conversation(messages, phone):
+    # Tembel store'larda sohbet okunur ama önbelleğe alınmaz
+    if isinstance(messages, dict):
+        return messages[phone]
+    return messages.peek(phone)
+
+
+def pin_conversation(messages, phone):
+    # Açık sohbet önbellekten atılmasın (sadece sharded store'da önbellek var)
+    pin = getattr(messages, "pin", None)
+    if pin is not None:
+        pin(phone)
+
+
+class SearchIndex:
+    def __init__(self, path):
+        self.path = path
+        self.counts = {}  # phone -> indekslenmiş mesaj sayısı
+        self.bases = {}  # phone -> indekslenirken arşivdeki mesaj sayısı (sıralar buna göre)
+        self.postings = {}  # phone -> {token: array("I", [mesaj sırası, ...])}
+        self.token_phones = {}  # token -> {phone, ...}
+        self.dirty = False
+
+    def load(self):
+        if not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            if data.get("byteorder") != sys.byteorder:
+                return
+            for phone, entry in data["conversations"].items():
+                postings = {}
+                for token, encoded in entry["postings"].items():
+                    positions = array("I")
+                    positions.frombytes(base64.b64decode(encoded))
+                    postings[token] = positions
+                    self.token_phones.setdefault(token, set()).add(phone)
+                self.postings[phone] = postings
+                self.counts[phone] = entry["count"]
+                self.bases[phone] = entry.get("base", 0)
+        except (OSError, ValueError, KeyError):
+            # Bozuk indeks veri kaybı değildir; sohbetler açıldıkça yeniden kurulur
+            self.counts, self.bases, self.postings, self.token_phones = {}, {}, {}, {}
+
+    def save(self):
+        if not self.dirty:
+            return
+        data = {
+            "byteorder": sys.byteorder,
+            "conversations": {
+                phone: {
+                    "count": self.counts[phone],
+                    "base": self.bases.get(phone, 0),
+                    "postings": {
+                        token: base64.b64encode(trimmed(positions, self.counts[phone]).tobytes()).decode("ascii")
+                        for token, positions in postings.items()
+                    }
+                }
+                for phone, postings in self.postings.items()
+            }
+        }
+        write_atomic(self.path, lambda f: f.write(json.dumps(data, ensure_ascii=False).encode("utf-8")))
+        self.dirty = False
+
+    def snapshot(self):
+        # GUI thread'inde: işçi thread'inde kaydedilecek kopya. Sıra dizileri
+        # kopyalanmaz; kopyadan sonra eklenen sıralar kayıtta sayıya göre kesilir
+        copy = SearchIndex(self.path)
+        copy.counts = dict(self.counts)
+        copy.bases = dict(self.bases)
+        copy.postings = {phone: dict(postings) for phone, postings in self.postings.items()}
+        copy.dirty = self.dirty
+        self.dirty = False
+        return copy
+
+    def sync(self, phone, msgs):
+        # Sohbetin indekslenmemiş kuyruğunu ekler; normalde sadece yeni mesaj
+        count = self.counts.get(phone, 0)
+        if len(msgs) < count or self.bases.get(phone, 0) != msgs.archived:
+            # Sohbet kısaldı ya da başı arşive taşındı: sıralar kaydı, baştan indekslenir
+            self.remove(phone)
+            count = 0
+        if phone in self.counts and count == len(msgs):
+            return
+        postings = self.postings.setdefault(phone, {})
+        for position in range(count, len(msgs)):
+            for token in set(tokenize(msgs.texts[position])):
+                positions = postings.get(token)
+                if positions is None:
+                    positions = postings[token] = array("I")
+                    self.token_phones.setdefault(token, set()).add(phone)
+                positions.append(position)
+        self.counts[phone] = len(msgs)
+        self.bases[phone] = msgs.archived
+        self.dirty = True
+
+    def remove(self, phone):
+        self.bases.pop(phone, None)
+        for token in self.postings.pop(phone, {}):
+            phones = self.token_phones.get(token)
+            if phones is not None:
+                phones.discard(phone)
+                if not phones:
+                    del self.token_phones[token]
+        if self.counts.pop(phone, None) is not None:
+            self.dirty = True
+
+    def search(self, query):
+        # {phone: [mesaj sırası, ...]}; tüm kelimeleri içeren mesajlar
+        tokens = set(tokenize(query))
+        if not tokens:
+            return {}
+        candidates = None
+        for token in tokens:
+            phones = self.token_phones.get(token, set())
+            candidates = set(phones) if candidates is None else candidates & phones
+            if not candidates:
+                return {}
+        hits = {}
+        for phone in candidates:
+            postings = self.postings[phone]
+            lists = sorted((postings[token] for token in tokens), key=len)
+            if len(lists) == 1:
+                hits[phone] = lists[0].tolist()
+                continue
+            positions = set(lists[0]).intersection(*lists[1:])
+            if positions:
+                hits[phone] = sorted(positions)
+        return hits
+
+
+def trimmed(positions, count):
+    # Sıralar artan eklenir; count ve ötesi henüz indekse sayılmamış mesajlar
+    end = bisect.bisect_left(positions, count)
+    return positions if end == len(positions) else positions[:end]
+
+
+def search_messages(index, messages, query):
+    # Sohbetler mesaj eklendikçe indekslenir. İndekste hiç olmayanlar (indeks
+    # dosyası yoksa ya da bozuksa) bir kez, önbelleğe alınmadan okunup eklenir.
+    # En çok eşleşmesi olan sohbet önce gelecek şekilde
+    # [(phone, [mesaj sırası, ...]), ...] döndürür
+    for phone, msgs in list(loaded_conversations(messages).items()):
+        index.sync(phone, msgs)  # kuyruğu indekslenmişse hemen döner
+    for phone in messages:
+        if phone not in index.counts:
+            index.sync(phone, peek_conversation(messages, phone))
+    hits = index.search(query)
+    # Arşivleme sıcak mesajların sırasını kaydırır; bu sohbetler yeniden indekslenir
+    stale = [phone for phone in hits if index.bases.get(phone, 0) != messages[phone].archived]
+    if stale:
+        for phone in stale:
+            index.sync(phone, messages[phone])
+        hits = index.search(query)
+    return sorted(hits.items(), key=lambda item: len(item[1]), reverse=True)
+
+# ========== Persistence Worker ==========
+# Diske yazma GUI thread'inde yapılmaz: arayüz değişiklik kayıtlarını kuyruğa
+# bırakıp hemen döner. İşçi thread ilk kayıttan sonra SAVE_DEBOUNCE_MS kadar
+# bekler, bu sürede gelen tüm kayıtları tek seferde store'a yazar. Yazma
+# başarısız olursa batch atılmaz, SAVE_RETRY_MS aralıkla yeniden denenir;
+# hata ve düzelme arayüze sinyalle bildirilir.
+class PersistenceSignals(QObject):
+    failed = Signal(str)
+    recovered = Signal()
+
+
+class PersistenceWorker(threading.Thread):
+    def __init__(self, store, debounce_ms=SAVE_DEBOUNCE_MS, read_only=False):
+        super().__init__(name="PersistenceWorker", daemon=True)
+        self.store = store
+        # Yükleme başarısız olduysa store'un durumu diskle tutarlı değildir:
+        # hiçbir şey yazılmaz, dosyalar kurtarma için olduğu gibi kalır
+        self.read_only = read_only
+        self.debounce = debounce_ms / 1000
+        self.retry = SAVE_RETRY_MS / 1000
+        self.queue = queue.Queue()
+        self.unsaved = store.pending  # son snapshot'tan beri kuyruğa giren kayıt sayısı
+        self.stopped = False
+        self.signals = PersistenceSignals()  # GUI thread'inde oluşur, sinyaller kuyruklu gelir
+        self.error = None  # son yazma hatası; yazmalar düzelince None
+
+    def submit(self, record):
+        self.submit_many([record])
+
+    def submit_many(self, records):
+        self.unsaved += len(records)
+        self.queue.put(("records", records))
+
+    def after_saved(self, callback):
+        # Şu ana kadar kuyruğa giren kayıtlar diske yazılınca işçi thread'inde çağrılır
+        if not self.read_only:
+            self.queue.put(("saved", callback))
+
+    def request_compact(self, contacts, messages, keep=()):
+        if self.unsaved == 0 or self.read_only:
+            return
+        self.unsaved = 0
+        self.queue.put(("compact", self.store.prepare_compact(contacts, messages, keep)))
+
+    def save_index(self, index):
+        # Arama indeksi store'un yazmalarıyla birlikte, sıradaki sıkıştırmadan sonra kaydedilir
+        if index.dirty and not self.read_only:
+            self.queue.put(("index", (index, index.snapshot())))
+
+    def flush(self):
+        # Kuyruktaki her şey diske yazılana kadar bekler; yazılamadıysa False
+        done = threading.Event()
+        self.queue.put(("flush", done))
+        done.wait()
+        return self.error is None
+
+    def stop(self):
+        if self.stopped:
+            return
+        self.stopped = True
+        self.queue.put(("stop", None))
+        self.join()
+
+    def run(self):
+        batch = []  # yazılamayan kayıtlar sonraki denemede yeni gelenlerle birlikte yazılır
+        waiting = []  # batch yazılınca çağrılacak after_saved fonksiyonları
+        while True:
+            try:
+                kind, value = self.queue.get(timeout=self.retry if batch else None)
+            except queue.Empty:
+                kind = None
+            if kind == "records":
+                batch.extend(value)
+                deadline = time.monotonic() + self.debounce
+                while True:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        kind = None
+                        break
+                    try:
+                        kind, value = self.queue.get(timeout=remaining)
+                    except queue.Empty:
+                        kind = None
+                        break
+                    if kind == "saved":
+                        waiting.append(value)
+                    elif kind == "records":
+                        batch.extend(value)
+                    else:
+                        break
+            elif kind == "saved":
+                waiting.append(value)
+            if batch:
+                batch = self.write_batch(batch)
+
+            if kind == "compact":
+                try:
+                    covered = self.store.compact(value)
+                except Exception as e:
+                    self.report(e)
+                else:
+                    # Snapshot kuyruktaki kayıtlardan sonra hazırlandı; kapsıyorsa
+                    # yazılamamış batch'e artık gerek yok
+                    if covered:
+                        batch = []
+                    if not batch:
+                        self.report(None)
+            if waiting and not batch:
+                for callback in waiting:
+                    callback()
+                waiting = []
+            if kind == "index":
+                index, snapshot = value
+                try:
+                    snapshot.save()
+                except OSError as e:
+                    # İndeks veri değildir; kapanışta ya da sonraki sıkıştırmada tekrar denenir
+                    index.dirty = True
+                    print(f"Arama indeksi kaydedilemedi: {e}", file=sys.stderr)
+            elif kind == "flush":
+                value.set()
+            elif kind == "stop":
+                if batch:
+                    print(f"Kayıt hatası: {len(batch)} değişiklik diske yazılamadı", file=sys.stderr)
+                self.safely(self.store.close)
+                return
+
+    def write_batch(self, batch):
+        # Yazılamayan kayıtları döndürür
+        if self.read_only:
+            return []
+        try:
+            self.store.append_many(batch)
+        except Exception as e:
+            self.report(e)
+            return batch
+        self.report(None)
+        return []
+
+    def safely(self, func, *args):
+        # İşçi thread'i bir hata yüzünden ölürse sonraki tüm yazmalar kaybolur
+        try:
+            func(*args)
+        except Exception as e:
+            self.report(e)
+
+    def report(self, error):
+        # Sadece durum değişince bildirilir; her yeniden deneme uyarı açmaz
+        if error is not None and self.error is None:
+            print(f"Kayıt hatası: {error}", file=sys.stderr)
+            self.signals.failed.emit(str(error))
+        elif error is None and self.error is not None:
+            self.signals.recovered.emit()
+        self.error = error
+
+# ========== Attachments ==========
+# Dosya ekleri içerik adresli saklanır: ATTACHMENT_DIR/<sha256[:2]>/<sha256>.
+# Aynı dosya kaç sohbette gönderilirse gönderilsin diskte bir kez durur. Mesaj
+# sadece ekin bilgisini taşır ({"sha256", "name", "size", "mime"} ve resimse
+# "width"/"height"); metin alanı dosya adıdır, böylece arama ve kişi özetleri
+# değişmeden çalışır. Hash, kopyalama, dışa aktarma ve küçük resim üretimi
+# AttachmentWorker thread'inde yapılır; dosyanın tamamı hiçbir zaman RAM'e alınmaz.
+IMAGE_SIGNATURES = (
+    (b"\x89PNG\r\n\x1a\n", "image/png"),
+    (b"\xff\xd8\xff", "image/jpeg"),
+    (b"GIF87a", "image/gif"),
+    (b"GIF89a", "image/gif"),
+    (b"BM", "image/bmp"),
+)
+ATTACHMENT_DIGEST_PATTERN = re.compile(r"[0-9a-f]{64}")
+
+
+def sniff_mime(head):
+    for signature, mime in IMAGE_SIGNATURES:
+        if head.startswith(signature):
+            return mime
+    if head[:4] == b"RIFF" and head[8:12] == b"WEBP":
+        return "image/webp"
+    return "application/octet-stream"
+
+
+def file_digest(path):
+    # Dosya memory-map edilir ve parça parça hash'lenir; memoryview dilimleri kopyalanmaz
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        size = os.fstat(f.fileno()).st_size
+        if size == 0:
+            return digest.hexdigest(), 0, b""
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            view = memoryview(mapped)
+            try:
+                for offset in range(0, size, ATTACHMENT_CHUNK):
+                    digest.update(view[offset:offset + ATTACHMENT_CHUNK])
+                head = bytes(view[:16])
+            finally:
+                view.release()
+    return digest.hexdigest(), size, head
+
+
+def received_attachment(value):
+    # Başka bir cihazdan gelen ek bilgisi; içerik bu cihazda yoksa mesaj
+    # "bu cihazda yok" diye gösterilir. sha256 dosya yoluna girdiği için
+    # sadece geçerli bir özet kabul edilir, diğer alanlar tiplerine göre süzülür.
+    if not isinstance(value, dict) or not isinstance(value.get("sha256"), str) \
+            or not ATTACHMENT_DIGEST_PATTERN.fullmatch(value["sha256"]):
+        return None
+    attachment = {"sha256": value["sha256"]}
+    for key, kind in (("name", str), ("size", int), ("mime", str), ("width", int), ("height", int)):
+        if isinstance(value.get(key), kind) and not isinstance(value[key], bool):
+            attachment[key] = value[key]
+    if not (attachment.get("width", 0) > 0 and attachment.get("height", 0) > 0):
+        attachment.pop("width", None)
+        attachment.pop("height", None)
+    return attachment
+
+
+def copy_chunked(source, target):
+    # Geçici dosyaya kopyala, fsync et, sonra rename (write_atomic ile aynı düzen)
+    tmp_path = target + ".tmp"
+    with open(source, "rb") as src, open(tmp_path, "wb") as dst:
+        while True:
+            chunk = src.read(ATTACHMENT_CHUNK)
+            if not chunk:
+                break
+            dst.write(chunk)
+        dst.flush()
+        os.fsync(dst.fileno())
+    os.replace(tmp_path, target)
+    fsync_dir(os.path.dirname(target))
+
+
+class AttachmentStore:
+    def __init__(self, path):
+        self.path = path
+        self.thumbnail_dir = os.path.join(path, "thumbs")
+
+    def blob_path(self, digest):
+        return os.path.join(self.path, digest[:2], digest)
+
+    def thumbnail_path(self, digest):
+        return os.path.join(self.thumbnail_dir, f"{digest}-{THUMBNAIL_SIZE}.png")
+
+    def exists(self, digest):
+        return os.path.exists(self.blob_path(digest))
+
+    def add(self, source):
+        digest, size, head = file_digest(source)
+        path = self.blob_path(digest)
+        if not os.path.exists(path):
+            # Yeni içerik; aynısı zaten varsa (başka sohbette gönderilmiş) kopyalanmaz
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            copy_chunked(source, path)
+        attachment = {"sha256": digest, "name": os.path.basename(source), "size": size, "mime": sniff_mime(head)}
+        if attachment["mime"].startswith("image/"):
+            # Sadece başlık okunur; mesaj satırının yüksekliği küçük resim beklenmeden bilinir
+            image_size = QImageReader(path).size()
+            if image_size.isValid():
+                attachment["width"] = image_size.width()
+                attachment["height"] = image_size.height()
+        return attachment
+
+    def export(self, digest, target):
+        copy_chunked(self.blob_path(digest), target)
+
+    def thumbnail(self, digest):
+        # Disk önbelleğinde yoksa üretilir; QImageReader küçültülmüş boyutta çözer
+        path = self.thumbnail_path(digest)
+        if os.path.exists(path):
+            image = QImage(path)
+            if not image.isNull():
+                return image
+        reader = QImageReader(self.blob_path(digest))
+        reader.setAutoTransform(True)
+        size = reader.size()
+        if size.isValid() and (size.width() > THUMBNAIL_SIZE or size.height() > THUMBNAIL_SIZE):
+            reader.setScaledSize(size.scaled(THUMBNAIL_SIZE, THUMBNAIL_SIZE, Qt.KeepAspectRatio))
+        image = reader.read()
+        if image.isNull():
+            return None
+        os.makedirs(self.thumbnail_dir, exist_ok=True)
+        tmp_path = path + ".tmp"
+        if image.save(tmp_path, "PNG"):
+            os.replace(tmp_path, path)
+        return image
+
+
+class AttachmentWorker(QObject):
+    # Dosya işleri sırayla tek bir thread'de yapılır; sonuçlar kuyruklu sinyalle GUI'ye gelir
+    added = Signal(str, object)  # phone, ek bilgisi
+    thumbnail_ready = Signal(str, object)  # sha256, QImage veya None
+    failed = Signal(str)
+
+    def __init__(self, store):
+        super().__init__()
+        self.store = store
+        self.queue = queue.Queue()
+        self.thread = threading.Thread(target=self.run, name="AttachmentWorker", daemon=True)
+        self.thread.start()
+
+    def add(self, phone, path):
+        self.queue.put(("add", (phone, path)))
+
+    def request_thumbnail(self, digest):
+        self.queue.put(("thumbnail", (digest,)))
+
+    def export(self, digest, target):
+        self.queue.put(("export", (digest, target)))
+
+    def stop(self):
+        self.queue.put(("stop", None))
+        self.thread.join()
+
+    def run(self):
+        while True:
+            kind, args = self.queue.get()
+            if kind == "stop":
+                return
+            try:
+                if kind == "add":
+                    phone, path = args
+                    self.added.emit(phone, self.store.add(path))
+                elif kind == "thumbnail":
+                    digest, = args
+                    self.thumbnail_ready.emit(digest, self.store.thumbnail(digest))
+                elif kind == "export":
+                    self.store.export(*args)
+            except (OSError, ValueError) as e:
+                if kind == "thumbnail":
+                    self.thumbnail_ready.emit(args[0], None)
+                self.failed.emit(str(e))
+
+
+class ThumbnailCache(QObject):
+    # GUI thread'inde, MessageDelegate için: küçük resim ilk çizimde istenir,
+    # hazır olunca görünüm yeniden çizilir. Bellekte son THUMBNAIL_CACHE resim tutulur.
+    changed = Signal()
+
+    def __init__(self, worker, limit=THUMBNAIL_CACHE):
+        super().__init__()
+        self.worker = worker
+        self.limit = limit
+        self.images = OrderedDict()  # sha256 -> QImage (None: üretilemedi)
+        self.requested = set()
+        self.available = {}  # sha256 -> dosya bu cihazda var mı
+        worker.thumbnail_ready.connect(self.on_ready)
+
+    def exists(self, digest):
+        available = self.available.get(digest)
+        if available is None:
+            available = self.available[digest] = self.worker.store.exists(digest)
+        return available
+
+    def get(self, digest):
+        if digest in self.images:
+            self.images.move_to_end(digest)
+            return self.images[digest]
+        if digest not in self.requested and self.exists(digest):
+            self.requested.add(digest)
+            self.worker.request_thumbnail(digest)
+        return None
+
+    def on_ready(self, digest, image):
+        self.requested.discard(digest)
+        self.images[digest] = image
+        while len(self.images) > self.limit:
+            self.images.popitem(last=False)
+        self.changed.emit()
+
+# ========== Relay Transport ==========
+# İstemciler arası mesajlar bir aktarma sunucusu üzerinden gider. Her çerçeve
+# 4 baytlık (big-endian) uzunluk + düz (sıkıştırılmamış) UTF-8 JSON'dur:
+#   istemci -> sunucu  {"type": "hello", "phone", "token"}
+#                      {"type": "msg", "to", "msg": {"id", "sender", "text"}}
+#                      {"type": "ack", "upto"}   (ref'i upto'ya kadar olan mesajlar diske yazıldı)
+#   sunucu -> istemci  {"type": "msg", "ref", "from", "msg": {"id", "sender", "text"}}
+#                      {"type": "delivered", "ids"}   (alıcı bu kimlikli mesajları kaydetti)
+#                      {"type": "error", "message"}   (hello reddedildi, bağlantı kapanır)
+# Teslim uçtan uca onaylanır. Gönderen mesajı önce outbox dosyasına yazar ve
+# "delivered" gelene kadar her bağlanışta (program yeniden açılsa da) tekrar
+# gönderir. Sunucu ilettiği mesajı alıcı "ack" gönderene kadar saklar; alıcının
+# bağlantısı koparsa onaylanmamış mesajlar kuyruğun başına döner. ref bağlantıya
+# özgü artan bir sayıdır. Tekrarlar sunucuda (gönderen, mesaj kimliği) ile,
+# alıcıda mesaj kimliğiyle elenir.
+# Hesap doğrulama: her hesap dizininde rastgele bir token üretilir. Sunucu bir
+# numarayı ilk gören token'ın özetini saklar; sonraki hello'lar aynı token'ı
+# göstermezse reddedilir, numaranın bekleyen mesajları ve açık bağlantısı korunur.
+FRAME_HEADER = struct.Struct(">I")
+
+
+def encode_frame(obj):
+    body = json.dumps(obj, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+    return FRAME_HEADER.pack(len(body)) + body
+
+
+class FrameDecoder:
+    def __init__(self, max_frame=RELAY_MAX_FRAME):
+        self.buffer = bytearray()
+        self.max_frame = max_frame
+
+    def feed(self, data):
+        # Gelen parçadaki tüm tam çerçeveleri döndürür, yarım kalanı saklar
+        buffer = self.buffer
+        buffer += data
+        frames = []
+        pos = 0
+        while len(buffer) - pos >= FRAME_HEADER.size:
+            (length,) = FRAME_HEADER.unpack_from(buffer, pos)
+            if length > self.max_frame:
+                raise ValueError("çerçeve çok büyük")
+            end = pos + FRAME_HEADER.size + length
+            if end > len(buffer):
+                break
+            frames.append(json.loads(buffer[pos + FRAME_HEADER.size:end]))
+            pos = end
+        del buffer[:pos]
+        return frames
+
+
+def parse_address(address):
+    host, _, port = address.rpartition(":")
+    return host or "127.0.0.1", int(port)
+
+
+def relay_token(directory):
+    # İlk çağrıda üretilir ve hesap dizininde saklanır
+    path = os.path.join(directory, RELAY_TOKEN_FILE)
+    try:
+        with open(path, encoding="utf-8") as f:
+            token = f.read().strip()
+        if token:
+            return token
+    except FileNotFoundError:
+        pass
+    token = os.urandom(32).hex()
+    os.makedirs(directory, exist_ok=True)
+    write_atomic(path, lambda f: f.write(token.encode("ascii")))
+    return token
+
+
+def token_digest(token):
+    return hashlib.sha256(token.encode("utf-8")).hexdigest()
+
+
+class RelayOutbox:
+    # Gönderilen mesajlar {"to", "msg"} satırı olarak eklenir, teslim onayı
+    # gelenler {"done": [id, ...]} satırıyla kapatılır. Açılışta kalanlar okunur
+    # ve dosya sadece onlarla yeniden yazılır; hepsi onaylanınca dosya boşaltılır.
+    def __init__(self, path):
+        self.path = path
+        self.file = None
+
+    def load(self):
+        pending = {}  # id -> (to, msg); ekleme sırası gönderim sırasıdır
+        try:
+            with open(self.path, encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                        if "done" in entry:
+                            for message_id in entry["done"]:
+                                pending.pop(message_id, None)
+                        else:
+                            pending[entry["msg"]["id"]] = (entry["to"], entry["msg"])
+                    except (ValueError, KeyError, TypeError):
+                        continue  # yarım yazılmış son satır
+        except FileNotFoundError:
+            pass
+        except OSError as e:
+            print(f"Gönderim kuyruğu okunamadı: {e}", file=sys.stderr)
+            return []
+        data = "".join(json.dumps({"to": to, "msg": msg}, ensure_ascii=False) + "\n" for to, msg in pending.values())
+        try:
+            write_atomic(self.path, lambda f: f.write(data.encode("utf-8")))
+            self.file = open(self.path, "a", encoding="utf-8")
+        except OSError as e:
+            print(f"Gönderim kuyruğu yazılamadı: {e}", file=sys.stderr)
+        return list(pending.values())
+
+    def write(self, entry):
+        if self.file is None:
+            return
+        try:
+            self.file.write(json.dumps(entry, ensure_ascii=False) + "\n")
+            self.file.flush()
+            os.fsync(self.file.fileno())
+        except OSError as e:
+            # Mesaj bu oturumda yine de gönderilir; sadece yeniden açılışta tekrar denenmez
+            print(f"Gönderim kuyruğu yazılamadı: {e}", file=sys.stderr)
+
+    def add(self, phone, msg):
+        self.write({"to": phone, "msg": msg})
+
+    def done(self, ids):
+        self.write({"done": ids})
+
+    def clear(self):
+        if self.file is None:
+            return
+        try:
+            self.file.truncate(0)
+        except OSError:
+            pass  # bir sonraki açılışta zaten sıkıştırılır
+
+    def close(self):
+        if self.file is not None:
+            self.file.close()
+            self.file = None
+
+
+class RelayConnection(asyncio.Protocol):
+    def __init__(self, server):
+        self.server = server
+        self.decoder = FrameDecoder()
+        self.transport = None
+        self.phone = None
+        self.paused = False
+        self.outbox = []
+        self.next_ref = 0
+        self.inflight = OrderedDict()  # ref -> çerçeve; alıcı kaydettiğini onaylayana kadar
+
+    def connection_made(self, transport):
+        self.transport = transport
+        self.server.connections += 1
+
+    def data_received(self, data):
+        try:
+            frames = self.decoder.feed(data)
+        except ValueError:
+            self.transport.close()
+            return
+        for frame in frames:
+            kind = frame.get("type")
+            if kind == "hello" and self.phone is None:
+                self.server.register(self, frame)
+            elif kind == "msg" and self.phone is not None:
+                self.server.relay(self, frame)
+            elif kind == "ack" and self.phone is not None:
+                self.server.acknowledge(self, frame.get("upto"))
+
+    def ready(self):
+        return not self.paused and len(self.inflight) < self.server.window
+
+    def push(self, out):
+        # Alıcı onaylayana kadar saklanır; bağlantı koparsa kuyruğa geri döner
+        self.next_ref += 1
+        self.inflight[self.next_ref] = out
+        self.send(dict(out, ref=self.next_ref))
+
+    def send(self, obj):
+        # Aynı döngü turunda biriken çerçeveler tek write ile gönderilir
+        if not self.outbox:
+            asyncio.get_running_loop().call_soon(self.flush)
+        self.outbox.append(encode_frame(obj))
+
+    def flush(self):
+        if self.outbox and not self.transport.is_closing():
+            self.transport.write(b"".join(self.outbox))
+        self.outbox.clear()
+
+    def pause_writing(self):
+        self.paused = True
+
+    def resume_writing(self):
+        self.paused = False
+        self.server.drain(self)
+
+    def connection_lost(self, exc):
+        self.server.connections -= 1
+        self.server.unregister(self)
+
+
+class RelayServer:
+    # Tek thread, tek olay döngüsü; bağlantı başına sadece bir Protocol nesnesi
+    def __init__(self, queue_limit=RELAY_QUEUE_LIMIT, accounts_path=None, window=RELAY_WINDOW):
+        self.queue_limit = queue_limit
+        self.window = window
+        # phone -> token özeti. accounts_path verilmezse sadece bellekte tutulur;
+        # sunucu yeniden başlayınca numaralar (bekleyen mesajlar gibi) sıfırlanır
+        self.accounts_path = accounts_path
+        self.accounts = self.read_accounts()
+        self.accounts_saving = False
+        self.clients = {}  # phone -> RelayConnection
+        self.queues = {}  # phone -> deque; çevrimdışı veya yavaş alıcıların bekleyen çerçeveleri
+        self.pending = set()  # kuyrukta veya alıcıda onay bekleyen (gönderen, mesaj kimliği)
+        # phone -> deque; gönderen çevrimdışıyken gelen teslim onayları. Taşan onaylar
+        # kaybolursa gönderen mesajı tekrar yollar, alıcı tekrarı eleyip yeniden onaylar
+        self.confirmations = {}
+        self.connections = 0
+        self.relayed = 0
+        self.duplicates = 0
+        self.dropped = 0
+        self.rejected = 0
+
+    def read_accounts(self):
+        if not self.accounts_path or not os.path.exists(self.accounts_path):
+            return {}
+        with open(self.accounts_path, "rb") as f:
+            return json.load(f)
+
+    def write_accounts(self):
+        self.accounts_saving = False
+        data = json.dumps(self.accounts).encode("utf-8")
+        try:
+            write_atomic(self.accounts_path, lambda f: f.write(data))
+        except OSError as e:
+            print(f"Hesaplar kaydedilemedi: {e}", file=sys.stderr)
+
+    def authenticate(self, phone, token):
+        if not (isinstance(phone, str) and phone and isinstance(token, str) and 16 <= len(token) <= 256):
+            return False
+        digest = token_digest(token)
+        known = self.accounts.get(phone)
+        if known is not None:
+            return hmac.compare_digest(known, digest)
+        self.accounts[phone] = digest
+        if self.accounts_path and not self.accounts_saving:
+            self.accounts_saving = True
+            asyncio.get_running_loop().call_later(RELAY_ACCOUNTS_SAVE_DELAY, self.write_accounts)
+        return True
+
+    def register(self, conn, frame):
+        if not self.authenticate(frame.get("phone"), frame.get("token")):
+            # Sahibin bağlantısına ve bekleyen mesajlarına dokunulmaz
+            self.rejected += 1
+            conn.send({"type": "error", "message": "hesap doğrulanamadı"})
+            conn.flush()
+            conn.transport.close()
+            return
+        conn.phone = frame["phone"]
+        old = self.clients.get(conn.phone)
+        if old is not None and old is not conn:
+            # Eski bağlantıda onay bekleyenler yenisine sırası bozulmadan gider
+            self.requeue(old)
+            old.transport.close()
+        self.clients[conn.phone] = conn
+        ids = self.confirmations.pop(conn.phone, None)
+        if ids:
+            conn.send({"type": "delivered", "ids": list(ids)})
+        self.drain(conn)
+
+    def unregister(self, conn):
+        if self.clients.get(conn.phone) is conn:
+            del self.clients[conn.phone]
+        self.requeue(conn)
+
+    def requeue(self, conn):
+        if not conn.inflight:
+            return
+        queued = self.queues.setdefault(conn.phone, deque())
+        queued.extendleft(reversed(conn.inflight.values()))
+        conn.inflight.clear()
+
+    def relay(self, conn, frame):
+        to, msg = frame.get("to"), frame.get("msg")
+        if not (isinstance(to, str) and to and isinstance(msg, dict)):
+            return
+        message_id = msg.get("id")
+        if not (isinstance(message_id, str) and MESSAGE_ID_PATTERN.fullmatch(message_id)):
+            return  # teslim onayı kimlikle eşleştirilir; kimliksiz mesaj iletilemez
+        key = (conn.phone, message_id)
+        if key in self.pending:
+            self.duplicates += 1  # onay gelmeden yeniden bağlanan gönderenin tekrarı
+            return
+        self.pending.add(key)
+        out = {"sender": conn.phone, "text": msg.get("text", ""), "id": message_id}
+        # Zaman gönderenin kopyasıyla aynı kalsın diye aynen iletilir; istemci
+        # geçersizini kendisi yeniler
+        if "timestamp" in msg:
+            out["timestamp"] = msg["timestamp"]
+        if isinstance(msg.get("attachment"), dict):
+            out["attachment"] = msg["attachment"]  # sadece bilgi; dosyanın kendisi aktarılmaz
+        self.deliver(to, {"type": "msg", "from": conn.phone, "msg": out})
+
+    def deliver(self, phone, out):
+        self.relayed += 1
+        target = self.clients.get(phone)
+        queued = self.queues.get(phone)
+        if target is not None and not queued and target.ready():
+            target.push(out)
+            return
+        if queued is None:
+            queued = self.queues[phone] = deque()
+        if len(queued) >= self.queue_limit:
+            # Gönderen onay almadığı için mesajı bir sonraki bağlanışında tekrar yollar
+            dropped = queued.popleft()
+            self.pending.discard((dropped["from"], dropped["msg"]["id"]))
+            self.dropped += 1
+        queued.append(out)
+
+    def acknowledge(self, conn, upto):
+        if type(upto) is not int:
+            return
+        delivered = {}  # gönderen -> kimlikler
+        for ref in list(itertools.takewhile(lambda ref: ref <= upto, conn.inflight)):
+            out = conn.inflight.pop(ref)
+            sender, message_id = out["from"], out["msg"]["id"]
+            self.pending.discard((sender, message_id))
+            delivered.setdefault(sender, []).append(message_id)
+        for sender, ids in delivered.items():
+            target = self.clients.get(sender)
+            if target is not None:
+                target.send({"type": "delivered", "ids": ids})
+            else:
+                self.confirmations.setdefault(sender, deque(maxlen=self.queue_limit)).extend(ids)
+        if delivered:
+            self.drain(conn)
+
+    def drain(self, conn):
+        # Bekleyenler sırayla, alıcının tamponu veya onay penceresi dolana kadar gönderilir
+        queued = self.queues.get(conn.phone)
+        while queued and conn.ready():
+            conn.push(queued.popleft())
+            conn.flush()
+        if queued is not None and not queued:
+            del self.queues[conn.phone]
+
+    async def serve(self, host, port):
+        loop = asyncio.get_running_loop()
+        server = await loop.create_server(lambda: RelayConnection(self), host, port, backlog=4096)
+        print(f"Aktarma sunucusu dinliyor: {host}:{port}", file=sys.stderr)
+        async with server:
+            await server.serve_forever()
+
+
+class RelayClientProtocol(asyncio.Protocol):
+    def __init__(self, client):
+        self.client = client
+        self.decoder = FrameDecoder()
+        self.transport = None
+        self.rejected = False
+        self.closed = asyncio.get_running_loop().create_future()
+
+    def connection_made(self, transport):
+        self.transport = transport
+
+    def data_received(self, data):
+        try:
+            frames = self.decoder.feed(data)
+        except ValueError:
+            self.transport.close()
+            return
+        incoming = []
+        last_ref = None
+        for frame in frames:
+            kind = frame.get("type")
+            if kind == "error":
+                self.client.rejected.emit(str(frame.get("message", "")))
+                self.rejected = True
+            elif kind == "delivered":
+                ids = frame.get("ids")
+                if isinstance(ids, list):
+                    self.client.delivered(ids)
+            elif kind == "msg":
+                if type(frame.get("ref")) is int:
+                    last_ref = frame["ref"]
+                msg = frame.get("msg") or {}
+                sender = str(frame.get("from", ""))
+                # Gönderenin kimliği ve zamanı korunur; eşitlemede iki kopya aynı mesaj sayılır
+                message_id, timestamp = msg.get("id"), msg.get("timestamp")
+                if not (isinstance(message_id, str) and MESSAGE_ID_PATTERN.fullmatch(message_id)):
+                    message_id = new_message_id()
+                if not (isinstance(timestamp, (int, float)) and not isinstance(timestamp, bool)
+                        and 0 < timestamp < float("inf")):
+                    timestamp = time.time()
+                received = {"sender": sender, "text": msg.get("text", ""), "timestamp": timestamp, "id": message_id}
+                attachment = received_attachment(msg.get("attachment"))
+                if attachment is not None:
+                    received["attachment"] = attachment
+                incoming.append((sender, received))
+        if last_ref is not None:
+            # Aynı parçada gelen mesajlar GUI thread'ine tek sinyalle gider; GUI
+            # onları kaydedince onay bu bağlantı üzerinden (confirm) gönderilir
+            self.client.received.emit(incoming, (self, last_ref))
+
+    def connection_lost(self, exc):
+        if not self.closed.done():
+            self.closed.set_result(None)
+
+
+class RelayClient(QObject):
+    # Ağ işleri kendi thread'indeki asyncio döngüsünde yürür; GUI'ye sinyallerle
+    # (kuyruklu bağlantı) döner, GUI'den gönderimler call_soon_threadsafe ile gelir.
+    received = Signal(list, object)  # [(phone, {"sender", "text", "timestamp", "id", "attachment"?}), ...], onay
+    connection_changed = Signal(bool)
+    rejected = Signal(str)  # sunucu hesabı doğrulamadı
+
+    def __init__(self, phone, address, token, outbox_path):
+        super().__init__()
+        self.phone = phone
+        self.token = token
+        self.host, self.port = parse_address(address)
+        self.outbox = RelayOutbox(outbox_path)
+        self.unacked = {}  # mesaj kimliği -> çerçeve; dict ekleme sırası gönderim sırasıdır
+        self.loop = None
+        self.thread = None
+        self.task = None
+        self.protocol = None
+
+    def start(self):
+        self.loop = asyncio.new_event_loop()
+        self.task = self.loop.create_task(self.connect_forever())
+        self.thread = threading.Thread(target=self.run_loop, name="RelayClient", daemon=True)
+        self.thread.start()
+
+    def run_loop(self):
+        asyncio.set_event_loop(self.loop)
+        try:
+            self.loop.run_until_complete(self.task)
+        except asyncio.CancelledError:
+            pass
+        finally:
+            self.outbox.close()
+            self.loop.close()
+
+    def send(self, phone, msg):
+        # GUI thread'inden çağrılır
+        self.loop.call_soon_threadsafe(self.enqueue, phone, msg)
+
+    def enqueue(self, phone, msg):
+        self.outbox.add(phone, msg)
+        frame = encode_frame({"type": "msg", "to": phone, "msg": msg})
+        self.unacked[msg["id"]] = frame
+        if self.protocol is not None:
+            self.protocol.transport.write(frame)
+
+    def delivered(self, ids):
+        done = [message_id for message_id in ids
+                if isinstance(message_id, str) and self.unacked.pop(message_id, None) is not None]
+        if not self.unacked:
+            self.outbox.clear()
+        elif done:
+            self.outbox.done(done)
+
+    def confirm(self, ack):
+        # PersistenceWorker thread'inden: gelen mesajlar diske yazıldı
+        try:
+            self.loop.call_soon_threadsafe(self.send_ack, *ack)
+        except RuntimeError:
+            pass  # döngü kapandı; sunucu onaylanmamış mesajları yeniden gönderir
+
+    def send_ack(self, protocol, ref):
+        # ref'ler bağlantıya özgü; bağlantı değiştiyse sunucu mesajları zaten yeniden kuyruğa aldı
+        if protocol is self.protocol and not protocol.transport.is_closing():
+            protocol.transport.write(encode_frame({"type": "ack", "upto": ref}))
+
+    async def connect_forever(self):
+        # Önceki oturumlardan teslim onayı gelmemiş mesajlar ilk bağlanışta gönderilir
+        for phone, msg in self.outbox.load():
+            self.unacked[msg["id"]] = encode_frame({"type": "msg", "to": phone, "msg": msg})
+        delay = RELAY_BACKOFF_MIN
+        while True:
+            try:
+                _, protocol = await self.loop.create_connection(
+                    lambda: RelayClientProtocol(self), self.host, self.port
+                )
+            except OSError:
+                # Üstel geri çekilme; eşzamanlı yeniden bağlanmalar dağılsın diye rastgele
+                await asyncio.sleep(delay * random.uniform(0.5, 1.0))
+                delay = min(delay * 2, RELAY_BACKOFF_MAX)
+                continue
+            delay = RELAY_BACKOFF_MIN
+            hello = encode_frame({"type": "hello", "phone": self.phone, "token": self.token})
+            protocol.transport.write(hello + b"".join(self.unacked.values()))
+            self.protocol = protocol
+            self.connection_changed.emit(True)
+            try:
+                await protocol.closed
+            finally:
+                self.protocol = None
+                protocol.transport.close()
+            self.connection_changed.emit(False)
+            # Reddedilen token sunucu tarafında değişmedikçe tekrar reddedilir
+            await asyncio.sleep(RELAY_BACKOFF_MAX if protocol.rejected else delay)
+
+    def stop(self):
+        # Teslim onayı gelmemiş mesajlar outbox dosyasında; sonraki açılışta yeniden gönderilir
+        if self.loop is None or self.loop.is_closed():
+            return
+        self.loop.call_soon_threadsafe(self.cancel)
+        self.thread.join(timeout=2)
+
+    def cancel(self):
+        if self.task is not None:
+            self.task.cancel()
+
+# ========== Contact Import / Export ==========
+# vCard ve CSV dosyaları satır satır okunur; numaralar COUNTRY_CODES'a göre
+# normalize edilir, tekrarlar tek geçişte elenir ve tüm eklemeler tek batch
+# olarak store'a yazılır.
+def country_code_of(phone, default="+90"):
+    for code in COUNTRY_CALLING_CODES:
+        if phone.startswith(code):
+            return code
+    return default
+
+
+def normalize_phone(raw, default_code="+90"):
+    phone = re.sub(r"[\s\-().]", "", raw or "")
+    if phone.lower().startswith("tel:"):
+        phone = phone[4:]
+    if phone.startswith("00"):
+        phone = "+" + phone[2:]
+    if phone.startswith("+"):
+        code = country_code_of(phone, None)
+        if code is None:
+            return None
+        national = phone[len(code):]
+    else:
+        code = default_code
+        national = phone[1:] if phone.startswith("0") else phone
+    if not re.fullmatch(r"\d{7,15}", national):
+        return None
+    return code + national
+
+
+def unfold_vcard_lines(f):
+    # Katlanmış satırları (boşlukla başlayan devam satırları) ve quoted-printable
+    # yumuşak satır sonlarını (= ile biten) birleştirir
+    current = None
+    for line in f:
+        line = line.rstrip("\r\n")
+        if current is not None and line[:1] in (" ", "\t"):
+            current += line[1:]
+            continue
+        if current is not None and current.endswith("=") and "QUOTED-PRINTABLE" in current.split(":", 1)[0].upper():
+            current = current[:-1] + line
+            continue
+        if current is not None:
+            yield current
+        current = line
+    if current is not None:
+        yield current
+
+
+def vcard_value(key, value):
+    if "QUOTED-PRINTABLE" in key.upper():
+        value = quopri.decodestring(value.encode("latin-1", "replace")).decode("utf-8", "replace")
+    return value.replace("\\,", ",").replace("\\;", ";").replace("\\n", " ").replace("\\\\", "\\").strip()
+
+
+def iter_vcard_contacts(f):
+    full_name, structured_name, phones = None, None, []
+    for line in unfold_vcard_lines(f):
+        key, sep, value = line.partition(":")
+        if not sep:
+            continue
+        prop = key.split(";", 1)[0].split(".")[-1].upper()
+        if prop == "BEGIN":
+            full_name, structured_name, phones = None, None, []
+        elif prop == "FN":
+            full_name = vcard_value(key, value)
+        elif prop == "N":
+            parts = vcard_value(key, value).split(";")
+            structured_name = " ".join(part for part in (parts[1] if len(parts) > 1 else "", parts[0]) if part)
+        elif prop == "TEL":
+            phones.append(vcard_value(key, value))
+        elif prop == "END":
+            for phone in phones:
+                yield full_name or structured_name or "", phone
+
+
+def iter_csv_contacts(f):
+    sample = f.read(4096)
+    f.seek(0)
+    try:
+        dialect = csv.Sniffer().sniff(sample, delimiters=",;\t")
+    except csv.Error:
+        dialect = csv.excel
+    reader = csv.reader(f, dialect)
+    first = next(reader, None)
+    if first is None:
+        return
+
+    name_col, phone_col = 0, 1
+    header = [cell.strip().lower() for cell in first]
+    phone_cols = [i for i, cell in enumerate(header) if "phone" in cell or "tel" in cell or "numara" in cell]
+    name_cols = [i for i, cell in enumerate(header) if "name" in cell or cell in ("ad", "adı", "isim", "ad soyad")]
+    if phone_cols:
+        phone_col = phone_cols[0]
+        name_col = name_cols[0] if name_cols else (1 if phone_col == 0 else 0)
+    else:
+        # Başlık yok: ilk satır da veri
+        reader = chain_rows(first, reader)
+
+    for row in reader:
+        if len(row) > max(name_col, phone_col):
+            yield row[name_col].strip(), row[phone_col]
+
+
+def chain_rows(first, rest):
+    yield first
+    yield from rest
+
+
+def read_contacts_file(path):
+    if path.lower().endswith((".vcf", ".vcard")):
+        with open(path, "r", encoding="utf-8-sig", errors="replace") as f:
+            yield from iter_vcard_contacts(f)
+    else:
+        with open(path, "r", encoding="utf-8-sig", errors="replace", newline="") as f:
+            yield from iter_csv_contacts(f)
+
+
+def collect_new_contacts(entries, contacts, default_code="+90"):
+    added = []
+    seen = set()
+    skipped = 0
+    for name, raw_phone in entries:
+        phone = normalize_phone(raw_phone, default_code)
+        if phone is None or phone in seen or phone in contacts:
+            skipped += 1
+            continue
+        seen.add(phone)
+        added.append((name or phone, phone))
+    return added, skipped
+
+
+def vcard_escape(value):
+    return value.replace("\\", "\\\\").replace(",", "\\,").replace(";", "\\;")
+
+
+def write_contacts_file(path, contacts):
+    if path.lower().endswith((".vcf", ".vcard")):
+        with open(path, "w", encoding="utf-8", newline="") as f:
+            for name, phone in contacts:
+                f.write(f"BEGIN:VCARD\r\nVERSION:3.0\r\nFN:{vcard_escape(name)}\r\nTEL:{phone}\r\nEND:VCARD\r\n")
+    else:
+        with open(path, "w", encoding="utf-8", newline="") as f:
+            writer = csv.writer(f)
+            writer.writerow(["name", "phone"])
+            writer.writerows(contacts)
+
+
+def contact_records(added):
+    return [{"op": "add_contact", "name": name, "phone": phone} for name, phone in added]
+
+
+def renumber_bare_contacts(store, contacts, messages, default_code="+90"):
+    # Elle eklenen kişiler eskiden ülke kodu olmadan ("5551112233") kaydedilirdi;
+    # aktarma sunucusu ve içe aktarma "+905551112233" kullanır. Bu kişiler
+    # normalize edilmiş numaraya taşınır. O numarayla ayrıca bir kişi varsa
+    # (gelen mesajla oluşmuş) sohbetler zaman sırasıyla birleşir, elle verilen
+    # isim kalır. Geçmişi değişen numaraları döndürür.
+    changed = []
+    for name, phone in list(contacts):
+        if phone.startswith("+"):
+            continue
+        target = normalize_phone(phone, default_code)
+        if target is None:
+            continue
+        sources = [phone, target] if target in contacts else [phone]
+        unread = sum(contacts.summary(source)[2] for source in sources)
+        history = {}
+        for source in sources:
+            for record in store.messages_since(messages, source, 0):
+                del record["seq"]
+                history.setdefault(record["id"], record)
+        history = sorted(history.values(), key=lambda msg: msg.get("timestamp", 0) or 0)
+        records = [{"op": "delete_contact", "phone": source} for source in sources]
+        records.append({"op": "add_contact", "name": name, "phone": target})
+        records += [{"op": "message", "phone": target, "msg": msg} for msg in history]
+        for record in records[len(records) - min(unread, len(history)):]:
+            record["unread"] = True
+        for record in records:
+            apply_record(contacts, messages, dict(record))
+        store.append_many(records)
+        changed.append(target)
+    return changed
+
+# ========== Accounts ==========
+# Her hesap (giriş yapılan telefon) kendi dizininde çalışır; aynı makinede
+# farklı hesaplar yan yana açılabilir. Hesap dizini açık olduğu sürece bir
+# işletim sistemi kilidiyle tutulur: kilit oturum başında bir kez alınır,
+# mesaj gönderme/kaydetme yolunda kilit işlemi yoktur. Aynı hesap ikinci kez
+# açılmak istenirse yeni süreç açık olan pencereye yerel soket üzerinden
+# "öne gel" der ve kendisi o hesabı açmaz.
+def account_dir(phone):
+    return os.path.join(DATA_ROOT, ACCOUNTS_DIR, shard_file_name(phone, ""))
+
+
+def read_last_account():
+    try:
+        with open(os.path.join(DATA_ROOT, LAST_ACCOUNT_FILE), "r", encoding="utf-8") as f:
+            return f.read().strip() or None
+    except OSError:
+        return None
+
+
+def write_last_account(phone):
+    os.makedirs(DATA_ROOT, exist_ok=True)
+    write_atomic(os.path.join(DATA_ROOT, LAST_ACCOUNT_FILE), lambda f: f.write(phone.encode("utf-8")))
+
+
+def adopt_legacy_data(directory):
+    # Hesap dizinlerinden önce tüm veriler data/ altında duruyordu (çalışma
+    # dizinine göre). İlk giriş yapan hesap bu verileri devralır.
+    roots = [DATA_ROOT]
+    if os.path.abspath("data") != os.path.abspath(DATA_ROOT):
+        roots.append("data")
+    legacy = [path for root in roots for pattern in LEGACY_DATA
+              for path in glob.glob(os.path.join(glob.escape(root), pattern))]
+    if not legacy or any(os.path.exists(os.path.join(directory, os.path.basename(path))) for path in legacy):
+        return []
+    root_lock = AccountLock(DATA_ROOT)
+    if not root_lock.acquire():
+        return []  # başka bir süreç aynı anda devralıyor
+    try:
+        moved = []
+        for path in legacy:
+            if os.path.exists(path):
+                shutil.move(path, os.path.join(directory, os.path.basename(path)))
+                moved.append(path)
+        return moved
+    finally:
+        root_lock.release()
+
+
+class AccountLock:
+    def __init__(self, directory):
+        self.directory = directory
+        self.path = os.path.join(directory, LOCK_FILE)
+        self.file = None
+
+    def acquire(self):
+        # Bloklamaz: kilit başka bir süreçteyse hemen False döner. Süreç çökerse
+        # işletim sistemi kilidi bırakır, bayat kilit dosyası sorun olmaz.
+        os.makedirs(self.directory, exist_ok=True)
+        f = open(self.path, "a+b")
+        try:
+            if fcntl is not None:
+                fcntl.flock(f.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+            else:
+                f.seek(0)
+                msvcrt.locking(f.fileno(), msvcrt.LK_NBLCK, 1)
+        except OSError:
+            f.close()
+            return False
+        f.truncate(0)
+        f.write(str(os.getpid()).encode("ascii"))  # sadece teşhis için
+        f.flush()
+        self.file = f
+        return True
+
+    def release(self):
+        if self.file is None:
+            return
+        try:
+            if fcntl is not None:
+                fcntl.flock(self.file.fileno(), fcntl.LOCK_UN)
+            else:
+                self.file.seek(0)
+                msvcrt.locking(self.file.fileno(), msvcrt.LK_UNLCK, 1)
+        finally:
+            self.file.close()
+            self.file = None
+
+
+def activation_name(directory):
+    # Yerel soket adı (Windows'ta named pipe) hesap dizininden türetilir
+    digest = hashlib.sha1(os.path.abspath(directory).encode("utf-8")).hexdigest()
+    return f"turkline-{digest[:16]}"
+
+
+class InstanceServer(QObject):
+    # Hesabı açık tutan süreçte dinler; bağlanan her ikinci süreç bir "öne gel" isteğidir
+    activated = Signal()
+
+    def __init__(self, directory):
+        super().__init__()
+        self.server = QLocalServer(self)
+        name = activation_name(directory)
+        if not self.server.listen(name):
+            # Çökmüş bir süreçten kalan soket dosyası; hesap kilidi bizde olduğu için silinebilir
+            QLocalServer.removeServer(name)
+            self.server.listen(name)
+        self.server.newConnection.connect(self.on_connection)
+
+    def on_connection(self):
+        while self.server.hasPendingConnections():
+            socket = self.server.nextPendingConnection()
+            socket.disconnected.connect(socket.deleteLater)
+            socket.disconnectFromServer()
+            self.activated.emit()
+
+
+def request_activation(directory, timeout_ms=ACTIVATION_TIMEOUT_MS):
+    socket = QLocalSocket()
+    socket.connectToServer(activation_name(directory))
+    connected = socket.waitForConnected(timeout_ms)
+    if connected:
+        socket.disconnectFromServer()
+    return connected
+
+# ========== Device Sync ==========
+# Aynı hesabın iki kopyası (ör. masaüstü ve dizüstü) tüm dosyayı taşımadan,
+# sadece farkları alıp vererek eşitlenir. Her mesajın kalıcı bir kimliği
+# ("id"), her sohbetin de bu cihazda artan sıra numaraları (Conversation.seq)
+# vardır. Cihaz her eşinden hangi sıraya kadar aldığını (filigran) SYNC_FILE'da
+# tutar ve sadece ötesini ister; maliyet geçmişin boyuna değil yeni mesaj
+# sayısına bağlıdır. Gelen mesajlar kimliğe göre birleştirilir: aynı paket iki
+# kez alınsa da, kendi mesajlarımız eşten geri gelse de tekrar eklenmez. Yeni
+# mesajlar sohbetin sonuna, bu cihazın sırasıyla eklenir. Kişi silme/yeniden
+# adlandırma eşitlenmez; dosya eklerinin sadece bilgisi taşınır.
+#
+# Aynı çerçeveler TCP bağlantısında (relay çerçevelemesiyle) ve dışa aktarılan
+# pakette (gzip, satır başına bir JSON) kullanılır:
+#   {"type": "hello", "version", "device", "host", "account"}
+#   {"type": "since", "since": {phone: seq}}   gönderenin bu eşten aldığı son sıralar
+#   {"type": "messages", "phone", "name", "messages": [{..., "id", "seq"}, ...]}
+#   {"type": "done", "upto": {phone: seq}}     alıcının bu eş için yeni filigranı
+#   {"type": "error", "message"}
+# Bağlantıda iki uç da önce hello gönderir; karşının hello'suna since ile,
+# since'ine farklar ve done ile cevap verir. Pakette hello ve since'i
+# farklar izler.
+
+
+def numbered(msgs, first_seq):
+    # Eşitleme kayıtları: mesaj + sohbet içi sıra. msgs yeni oluşturulmuş
+    # kayıtlardır, yerinde değiştirilir; kimliği saklanmamış eski kayıtlara
+    # (arşiv, ham blok) Conversation.message_id ile aynı kimlik türetilir.
+    for seq, msg in enumerate(msgs, first_seq):
+        msg["seq"] = seq
+        if "id" not in msg:
+            msg["id"] = f"{message_digest(seq, msg.get('sender', ''), msg.get('timestamp', 0), msg.get('text', '')):016x}"
+    return msgs
+
+
+def conversation_since(msgs, seq, read_archive=None):
+    # seq'ten sonraki mesajlar; eş sıcak kısmın başından da gerideyse önceki
+    # kısım arşivden segment segment okunur
+    start = max(seq - msgs.archived, 0)
+    records = numbered(msgs[start:], msgs.archived + start + 1)
+    older = []
+    end = msgs.archived
+    while read_archive is not None and end > seq:
+        first, chunk = read_archive(end)
+        if not chunk:
+            # Eksik gönderilirse eş filigranı ilerletir ve aradaki mesajları hiç almaz
+            raise OSError("arşivlenen mesajlar okunamadı")
+        skip = max(seq - first, 0)
+        older.append(numbered(chunk[skip:], first + skip + 1))
+        end = first
+    return [record for chunk in reversed(older) for record in chunk] + records
+
+
+def archived_ids(msgs, read_archive):
+    ids = set()
+    end = msgs.archived
+    while end > 0:
+        start, chunk = read_archive(end)
+        if not chunk:
+            break
+        ids.update(record["id"] for record in numbered(chunk, start + 1))
+        end = start
+    return ids
+
+
+def fresh_messages(msgs, records, read_archive=None):
+    # Kimliği sohbette zaten olan mesajlar atlanır. Kimlikler sıcak kısımdan
+    # toplanır; arşiv sadece sıcak kısmın başından eski bir mesaj gelirse taranır.
+    known = {msgs.message_id(i) for i in range(len(msgs))}
+    head = msgs.times[0] if len(msgs) else 0
+    archive_checked = read_archive is None or not msgs.archived
+    fresh = []
+    for record in records:
+        if not isinstance(record, dict):
+            raise ValueError("geçersiz mesaj kaydı")
+        message_id, sender, text = record.get("id"), record.get("sender"), record.get("text")
+        timestamp = record.get("timestamp") or 0
+        if not (isinstance(message_id, str) and MESSAGE_ID_PATTERN.fullmatch(message_id)
+                and isinstance(sender, str) and isinstance(text, str) and isinstance(timestamp, (int, float))):
+            raise ValueError("geçersiz mesaj kaydı")
+        if not archive_checked and not 0 < head <= timestamp:
+            known |= archived_ids(msgs, read_archive)
+            archive_checked = True
+        if message_id in known:
+            continue
+        known.add(message_id)
+        msg = {"sender": sender, "text": text}
+        if timestamp:
+            msg["timestamp"] = timestamp
+        msg["id"] = message_id
+        attachment = received_attachment(record.get("attachment"))
+        if attachment is not None:
+            msg["attachment"] = attachment
+        fresh.append(msg)
+    return fresh
+
+
+def merge_sync_messages(contacts, messages, phone, name, records, archive=None, current=None):
+    # Yeni mesajlar sohbetin sonuna eklenir; journal'a yazılacak kayıtlar döner.
+    # Açık sohbet (current) dışında kişinin kendi mesajları okunmamış sayılır.
+    msgs = messages.get(phone)
+    read_archive = functools.partial(archive.read, phone) if archive is not None else None
+    fresh = fresh_messages(msgs if msgs is not None else Conversation(), records, read_archive)
+    if not fresh:
+        return []
+    changes = []
+    if phone not in contacts:
+        name = name if isinstance(name, str) and name else phone
+        contacts.add(name, phone)
+        changes.append({"op": "add_contact", "name": name, "phone": phone})
+    if msgs is None:
+        msgs = messages[phone] = Conversation()
+    for msg in fresh:
+        unread = phone != current and msg["sender"] == phone
+        msgs.append(msg)
+        contacts.note_message(phone, msg, unread)
+        record = {"op": "message", "phone": phone, "msg": msg}
+        if unread:
+            record["unread"] = True
+        changes.append(record)
+    return changes
+
+
+def delta_frames(store, contacts, messages, since):
+    # since'ten sonraki mesajlar sohbet başına bir ya da daha fazla "messages"
+    # çerçevesi olarak üretilir, sonda "done" gelir. Sadece kişiler dolaşılır;
+    # sohbetin son sırası store'dan sohbet okunmadan alınır.
+    upto = {}
+    for name, phone in contacts:
+        last = store.last_seq(messages, phone)
+        start = since.get(phone, 0)
+        if start > last:
+            start = 0  # sohbet silinip yeniden başlamış: baştan gönderilir
+        if last != since.get(phone, 0):
+            upto[phone] = last
+        if last == start:
+            continue
+        records = store.messages_since(messages, phone, start)
+        for first in range(0, len(records), SYNC_BATCH_MESSAGES):
+            yield {"type": "messages", "phone": phone, "name": name,
+                   "messages": records[first:first + SYNC_BATCH_MESSAGES]}
+    yield {"type": "done", "upto": upto}
+
+
+def clean_watermarks(value):
+    # Karşıdan gelen {phone: seq}; bozuk girdiler yok sayılır
+    if not isinstance(value, dict):
+        return {}
+    return {phone: seq for phone, seq in value.items() if type(seq) is int and seq >= 0}
+
+
+class SyncState:
+    # Cihaz kimliği ve her eş için iki filigran: "received" (ondan hangi sıraya
+    # kadar aldık) ve "acked" (bizden hangi sıraya kadar aldığını bildirdi;
+    # pakete sadece ötesi yazılır). Hesap dizini başka bir makineye ya da
+    # dizine kopyalanırsa kimlik yenilenir: kopya ayrı bir cihaz olarak eşitlenir.
+    def __init__(self, directory):
+        self.path = os.path.join(directory, SYNC_FILE)
+        self.origin = f"{platform.node()}:{os.path.abspath(directory)}"
+        self.device = None
+        self.peers = {}  # cihaz -> {"host", "received": {phone: seq}, "acked": {phone: seq}}
+
+    def load(self):
+        try:
+            with open(self.path, "rb") as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            data = {}
+        self.peers = data.get("peers", {})
+        if data.get("device") and data.get("origin") == self.origin:
+            self.device = data["device"]
+        else:
+            self.device = new_message_id()
+            self.save()
+        return self
+
+    def peer(self, device):
+        return self.peers.setdefault(device, {"received": {}, "acked": {}})
+
+    def save(self):
+        data = json.dumps({"device": self.device, "origin": self.origin, "peers": self.peers}, ensure_ascii=False)
+        write_atomic(self.path, lambda f: f.write(data.encode("utf-8")))
+
+
+class SyncEndpoint:
+    # Eşitlemenin yerel tarafı. submit(changes) gelen mesajların journal
+    # kayıtlarını alır (GUI ayrıca görünümü günceller), flush() bunlar diske
+    # inene kadar bekler: filigran, mesajlardan önce kaydedilmez.
+    def __init__(self, account, state, store, contacts, messages, submit, flush=None, current=None):
+        self.account = account
+        self.state = state
+        self.store = store
+        self.contacts = contacts
+        self.messages = messages
+        self.submit = submit
+        self.flush = flush
+        self.current = current  # açık sohbeti döndürür; oraya gelenler okunmamış sayılmaz
+
+    def hello(self):
+        return {"type": "hello", "version": SYNC_VERSION, "device": self.state.device,
+                "host": platform.node(), "account": self.account}
+
+    def delta(self, since):
+        # Sıkıştırma soğuk mesajları GUI thread'inde sohbetten çıkarır, arşive
+        # işçi thread'i sonra yazar: bekleyen sıkıştırma bitmeden okunan delta
+        # o mesajları atlar
+        if self.flush is not None:
+            self.flush()
+        return delta_frames(self.store, self.contacts, self.messages, since)
+
+    def merge(self, phone, name, records):
+        if phone == self.account:
+            return 0
+        current = self.current() if self.current is not None else None
+        changes = merge_sync_messages(self.contacts, self.messages, phone, name, records, self.store.archive, current)
+        if changes:
+            self.submit(changes)
+        return sum(1 for record in changes if record["op"] == "message")
+
+    def commit(self):
+        if self.flush is not None and not self.flush():
+            raise OSError("eşitlenen mesajlar diske yazılamadı")
+        self.state.save()
+
+
+class SyncExchange:
+    # Eşitleme adımları, aktarımdan (soket / paket) bağımsız: feed() gelen
+    # çerçeveyi işler ve karşıya gönderilecek çerçeveleri döndürür. Paket içe
+    # aktarılırken (reply=False) cevap üretilmez.
+    def __init__(self, endpoint, reply=True):
+        self.endpoint = endpoint
+        self.reply = reply
+        self.peer = None
+        self.sent_done = not reply
+        self.received_done = False
+        self.sent = 0
+        self.merged = 0
+
+    def complete(self):
+        return self.sent_done and self.received_done
+
+    def start(self):
+        return [self.endpoint.hello()]
+
+    def feed(self, frame):
+        state = self.endpoint.state
+        kind = frame.get("type") if isinstance(frame, dict) else None
+        if kind == "error":
+            raise ValueError(f"karşı taraf: {frame.get('message')}")
+        if kind == "hello":
+            device = frame.get("device")
+            if frame.get("version") != SYNC_VERSION:
+                raise ValueError("desteklenmeyen eşitleme sürümü")
+            if frame.get("account") != self.endpoint.account:
+                raise ValueError(f"veriler başka bir hesaba ait: {frame.get('account')}")
+            if not isinstance(device, str) or not device or device == state.device:
+                raise ValueError("geçersiz cihaz kimliği")
+            self.peer = device
+            peer = state.peer(device)
+            if isinstance(frame.get("host"), str):
+                peer["host"] = frame["host"]
+            return [{"type": "since", "since": dict(peer["received"])}] if self.reply else []
+        if self.peer is None:
+            raise ValueError("eşitleme hello ile başlamalı")
+        if kind == "since":
+            since = clean_watermarks(frame.get("since"))
+            state.peer(self.peer)["acked"] = since
+            if not self.reply:
+                return []
+            frames = list(self.endpoint.delta(since))
+            self.sent = sum(len(frame.get("messages", ())) for frame in frames)
+            self.sent_done = True
+            return frames
+        if kind == "messages":
+            phone, records = frame.get("phone"), frame.get("messages")
+            if not isinstance(phone, str) or not isinstance(records, list):
+                raise ValueError("geçersiz mesaj çerçevesi")
+            self.merged += self.endpoint.merge(phone, frame.get("name"), records)
+        elif kind == "done":
+            state.peer(self.peer)["received"].update(clean_watermarks(frame.get("upto")))
+            self.received_done = True
+            self.endpoint.commit()
+        return []
+
+
+def write_sync_bundle(path, endpoint, peer=None):
+    # Eş biliniyorsa sadece onun henüz almadığı mesajlar, bilinmiyorsa tüm geçmiş yazılır
+    known = endpoint.state.peers.get(peer, {}) if peer else {}
+    frames = itertools.chain(
+        [endpoint.hello(), {"type": "since", "since": known.get("received", {})}],
+        endpoint.delta(known.get("acked", {})),
+    )
+    count = 0
+
+    def write(f):
+        nonlocal count
+        with gzip.GzipFile(filename="", mode="wb", fileobj=f) as out:
+            for frame in frames:
+                count += len(frame.get("messages", ()))
+                out.write(json.dumps(frame, ensure_ascii=False, separators=(",", ":")).encode("utf-8") + b"\n")
+
+    write_atomic(path, write)
+    return count
+
+
+def read_sync_bundle(path, endpoint):
+    exchange = SyncExchange(endpoint, reply=False)
+    try:
+        with gzip.open(path, "rb") as f:
+            for line in f:
+                exchange.feed(json.loads(line))
+    except EOFError:
+        raise ValueError("paket yarım kalmış")
+    if not exchange.received_done:
+        raise ValueError("paket yarım kalmış")
+    return exchange.merged
+
+
+class SyncConnection(QObject):
+    # SyncExchange'i bir TCP soketi üzerinde, GUI thread'inde bloklamadan yürütür
+    finished = Signal(str)  # hata mesajı; başarılıysa boş
+
+    def __init__(self, socket, exchange):
+        super().__init__()
+        self.socket = socket
+        self.exchange = exchange
+        self.decoder = FrameDecoder(SYNC_MAX_FRAME)
+        self.error = ""
+        self.closed = False
+        socket.readyRead.connect(self.on_ready_read)
+        socket.errorOccurred.connect(self.on_error)
+        socket.disconnected.connect(self.finish)
+
+    def start(self):
+        self.send(self.exchange.start())
+
+    def send(self, frames):
+        data = b"".join(encode_frame(frame) for frame in frames)
+        if data:
+            self.socket.write(data)
+
+    def on_ready_read(self):
+        try:
+            for frame in self.decoder.feed(bytes(self.socket.readAll())):
+                self.send(self.exchange.feed(frame))
+        except (OSError, ValueError) as e:
+            self.error = str(e)
+            self.send([{"type": "error", "message": self.error}])
+            self.socket.disconnectFromHost()
+            return
+        if self.exchange.complete():
+            self.socket.disconnectFromHost()
+
+    def on_error(self, error):
+        # Karşı taraf işini bitirip önce kapatırsa RemoteHostClosedError gelir
+        if not self.exchange.complete() and not self.error:
+            self.error = self.socket.errorString()
+        if self.socket.state() == QAbstractSocket.UnconnectedState:
+            self.finish()
+
+    def finish(self):
+        if self.closed:
+            return
+        self.closed = True
+        if not self.error and not self.exchange.complete():
+            self.error = "bağlantı eşitleme bitmeden kapandı"
+        self.socket.deleteLater()
+        self.finished.emit(self.error)
+
+# ========== Startup ==========
+# Açılış sabit bir beklemeye değil hazır olmaya bağlıdır: splash ilk çizimden
+# hemen sonra kapanır, geçmiş giriş ekranı açıkken arka planda okunur ve sohbet
+# penceresi kişi listesiyle birlikte veri beklemeden çizilir.
+class StartupTimer:
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.marks = {}
+
+    def mark(self, name):
+        self.marks.setdefault(name, round((time.perf_counter() - self.start) * 1000, 1))
+
+    def report(self, path=None):
+        path = path or os.path.join(DATA_ROOT, STARTUP_REPORT_FILE)
+        marks = self.marks
+        summary = {"time": time.strftime("%Y-%m-%dT%H:%M:%S"), "marks_ms": dict(marks)}
+        if "login_shown" in marks:
+            summary["time_to_login_ms"] = marks["login_shown"]
+        if "first_paint" in marks and "login_accepted" in marks:
+            summary["time_to_first_paint_ms"] = round(marks["first_paint"] - marks["login_accepted"], 1)
+        if PROFILER.enabled:
+            print("Açılış süreleri (ms): " + ", ".join(f"{name}={value}" for name, value in marks.items()), file=sys.stderr)
+        try:
+            os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+            with open(path, "a", encoding="utf-8") as f:
+                f.write(json.dumps(summary) + "\n")
+        except OSError:
+            pass
+        return summary
+
+
+class StoreLoader(QObject):
+    # Store'u, kişileri, mesajları ve arama indeksini bir thread'de hazırlar;
+    # bitince GUI thread'ine finished sinyali gider.
+    finished = Signal()
+
+    def __init__(self, directory, default_code="+90"):
+        super().__init__()
+        self.directory = directory  # hesap dizini; kilidi çağıran tutar
+        self.default_code = default_code  # hesabın ülke kodu; ülke kodsuz kayıtlı kişiler için
+        self.result = None
+        self.failed = False  # store.load() hata verdi; oturum salt okunur açılır
+        self.done = False
+        self.thread = None
+        self.lock = threading.Lock()
+        self.discarded = None  # discard() sonrası: store kapatılınca çağrılacak (ör. hesap kilidini bırakmak)
+
+    def start(self):
+        self.thread = threading.Thread(target=self.run, name="StoreLoader", daemon=True)
+        self.thread.start()
+
+    def discard(self, closed=lambda: None):
+        # Önceden yüklenen hesapla giriş yapılmadı. GUI thread'i yüklemeyi beklemez:
+        # sürüyorsa store'u bitince thread kendisi kapatır ve closed'ı çağırır
+        with self.lock:
+            self.discarded = closed
+            result = self.result
+        if result is not None:
+            result[0].close()
+            closed()
+
+    def run(self):
+        store = create_store(self.directory)
+        try:
+            contacts, messages = store.load()
+        except Exception as e:
+            contacts, messages = ContactRegistry(), {}
+            self.failed = True
+            store.load_warnings.append(str(e))
+            store.load_warnings.append("Kayıtlı veriler bozulmasın diye bu oturumdaki değişiklikler kaydedilmeyecek.")
+
+        renumbered = []
+        if not self.failed:
+            try:
+                renumbered = renumber_bare_contacts(store, contacts, messages, self.default_code)
+            except OSError as e:
+                # Bellek diskten ileride kaldı; üzerine yazmak yerine oturum salt okunur açılır
+                self.failed = True
+                store.load_warnings.append(f"Kişi numaraları güncellenemedi: {e}")
+                store.load_warnings.append("Kayıtlı veriler bozulmasın diye bu oturumdaki değişiklikler kaydedilmeyecek.")
+
+        search_index = SearchIndex(store.path + SEARCH_INDEX_SUFFIX)
+        search_index.load()
+        for phone in list(search_index.counts):
+            if phone not in messages or phone in renumbered:
+                search_index.remove(phone)
+        # Son kayıttan sonra değişen (journal'dan gelen) sohbetlerin kuyruğunu indeksle
+        for phone, msgs in list(loaded_conversations(messages).items()):
+            search_index.sync(phone, msgs)
+
+        with self.lock:
+            closed = self.discarded
+            if closed is None:
+                self.result = (store, contacts, messages, search_index)
+                self.done = True
+        if closed is not None:
+            store.close()
+            closed()
+            return
+        self.finished.emit()
+
+# ========== Profiling ==========
+# İsteğe bağlı ölçüm katmanı (TURKLINE_PROFILE=1 veya --profile). Kapalıyken hiçbir
+# slot sarılmaz ve zamanlayıcı kurulmaz; store'lardaki bayt sayaçları tek bir
+# "PROFILER.enabled" kontrolünden ibarettir.
+# Diyalog açan slotlar (kişi ekle/düzenle/sil, içe/dışa aktar) kullanıcının bekleme
+# süresini ölçeceği için listede yok.
+PROFILED_SLOTS = (
+    "send_message", "change_contact", "load_chat_messages", "append_chat_message",
+    "record_change", "save_messages", "run_search", "open_search_result",
+    "on_store_loaded", "filter_contacts", "receive_messages",
+)
+
+
+class Profiler:
+    def __init__(self):
+        self.enabled = False
+        self.samples = {}  # slot -> deque(süre, saniye)
+        self.calls = {}
+        self.last_slot = None
+        self.bytes_read = 0
+        self.bytes_written = 0
+        self.io_lock = threading.Lock()  # sayaçlar PersistenceWorker'dan da artırılır
+        self.stalls = deque(maxlen=PROFILE_WINDOW)
+        self.stall_count = 0
+        self.last_beat = None
+        self.heartbeat = None
+        self.log_timer = None
+        self.log_path = None
+        self.log_file = None
+
+    def enable(self, log_path=None):
+        self.enabled = True
+        self.log_path = log_path or os.path.join(DATA_ROOT, PROFILE_LOG_FILE)
+
+    def instrument(self, cls, names):
+        for name in names:
+            func = getattr(cls, name)
+            if not getattr(func, "profiled", False):
+                setattr(cls, name, self.timed_slot(func, name))
+
+    def timed_slot(self, func, name):
+        # Qt fazla sinyal argümanlarını slotun imzasına bakarak atar; sarmalayıcı
+        # *args aldığı için aynı kırpmayı burada yapar (ör. clicked(bool)).
+        argcount = func.__code__.co_argcount - 1
+
+        @functools.wraps(func)
+        def wrapper(obj, *args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return func(obj, *args[:argcount], **kwargs)
+            finally:
+                self.record_slot(name, time.perf_counter() - start)
+
+        wrapper.profiled = True
+        return wrapper
+
+    def record_slot(self, name, elapsed):
+        samples = self.samples.get(name)
+        if samples is None:
+            samples = self.samples[name] = deque(maxlen=PROFILE_WINDOW)
+            self.calls[name] = 0
+        samples.append(elapsed)
+        self.calls[name] += 1
+        self.last_slot = name
+
+    def count_io(self, read=0, written=0):
+        with self.io_lock:
+            self.bytes_read += read
+            self.bytes_written += written
+
+    def start_monitor(self):
+        # Olay döngüsü serbestse kalp atışı STALL_CHECK_MS'de bir gelir; gecikme
+        # eşiği aşarsa o arada çalışan son slot ile birlikte kaydedilir.
+        self.last_beat = time.perf_counter()
+        self.heartbeat = QTimer()
+        self.heartbeat.setTimerType(Qt.PreciseTimer)
+        self.heartbeat.timeout.connect(self.check_stall)
+        self.heartbeat.start(STALL_CHECK_MS)
+        self.log_timer = QTimer()
+        self.log_timer.timeout.connect(self.write_summary)
+        self.log_timer.start(PROFILE_LOG_INTERVAL_MS)
+
+    def check_stall(self):
+        now = time.perf_counter()
+        late_ms = (now - self.last_beat) * 1000 - STALL_CHECK_MS
+        self.last_beat = now
+        if late_ms >= STALL_THRESHOLD_MS:
+            stall = {"event": "stall", "time": time.time(), "ms": round(late_ms, 1), "last_slot": self.last_slot}
+            self.stalls.append(stall)
+            self.stall_count += 1
+            self.log(stall)
+
+    def stats(self):
+        slots = {}
+        for name, samples in self.samples.items():
+            ordered = sorted(samples)
+            slots[name] = {
+                "calls": self.calls[name],
+                "p50_ms": round(ordered[len(ordered) // 2] * 1000, 3),
+                "p95_ms": round(ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))] * 1000, 3),
+                "max_ms": round(ordered[-1] * 1000, 3),
+                "mean_ms": round(sum(ordered) / len(ordered) * 1000, 3),
+            }
+        return {
+            "slots": slots,
+            "bytes_read": self.bytes_read,
+            "bytes_written": self.bytes_written,
+            "stalls": self.stall_count,
+            "max_stall_ms": max((stall["ms"] for stall in self.stalls), default=0),
+        }
+
+    def log(self, entry):
+        # Makine tarafından okunabilir kayıt: her satır bir JSON nesnesi
+        try:
+            if self.log_file is None:
+                os.makedirs(os.path.dirname(self.log_path) or ".", exist_ok=True)
+                self.log_file = open(self.log_path, "a", encoding="utf-8")
+            self.log_file.write(json.dumps(entry) + "\n")
+            self.log_file.flush()
+        except OSError as e:
+            print(f"Profil kaydı yazılamadı: {e}", file=sys.stderr)
+
+    def write_summary(self):
+        if self.samples or self.stall_count or self.bytes_read or self.bytes_written:
+            self.log({"event": "summary", "time": time.time(), **self.stats()})
+
+    def stop(self):
+        for timer in (self.heartbeat, self.log_timer):
+            if timer is not None:
+                timer.stop()
+        if self.enabled:
+            self.write_summary()
+        if self.log_file is not None:
+            self.log_file.close()
+            self.log_file = None
+
+
+PROFILER = Profiler()
+
+
+def format_bytes(count):
+    for unit in ("B", "KB", "MB"):
+        if count < 1024:
+            return f"{count:.0f} {unit}" if unit == "B" else f"{count:.1f} {unit}"
+        count /= 1024
+    return f"{count:.1f} GB"
+
+
+class ProfilerPanel(QWidget):
+    # Gizli hata ayıklama paneli: sohbet penceresinde Ctrl+Shift+D ile açılır
+    def __init__(self, profiler):
+        super().__init__()
+        self.profiler = profiler
+        self.setWindowTitle("Türkline - Performans")
+        self.setWindowFlags(Qt.Tool)
+        self.resize(620, 360)
+
+        self.text = QPlainTextEdit()
+        self.text.setReadOnly(True)
+        self.text.setFont(QFont("Consolas", 10))
+        layout = QVBoxLayout(self)
+        layout.addWidget(self.text)
+
+        self.refresh_timer = QTimer(self)
+        self.refresh_timer.timeout.connect(self.refresh)
+
+    def toggle(self):
+        if self.isVisible():
+            self.hide()
+            self.refresh_timer.stop()
+        else:
+            self.refresh()
+            self.show()
+            self.refresh_timer.start(1000)
+
+    def refresh(self):
+        stats = self.profiler.stats()
+        lines = [f"{'slot':<24}{'çağrı':>8}{'p50 ms':>10}{'p95 ms':>10}{'max ms':>10}"]
+        for name, slot in sorted(stats["slots"].items()):
+            lines.append(f"{name:<24}{slot['calls']:>8}{slot['p50_ms']:>10.2f}{slot['p95_ms']:>10.2f}{slot['max_ms']:>10.2f}")
+        lines.append("")
+        lines.append(f"okunan: {format_bytes(stats['bytes_read'])}   yazılan: {format_bytes(stats['bytes_written'])}")
+        lines.append(f"takılma (>{STALL_THRESHOLD_MS} ms): {stats['stalls']}, en uzun {stats['max_stall_ms']} ms")
+        for stall in list(self.profiler.stalls)[-5:]:
+            stamp = time.strftime("%H:%M:%S", time.localtime(stall["time"]))
+            lines.append(f"  {stamp}  {stall['ms']} ms  (son slot: {stall['last_slot']})")
+        self.text.setPlainText("\n".join(lines))
+
+
+# ========== Theme ==========
+# Tüm görünüm tek bir uygulama stil sayfasından gelir: widget'lar sadece
+# objectName ya da property ile işaretlenir, QSS QApplication'a bir kez verilir
+# ve Qt onu bir kez ayrıştırır. Tema değişince aynı çağrı tekrarlanır; Qt mevcut
+# widget'ları yeniden boyar, hiçbiri yeniden oluşturulmaz.
+THEMES = {
+    "dark": {
+        "window": "#1E272E",
+        "sidebar": "#2C3E50",
+        "panel": "#34495E",
+        "panel_focus": "#3F5873",
+        "chat": "#1E272E",
+        "text": "#ECF0F1",
+        "title": "#F0F0F0",
+        "chat_text": "#D0D7DE",
+        "accent": "#2980B9",
+        "accent_hover": "#3498DB",
+        "accent_pressed": "#1B6CA8",
+        "dialog": "#1F2937",
+        "dialog_text": "#E5E7EB",
+        "dialog_label": "#F3F4F6",
+        "field": "#374151",
+        "field_border": "#4B5563",
+        "field_text": "#F9FAFB",
+        "popup": "#1F2937",
+        "form_accent": "#3B82F6",
+        "form_accent_hover": "#2563EB",
+        "form_accent_pressed": "#1D4ED8",
+        "own_message": "#58D68D",
+        "other_message": "#F0F0F0",
+    },
+    "light": {
+        "window": "#F4F6F8",
+        "sidebar": "#DDE3E9",
+        "panel": "#EEF2F6",
+        "panel_focus": "#E2EAF2",
+        "chat": "#FFFFFF",
+        "text": "#1F2D3A",
+        "title": "#1F2D3A",
+        "chat_text": "#24303B",
+        "accent": "#2980B9",
+        "accent_hover": "#3498DB",
+        "accent_pressed": "#1B6CA8",
+        "dialog": "#F9FAFB",
+        "dialog_text": "#1F2937",
+        "dialog_label": "#111827",
+        "field": "#FFFFFF",
+        "field_border": "#D1D5DB",
+        "field_text": "#111827",
+        "popup": "#FFFFFF",
+        "form_accent": "#3B82F6",
+        "form_accent_hover": "#2563EB",
+        "form_accent_pressed": "#1D4ED8",
+        "own_message": "#1E8449",
+        "other_message": "#1F2D3A",
+    },
+}
+
+THEME_QSS = string.Template("""
+    QDialog[form="true"] {
+        background-color: $dialog;
+        color: $dialog_text;
+        font-family: 'Segoe UI', Tahoma, Geneva, Verdana, sans-serif;
+    }
+    QDialog[form="true"] QLabel {
+        font-size: 16px;
+        font-weight: bold;
+        color: $dialog_label;
+    }
+    QDialog[form="true"] QLineEdit {
+        background-color: $field;
+        border: 1.5px solid $field_border;
+        border-radius: 8px;
+        padding: 10px 14px;
+        color: $field_text;
+        font-size: 15px;
+    }
+    QDialog[form="true"] QLineEdit:focus {
+        border: 1.5px solid $form_accent;
+        background-color: $form_accent_hover;
+        color: white;
+    }
+    QDialog[form="true"] QPushButton {
+        background-color: $form_accent;
+        border-radius: 10px;
+        padding: 10px 25px;
+        color: white;
+        font-weight: bold;
+        font-size: 16px;
+    }
+    QDialog[form="true"] QPushButton:hover {
+        background-color: $form_accent_hover;
+    }
+    QDialog[form="true"] QPushButton:pressed {
+        background-color: $form_accent_pressed;
+    }
+
+    QComboBox#countryCombo {
+        background-color: $field;
+        color: $field_text;
+        border-radius: 8px;
+        padding: 6px 12px;
+        font-size: 15px;
+        min-width: 110px;
+    }
+    QComboBox#countryCombo QAbstractItemView {
+        background-color: $popup;
+        color: $dialog_text;
+        selection-background-color: $form_accent_hover;
+        selection-color: white;
+        border-radius: 8px;
+        outline: none;
+        font-size: 15px;
+    }
+    QComboBox#countryCombo::drop-down {
+        subcontrol-origin: padding;
+        subcontrol-position: top right;
+        width: 30px;
+        border-left-width: 1px;
+        border-left-color: $field_border;
+        border-left-style: solid;
+        border-top-right-radius: 8px;
+        border-bottom-right-radius: 8px;
+        /* arrow icon için aşağıdaki satır eklenmeli, yoksa kendi Qt arrow çıkar */
+        image: url(down_arrow.png); /* down_arrow.png varsa gösterir, yoksa sistem ok */
+    }
+
+    QMainWindow#chatWindow {
+        background-color: $window;
+    }
+    QWidget#sidebar {
+        background-color: $sidebar;
+        border-top-left-radius: 20px;
+        border-bottom-left-radius: 20px;
+    }
+    QWidget#chatPanel {
+        background-color: $chat;
+        border-top-right-radius: 20px;
+        border-bottom-right-radius: 20px;
+    }
+    QLabel#userLabel {
+        color: $title;
+        padding: 15px;
+    }
+    QLabel#chatLabel {
+        color: $title;
+        padding: 15px;
+        border-bottom: 1px solid $panel;
+    }
+    QLineEdit#searchInput, QLineEdit#contactFilter {
+        border-radius: 15px;
+        padding: 8px 14px;
+        background-color: $panel;
+        color: $text;
+        border: none;
+        font-size: 14px;
+    }
+    QLineEdit#messageInput {
+        border-radius: 25px;
+        padding: 15px 20px;
+        background-color: $panel;
+        color: $text;
+        border: none;
+        font-size: 15px;
+    }
+    QLineEdit#searchInput:focus, QLineEdit#contactFilter:focus, QLineEdit#messageInput:focus {
+        background-color: $panel_focus;
+    }
+    QListView[sidebar="true"] {
+        background-color: $panel;
+        border-radius: 15px;
+        color: $text;
+        padding: 5px;
+        font-size: 14px;
+    }
+    QListView[sidebar="true"]::item:selected {
+        background-color: $accent;
+        border-radius: 10px;
+        color: white;
+    }
+    QListView#chatArea {
+        background-color: $chat;
+        color: $chat_text;
+        border-radius: 15px;
+        padding: 15px;
+        font-size: 14px;
+    }
+    QMainWindow#chatWindow QPushButton {
+        border-radius: 18px;
+        background-color: $accent;
+        color: white;
+        font-weight: bold;
+        padding: 10px 20px;
+        border: none;
+        font-size: 14px;
+    }
+    QMainWindow#chatWindow QPushButton:hover {
+        background-color: $accent_hover;
+    }
+    QMainWindow#chatWindow QPushButton:pressed {
+        background-color: $accent_pressed;
+    }
+    QMainWindow#chatWindow QPushButton#themeButton {
+        border-radius: 16px;
+        padding: 0px;
+        min-width: 32px;
+        max-width: 32px;
+        min-height: 32px;
+        max-height: 32px;
+        font-size: 16px;
+    }
+""")
+
+
+@functools.lru_cache(maxsize=None)
+def theme_stylesheet(name):
+    return THEME_QSS.substitute(THEMES[name])
+
+
+def theme_color(name, key):
+    return QColor(THEMES[name][key])
+
+
+def apply_theme(app, name):
+    if name not in THEMES:
+        name = "dark"
+    app.setProperty("theme", name)
+    app.setStyleSheet(theme_stylesheet(name))
+    return name
+
+
+def current_theme():
+    app = QApplication.instance()
+    return (app.property("theme") if app is not None else None) or THEME
+
+
+def ensure_theme():
+    # main() dışından açılan pencereler (ör. benchmark) de temalı olsun
+    app = QApplication.instance()
+    if app is not None and app.property("theme") is None:
+        apply_theme(app, THEME)
 
 # ========== Splash Screen ==========
 class SplashScreen(QWidget):
@@ -48,37 +4008,7 @@ class SplashScreen(QWidget):
 class DarkComboBox(QComboBox):
     def __init__(self):
         super().__init__()
-        self.setStyleSheet("""
-            QComboBox {
-                background-color: #374151;
-                color: #F9FAFB;
-                border-radius: 8px;
-                padding: 6px 12px;
-                font-size: 15px;
-                min-width: 110px;
-            }
-            QComboBox QAbstractItemView {
-                background-color: #1F2937;
-                color: #E5E7EB;
-                selection-background-color: #2563EB;
-                selection-color: white;
-                border-radius: 8px;
-                outline: none;
-                font-size: 15px;
-            }
-            QComboBox::drop-down {
-                subcontrol-origin: padding;
-                subcontrol-position: top right;
-                width: 30px;
-                border-left-width: 1px;
-                border-left-color: #4B5563;
-                border-left-style: solid;
-                border-top-right-radius: 8px;
-                border-bottom-right-radius: 8px;
-                /* arrow icon için aşağıdaki satır eklenmeli, yoksa kendi Qt arrow çıkar */
-                image: url(down_arrow.png); /* down_arrow.png varsa gösterir, yoksa sistem ok */
-            }
-        """)
+        self.setObjectName("countryCombo")
 
 # ========== Login Dialog ==========
 class LoginDialog(QDialog):
@@ -86,45 +4016,7 @@ class LoginDialog(QDialog):
         super().__init__()
         self.setWindowTitle("Türkline - Giriş")
         self.setFixedSize(440, 250)
-        self.setStyleSheet("""
-            QDialog {
-                background-color: #1F2937;
-                color: #E5E7EB;
-                font-family: 'Segoe UI', Tahoma, Geneva, Verdana, sans-serif;
-            }
-            QLabel {
-                font-size: 16px;
-                font-weight: bold;
-                color: #F3F4F6;
-            }
-            QLineEdit {
-                background-color: #374151;
-                border: 1.5px solid #4B5563;
-                border-radius: 8px;
-                padding: 10px 14px;
-                color: #F9FAFB;
-                font-size: 15px;
-            }
-            QLineEdit:focus {
-                border: 1.5px solid #3B82F6;
-                background-color: #2563EB;
-                color: white;
-            }
-            QPushButton {
-                background-color: #3B82F6;
-                border-radius: 10px;
-                padding: 10px 25px;
-                color: white;
-                font-weight: bold;
-                font-size: 16px;
-            }
-            QPushButton:hover {
-                background-color: #2563EB;
-            }
-            QPushButton:pressed {
-                background-color: #1D4ED8;
-            }
-        """)
+        self.setProperty("form", True)
 
         layout = QFormLayout()
         layout.setLabelAlignment(Qt.AlignLeft)
@@ -195,116 +4087,655 @@ class LoginDialog(QDialog):
         self.user_phone = full_phone
         self.accept()
 
+# ========== Message List ==========
+# Sohbet, tek bir HTML dokümanı yerine model/view ile gösterilir: model sadece
+# son MESSAGE_PAGE_SIZE mesajı satır olarak sunar, kullanıcı en üste
+# kaydırdıkça daha eski sayfalar başa eklenir. Sıcak mesajlar bitince arşivden
+# bir önceki segment okunup aynı şekilde sayfa sayfa açılır. Delegate yalnızca
+# görünen satırları çizer.
+MESSAGE_ROLE = Qt.UserRole + 1
+
+
+class MessageListModel(QAbstractListModel):
+    def __init__(self, page_size=MESSAGE_PAGE_SIZE):
+        super().__init__()
+        self.page_size = page_size
+        self.msgs = []
+        self.older = []  # arşivden okunmuş mesajlar; self.msgs'ten önce gelir
+        self.archived = 0  # self.older'dan önce arşivde kalan mesaj sayısı
+        self.read_archive = None
+        self.first = 0  # modeldeki ilk satırın self.older + self.msgs içindeki index'i
+
+    def set_conversation(self, msgs, read_archive=None):
+        self.beginResetModel()
+        self.msgs = msgs
+        self.older = []
+        self.read_archive = read_archive
+        self.archived = getattr(msgs, "archived", 0) if read_archive is not None else 0
+        self.first = max(0, len(msgs) - self.page_size)
+        self.endResetModel()
+
+    def rowCount(self, parent=QModelIndex()):
+        if parent.isValid():
+            return 0
+        return len(self.older) + len(self.msgs) - self.first
+
+    def message(self, position):
+        if position < len(self.older):
+            return self.older[position]
+        return self.msgs[position - len(self.older)]
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid():
+            return None
+        msg = self.message(self.first + index.row())
+        if role == MESSAGE_ROLE:
+            return msg
+        if role == Qt.DisplayRole:
+            return msg.get("text", "")
+        return None
+
+    def has_older(self):
+        return self.first > 0 or self.archived > 0
+
+    def load_older(self):
+        if self.first == 0 and self.archived > 0:
+            # Sıcak pencerenin başı geçildi: bir önceki arşiv segmenti diskten okunur
+            start, msgs = self.read_archive(self.archived)
+            self.older = msgs + self.older
+            self.first = len(msgs)
+            self.archived = start if msgs else 0
+        count = min(self.page_size, self.first)
+        if count:
+            self.beginInsertRows(QModelIndex(), 0, count - 1)
+            self.first -= count
+            self.endInsertRows()
+        return count
+
+    def append_message(self, msgs, msg):
+        # Mesaj her zaman sohbetin kendisine (msgs) eklenir; model o sohbeti
+        # gösteriyorsa sadece yeni satır bildirilir
+        if msgs is not self.msgs:
+            msgs.append(msg)
+            return
+        row = self.rowCount()
+        self.beginInsertRows(QModelIndex(), row, row)
+        msgs.append(msg)
+        self.endInsertRows()
+
+
+class MessageDelegate(QStyledItemDelegate):
+    PADDING_X = 12
+    PADDING_Y = 4
+    IMAGE_GAP = 4
+
+    def __init__(self, user_phone, parent=None):
+        super().__init__(parent)
+        self.user_phone = user_phone
+        self.thumbnails = None  # ThumbnailCache; verilmezse ekler sadece adıyla gösterilir
+        self.set_theme(current_theme())
+
+    def set_theme(self, name):
+        # Renkler her paint'te yeniden oluşturulmaz
+        self.own_color = theme_color(name, "own_message")
+        self.other_color = theme_color(name, "other_message")
+        self.placeholder_color = theme_color(name, "panel")
+
+    def image_size(self, msg, width):
+        # Küçük resim kutusu ekteki boyutlardan hesaplanır; satır yüksekliği
+        # resim üretilmeden önce de sonra da aynıdır
+        attachment = msg.get("attachment")
+        if attachment is None or self.thumbnails is None or not attachment.get("width") \
+                or not self.thumbnails.exists(attachment["sha256"]):
+            return QSize(0, 0)
+        size = QSize(attachment["width"], attachment["height"])
+        box = QSize(min(THUMBNAIL_SIZE, width), THUMBNAIL_SIZE)
+        if size.width() > box.width() or size.height() > box.height():
+            size = size.scaled(box, Qt.KeepAspectRatio)
+        return size
+
+    def message_layout(self, msg):
+        sender = msg.get("sender", "")
+        text = msg.get("text", "")
+        attachment = msg.get("attachment")
+        if attachment is not None:
+            text = f"📎 {attachment.get('name', text)} · {format_bytes(attachment.get('size', 0))}"
+            if self.thumbnails is not None and not self.thumbnails.exists(attachment["sha256"]):
+                text += " (bu cihazda yok)"
+        if sender == self.user_phone:
+            # Gönderen kendimizse sağda göster
+            return text, Qt.AlignRight, self.own_color
+        # Diğer kullanıcıdan mesaj solda
+        return f"{sender}: {text}", Qt.AlignLeft, self.other_color
+
+    def text_width(self, option):
+        view = self.parent()
+        width = view.viewport().width() if view is not None else option.rect.width()
+        return max(width - 2 * self.PADDING_X, 50)
+
+    def sizeHint(self, option, index):
+        msg = index.data(MESSAGE_ROLE)
+        text, _, _ = self.message_layout(msg)
+        width = self.text_width(option)
+        rect = option.fontMetrics.boundingRect(QRect(0, 0, width, 100000), Qt.TextWordWrap, text)
+        height = rect.height()
+        image_size = self.image_size(msg, width)
+        if not image_size.isEmpty():
+            height += image_size.height() + self.IMAGE_GAP
+        return QSize(width + 2 * self.PADDING_X, height + 2 * self.PADDING_Y)
+
+    def paint(self, painter, option, index):
+        msg = index.data(MESSAGE_ROLE)
+        text, alignment, color = self.message_layout(msg)
+        painter.save()
+        painter.setPen(color)
+        painter.setFont(option.font)
+        rect = option.rect.adjusted(self.PADDING_X, self.PADDING_Y, -self.PADDING_X, -self.PADDING_Y)
+        image_size = self.image_size(msg, rect.width())
+        if not image_size.isEmpty():
+            left = rect.right() - image_size.width() + 1 if alignment == Qt.AlignRight else rect.left()
+            target = QRect(left, rect.top(), image_size.width(), image_size.height())
+            image = self.thumbnails.get(msg["attachment"]["sha256"])
+            if image is None:
+                painter.fillRect(target, self.placeholder_color)
+            else:
+                painter.drawImage(target, image)
+            rect.setTop(target.bottom() + 1 + self.IMAGE_GAP)
+        painter.drawText(rect, alignment | Qt.AlignVCenter | Qt.TextWordWrap, text)
+        painter.restore()
+
+
+class MessageListView(QListView):
+    def __init__(self, user_phone, page_size=MESSAGE_PAGE_SIZE):
+        super().__init__()
+        self.message_model = MessageListModel(page_size)
+        self.setModel(self.message_model)
+        self.setItemDelegate(MessageDelegate(user_phone, self))
+        self.setVerticalScrollMode(QAbstractItemView.ScrollPerPixel)
+        self.setHorizontalScrollBarPolicy(Qt.ScrollBarAlwaysOff)
+        self.setResizeMode(QListView.Adjust)
+        self.setSelectionMode(QAbstractItemView.NoSelection)
+        self.setWordWrap(True)
+
+        # Eski sayfa eklenince kullanıcının baktığı yer kaymasın diye alttan uzaklık saklanır
+        self.bottom_offset = None
+        self.at_bottom = True  # en alttayken yeni satırlar/yeniden boyutlanma alta yapışık kalır
+        scroll_bar = self.verticalScrollBar()
+        scroll_bar.valueChanged.connect(self.on_scroll)
+        scroll_bar.rangeChanged.connect(self.on_range_changed)
+
+    def set_conversation(self, msgs, read_archive=None):
+        self.bottom_offset = None
+        self.at_bottom = True
+        self.message_model.set_conversation(msgs, read_archive)
+        self.scrollToBottom()
+
+    def clear(self):
+        self.set_conversation([])
+
+    def set_theme(self, name):
+        self.itemDelegate().set_theme(name)
+        self.viewport().update()
+
+    def set_thumbnails(self, thumbnails):
+        self.itemDelegate().thumbnails = thumbnails
+        thumbnails.changed.connect(self.viewport().update)
+
+    def append_message(self, msgs, msg):
+        if msgs is not self.message_model.msgs:
+            self.message_model.append_message(msgs, msg)
+            return
+        self.at_bottom = True
+        self.message_model.append_message(msgs, msg)
+        self.scrollToBottom()
+
+    def scroll_to_message(self, position):
+        # Mesaj yüklü sayfalarda değilse o sayfaya kadar eski sayfaları yükle;
+        # position sıcak mesajlar içindeki sıradır
+        model = self.message_model
+        position += len(model.older)
+        while model.first > position:
+            model.load_older()
+        self.bottom_offset = None
+        self.at_bottom = False
+        self.scrollTo(model.index(position - model.first), QAbstractItemView.PositionAtCenter)
+
+    def on_scroll(self, value):
+        scroll_bar = self.verticalScrollBar()
+        self.at_bottom = value >= scroll_bar.maximum()
+        if value == scroll_bar.minimum() and scroll_bar.maximum() > 0 \
+                and self.bottom_offset is None and self.message_model.has_older():
+            self.bottom_offset = scroll_bar.maximum() - value
+            self.message_model.load_older()
+
+    def on_range_changed(self, minimum, maximum):
+        if self.bottom_offset is not None:
+            self.verticalScrollBar().setValue(maximum - self.bottom_offset)
+            self.bottom_offset = None
+        elif self.at_bottom:
+            self.verticalScrollBar().setValue(maximum)
+
+# ========== Contact List ==========
+# Kişi listesi son etkinliğe göre sıralanır (en yeni mesaj en üstte). Sıra,
+# (-son mesaj zamanı, ekleme sırası, phone) anahtarlarının sıralı listesidir:
+# yeni mesajda kişinin eski anahtarı ikili aramayla (O(log n)) bulunup
+# çıkarılır, yenisi araya eklenir; liste yeniden sıralanmaz. Silme/ekleme
+# arkadaki işaretçileri kaydırır (memmove, O(n)), bu bilerek kabul edildi:
+# 100k kişide ~0,1 ms, 1M kişide ~1 ms; 100k kişide bir gönderimin toplam
+# ~17 ms'sinin yanında küçük. Ağaç tabanlı bir yapı satır -> kişi erişimini
+# de O(log n) yapardı, data() her görünen satırda bunu öderdi.
+PHONE_PUNCTUATION = str.maketrans("", "", "+ -()")
+PHONE_ROLE = Qt.UserRole
+UNREAD_ROLE = Qt.UserRole + 1
+
+
+class RecentOrder:
+    def __init__(self, contacts=()):
+        self.counter = itertools.count()
+        self.key_of = {}  # phone -> (-timestamp, sıra, phone)
+        for _, phone in contacts:
+            self.key_of[phone] = (-contacts.last_activity(phone), next(self.counter), phone)
+        self.keys = sorted(self.key_of.values())
+
+    def __len__(self):
+        return len(self.keys)
+
+    def __getitem__(self, row):
+        return self.keys[row][2]
+
+    def __contains__(self, phone):
+        return phone in self.key_of
+
+    def key(self, phone, timestamp):
+        # Kişinin eşitlik sırası korunur; yeni kişi sona eklenir
+        old_key = self.key_of.get(phone)
+        return (-timestamp, next(self.counter) if old_key is None else old_key[1], phone)
+
+
+def contact_item_text(name, phone, summary):
+    text, _, unread = summary
+    title = f"{name} ({phone})"
+    if unread:
+        title += f"  •{unread}"
+    # Her satır iki satırdır; liste uniformItemSizes ile satır yüksekliklerini tek tek ölçmez
+    preview = " ".join(text.split())
+    if len(preview) > 40:
+        preview = preview[:39] + "…"
+    return f"{title}\n{preview}"
+
+
+def key_row(keys, key):
+    row = bisect.bisect_left(keys, key)
+    return row if row < len(keys) and keys[row] == key else None
+
+
+class ContactListModel(QAbstractListModel):
+    # Kişi başına item nesnesi yok: satırlar RecentOrder anahtarlarıdır ve
+    # QListView sadece görünen satırlar için data() çağırır. Filtre açıkken
+    # satırlar eşleşen anahtarların aynı sıradaki alt listesidir, yani model
+    # filtre proxy'sinin işini de görür. QSortFilterProxyModel her tuşta her satır
+    # için Python'daki data()'yı çağıracağından 100k kişide yavaş kalırdı; burada
+    # eşleştirme önceden katlanmış isimler üzerinde tek bir list comprehension'dır.
+    def __init__(self, contacts=None):
+        super().__init__()
+        self.set_contacts(contacts if contacts is not None else ContactRegistry())
+
+    def set_contacts(self, contacts):
+        self.beginResetModel()
+        self.contacts = contacts
+        self.order = RecentOrder(contacts)
+        self.rows = self.order.keys  # filtre yokken aynı liste
+        self.query = ""
+        self.digits = ""
+        self.folded_names = {}  # phone -> katlanmış isim; ilk filtrede kurulur
+        self.phone_digits = {}
+        self.endResetModel()
+
+    def rowCount(self, parent=QModelIndex()):
+        if parent.isValid():
+            return 0
+        return len(self.rows)
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid():
+            return None
+        phone = self.rows[index.row()][2]
+        if role == Qt.DisplayRole:
+            return contact_item_text(self.contacts.name(phone), phone, self.contacts.summary(phone))
+        if role == PHONE_ROLE:
+            return phone
+        if role == UNREAD_ROLE:
+            return self.contacts.summary(phone)[2]
+        return None
+
+    def filtered(self):
+        return self.rows is not self.order.keys
+
+    def row_of(self, phone):
+        key = self.order.key_of.get(phone)
+        return None if key is None else key_row(self.rows, key)
+
+    def fold(self, phone):
+        self.folded_names[phone] = turkish_fold(self.contacts.name(phone) or "")
+        self.phone_digits[phone] = re.sub(r"\D", "", phone)
+
+    def fold_all(self):
+        # Tek tek çağırmak yerine bütün isimler tek bir metin olarak katlanır;
+        # 100k kişide ilk tuş vuruşunun maliyeti böylece birkaç kat düşer
+        phones = list(self.order.key_of)
+        known = self.contacts.names
+        names = turkish_fold("\n".join(known.get(phone) or "" for phone in phones)).split("\n")
+        numbers = "\n".join(phones).translate(PHONE_PUNCTUATION)
+        if not numbers.replace("\n", "").isdigit():
+            numbers = re.sub(r"[^\d\n]", "", numbers)
+        if len(names) != len(phones):  # isimlerden birinde satır sonu var
+            names = [turkish_fold(known.get(phone) or "") for phone in phones]
+        self.folded_names = dict(zip(phones, names))
+        self.phone_digits = dict(zip(phones, numbers.split("\n")))
+
+    def matches(self, phone):
+        if not self.query:
+            return True
+        if phone not in self.folded_names:
+            self.fold(phone)
+        return self.query in self.folded_names[phone] or bool(self.digits and self.digits in self.phone_digits[phone])
+
+    def set_filter(self, text):
+        query = turkish_fold(text.strip())
+        digits = re.sub(r"[\s()+-]", "", query)
+        digits = digits if digits.isdigit() else ""
+        if query == self.query:
+            return
+        if query and len(self.folded_names) < len(self.order):
+            self.fold_all()
+        self.beginResetModel()
+        if not query:
+            self.rows = self.order.keys
+        else:
+            # Yazmaya devam edildiyse sadece önceki eşleşmeler taranır
+            source = self.rows if self.query and query.startswith(self.query) else self.order.keys
+            names, numbers = self.folded_names, self.phone_digits
+            self.rows = [
+                key for key in source
+                if query in names[key[2]] or (digits and digits in numbers[key[2]])
+            ]
+        self.query = query
+        self.digits = digits
+        self.endResetModel()
+
+    def lists(self, phone):
+        # Değişecek listeler ve görünür olup olmadıkları
+        if not self.filtered():
+            return [(self.order.keys, True)]
+        lists = [(self.order.keys, False)]
+        if self.matches(phone):
+            lists.append((self.rows, True))
+        return lists
+
+    def insert_contact(self, phone):
+        if self.folded_names:
+            self.fold(phone)
+        key = self.order.key_of[phone] = self.order.key(phone, self.contacts.last_activity(phone))
+        for keys, visible in self.lists(phone):
+            row = bisect.bisect_left(keys, key)
+            if visible:
+                self.beginInsertRows(QModelIndex(), row, row)
+            keys.insert(row, key)
+            if visible:
+                self.endInsertRows()
+
+    def insert_contacts(self, phones):
+        # Toplu içe aktarma: satır satır sinyal yerine tek reset
+        self.beginResetModel()
+        for phone in phones:
+            if self.folded_names:
+                self.fold(phone)
+            key = self.order.key_of[phone] = self.order.key(phone, self.contacts.last_activity(phone))
+            bisect.insort(self.order.keys, key)
+            if self.filtered() and self.matches(phone):
+                bisect.insort(self.rows, key)
+        self.endResetModel()
+
+    def remove_contact(self, phone):
+        key = self.order.key_of.get(phone)
+        if key is None:
+            return
+        for keys, visible in self.lists(phone):
+            row = key_row(keys, key)
+            if row is None:
+                continue
+            if visible:
+                self.beginRemoveRows(QModelIndex(), row, row)
+            del keys[row]
+            if visible:
+                self.endRemoveRows()
+        del self.order.key_of[phone]
+        self.folded_names.pop(phone, None)
+        self.phone_digits.pop(phone, None)
+
+    def update_contact(self, phone):
+        # Özet değişince çağrılır; satır yeni sırasına taşınır (beginMoveRows ile,
+        # seçim ve kaydırma konumu korunur)
+        old_key = self.order.key_of.get(phone)
+        if old_key is None:
+            return
+        new_key = self.order.key(phone, self.contacts.last_activity(phone))
+        if new_key != old_key:
+            for keys, visible in self.lists(phone):
+                old_row = key_row(keys, old_key)
+                if old_row is None:
+                    continue
+                destination = bisect.bisect_left(keys, new_key)
+                moved = destination not in (old_row, old_row + 1)
+                if visible and moved:
+                    self.beginMoveRows(QModelIndex(), old_row, old_row, QModelIndex(), destination)
+                del keys[old_row]
+                keys.insert(destination if destination < old_row else destination - 1, new_key)
+                if visible and moved:
+                    self.endMoveRows()
+            self.order.key_of[phone] = new_key
+        self.refresh_contact(phone)
+
+    def refresh_contact(self, phone):
+        # İsim/özet değişti: filtre açıksa eşleşme durumu da değişmiş olabilir
+        if self.folded_names and phone in self.order.key_of:
+            self.fold(phone)
+        row = self.row_of(phone)
+        if self.filtered() and (row is not None) != self.matches(phone):
+            key = self.order.key_of[phone]
+            if row is None:
+                row = bisect.bisect_left(self.rows, key)
+                self.beginInsertRows(QModelIndex(), row, row)
+                self.rows.insert(row, key)
+                self.endInsertRows()
+            else:
+                self.beginRemoveRows(QModelIndex(), row, row)
+                del self.rows[row]
+                self.endRemoveRows()
+            return
+        if row is not None:
+            index = self.index(row)
+            self.dataChanged.emit(index, index)
+
+
+class ContactDelegate(QStyledItemDelegate):
+    # Okunmamış mesajı olan kişi kalın yazılır; yazı tipi tema stilinden gelir
+    def initStyleOption(self, option, index):
+        super().initStyleOption(option, index)
+        if index.data(UNREAD_ROLE):
+            option.font.setBold(True)
+
 # ========== Chat UI ==========
 class ChatUI(QMainWindow):
-    def __init__(self, user_name, user_phone):
+    def __init__(self, user_name, user_phone, loader=None, startup_timer=None, relay_address=None, sync_address=None):
         super().__init__()
+        ensure_theme()
+        self.setObjectName("chatWindow")
         self.setWindowTitle(f"Türkline - {user_name} ({user_phone})")
         self.setGeometry(100, 100, 1000, 650)
         self.showMaximized()
 
         self.user_name = user_name
         self.user_phone = user_phone
+        self.data_dir = account_dir(user_phone)
+        self.startup_timer = startup_timer
+        self.startup_reported = False
 
-        self.contacts = []  # [(name, phone), ...]
+        self.contacts = ContactRegistry()  # phone -> name, sıralı
+        self.contact_model = ContactListModel()  # son etkinliğe göre sıralı, filtrelenebilir
         self.messages = {}  # { phone: [ { sender, text }, ... ] }
 
-        self.load_messages()
+        # Store, StoreLoader bitince devralınır
+        self.store = None
+        self.persistence = None
+        self.search_index = None
+        self.relay_address = RELAY_ADDRESS if relay_address is None else relay_address
+        self.relay = None
+        self.sync_address = SYNC_LISTEN if sync_address is None else sync_address
+        self.sync_state = None
+        self.sync_server = None
+        self.sync_connections = set()
+
+        self.compact_timer = QTimer(self)
+        self.compact_timer.timeout.connect(self.save_messages)
+        # Diske yazılamayan değişiklik varken durum çubuğunda kalır
+        self.save_error_label = QLabel()
+        self.save_error_label.setObjectName("saveErrorLabel")
+        self.save_error_label.hide()
+        self.statusBar().addPermanentWidget(self.save_error_label)
 
         # --- Left panel ---
         self.user_label = QLabel(f"Türkline\n{self.user_name} ({self.user_phone})")
         self.user_label.setFont(QFont("Segoe UI", 20, QFont.Bold))
-        self.user_label.setStyleSheet("color: #F0F0F0; padding: 15px;")
-
-        self.contact_list = QListWidget()
-        self.contact_list.currentItemChanged.connect(self.change_contact)
-        self.contact_list.setStyleSheet("""
-            QListWidget {
-                background-color: #34495E;
-                border-radius: 15px;
-                color: #ECF0F1;
-                padding: 5px;
-                font-size: 14px;
-            }
-            QListWidget::item:selected {
-                background-color: #2980B9;
-                border-radius: 10px;
-                color: white;
-            }
-        """)
+        self.user_label.setObjectName("userLabel")
+
+        self.search_input = QLineEdit()
+        self.search_input.setPlaceholderText("Mesajlarda ara...")
+        self.search_input.setClearButtonEnabled(True)
+        self.search_input.setObjectName("searchInput")
+        self.search_timer = QTimer(self)
+        self.search_timer.setSingleShot(True)
+        self.search_timer.setInterval(150)
+        self.search_timer.timeout.connect(self.run_search)
+        self.search_input.textChanged.connect(self.search_timer.start)
+
+        self.search_results = QListWidget()
+        self.search_results.hide()
+        self.search_results.itemActivated.connect(self.open_search_result)
+        self.search_results.itemClicked.connect(self.open_search_result)
+
+        self.contact_filter = QLineEdit()
+        self.contact_filter.setPlaceholderText("Kişi ara (isim veya numara)...")
+        self.contact_filter.setClearButtonEnabled(True)
+        self.contact_filter.setObjectName("contactFilter")
+        self.contact_filter.textChanged.connect(self.filter_contacts)
+
+        self.contact_list = QListView()
+        self.contact_list.setModel(self.contact_model)
+        self.contact_list.setItemDelegate(ContactDelegate(self.contact_list))
+        self.contact_list.setUniformItemSizes(True)
+        # QListView yerleşim sırasında her satır için model.index() (Python'da rowCount)
+        # çağırır; 100k satır parça parça, olay döngüsünü bloklamadan yerleştirilir
+        self.contact_list.setLayoutMode(QListView.Batched)
+        self.contact_list.setBatchSize(CONTACT_LAYOUT_BATCH)
+        self.contact_list.setEditTriggers(QAbstractItemView.NoEditTriggers)
+        self.contact_list.selectionModel().currentChanged.connect(self.change_contact)
+        self.contact_list.setProperty("sidebar", True)
+        self.filtering = False
+
+        self.search_results.setProperty("sidebar", True)
 
         self.add_contact_btn = QPushButton("Yeni Kişi Ekle")
         self.add_contact_btn.setCursor(Qt.PointingHandCursor)
-        self.add_contact_btn.setStyleSheet(self.button_style())
         self.add_contact_btn.clicked.connect(self.add_contact)
 
         self.edit_contact_btn = QPushButton("Düzenle")
         self.edit_contact_btn.setCursor(Qt.PointingHandCursor)
-        self.edit_contact_btn.setStyleSheet(self.button_style())
         self.edit_contact_btn.clicked.connect(self.edit_contact)
 
         self.delete_contact_btn = QPushButton("Sil")
         self.delete_contact_btn.setCursor(Qt.PointingHandCursor)
-        self.delete_contact_btn.setStyleSheet(self.button_style())
         self.delete_contact_btn.clicked.connect(self.delete_contact)
 
+        self.import_contacts_btn = QPushButton("İçe Aktar")
+        self.import_contacts_btn.setCursor(Qt.PointingHandCursor)
+        self.import_contacts_btn.clicked.connect(self.import_contacts)
+
+        self.export_contacts_btn = QPushButton("Dışa Aktar")
+        self.export_contacts_btn.setCursor(Qt.PointingHandCursor)
+        self.export_contacts_btn.clicked.connect(self.export_contacts)
+
+        self.sync_btn = QPushButton("Eşitle")
+        self.sync_btn.setToolTip("Bu hesabın başka bir cihazdaki kopyasıyla mesajları eşitle")
+        self.sync_btn.setCursor(Qt.PointingHandCursor)
+        self.sync_btn.clicked.connect(self.sync_devices)
+
+        self.theme_btn = QPushButton()
+        self.theme_btn.setObjectName("themeButton")
+        self.theme_btn.setCursor(Qt.PointingHandCursor)
+        self.theme_btn.clicked.connect(self.toggle_theme)
+        self.update_theme_button()
+
         btn_layout = QHBoxLayout()
         btn_layout.addWidget(self.add_contact_btn)
         btn_layout.addWidget(self.edit_contact_btn)
         btn_layout.addWidget(self.delete_contact_btn)
 
+        io_layout = QHBoxLayout()
+        io_layout.addWidget(self.import_contacts_btn)
+        io_layout.addWidget(self.export_contacts_btn)
+        io_layout.addWidget(self.sync_btn)
+
         left_layout = QVBoxLayout()
-        left_layout.addWidget(self.user_label)
+        header_layout = QHBoxLayout()
+        header_layout.addWidget(self.user_label, 1)
+        header_layout.addWidget(self.theme_btn, 0, Qt.AlignTop)
+        left_layout.addLayout(header_layout)
+        left_layout.addWidget(self.search_input)
+        left_layout.addWidget(self.search_results)
+        left_layout.addWidget(self.contact_filter)
         left_layout.addWidget(self.contact_list)
         left_layout.addLayout(btn_layout)
+        left_layout.addLayout(io_layout)
 
         left_widget = QWidget()
         left_widget.setLayout(left_layout)
         left_widget.setMinimumWidth(320)
         left_widget.setMaximumWidth(400)
-        left_widget.setStyleSheet("background-color: #2C3E50; border-top-left-radius: 20px; border-bottom-left-radius: 20px;")
+        left_widget.setObjectName("sidebar")
 
         # --- Right panel ---
         self.chat_label = QLabel("Sohbet")
         self.chat_label.setFont(QFont("Segoe UI", 18, QFont.Bold))
-        self.chat_label.setStyleSheet("color: #F0F0F0; padding: 15px; border-bottom: 1px solid #34495E;")
-
-        self.chat_area = QTextBrowser()
-        self.chat_area.setStyleSheet("""
-            QTextBrowser {
-                background-color: #1E272E;
-                color: #D0D7DE;
-                border-radius: 15px;
-                padding: 15px;
-                font-size: 14px;
-            }
-        """)
-        self.chat_area.setOpenLinks(False)
+        self.chat_label.setObjectName("chatLabel")
+
+        self.chat_area = MessageListView(self.user_phone)
+        self.chat_area.setObjectName("chatArea")
+        self.chat_area.doubleClicked.connect(self.open_attachment)
+
+        self.attachments = AttachmentWorker(AttachmentStore(os.path.join(self.data_dir, ATTACHMENT_DIR)))
+        self.attachments.added.connect(self.on_attachment_added)
+        self.attachments.failed.connect(self.on_attachment_failed)
+        self.thumbnails = ThumbnailCache(self.attachments)
+        self.chat_area.set_thumbnails(self.thumbnails)
 
         self.message_input = QLineEdit()
         self.message_input.setPlaceholderText("Mesaj yaz...")
-        self.message_input.setStyleSheet("""
-            QLineEdit {
-                border-radius: 25px;
-                padding: 15px 20px;
-                background-color: #34495E;
-                color: #ECF0F1;
-                border: none;
-                font-size: 15px;
-            }
-            QLineEdit:focus {
-                background-color: #3F5873;
-            }
-        """)
+        self.message_input.setObjectName("messageInput")
         self.message_input.returnPressed.connect(self.send_message)
 
         self.send_button = QPushButton("Gönder")
         self.send_button.setCursor(Qt.PointingHandCursor)
-        self.send_button.setStyleSheet(self.button_style())
         self.send_button.clicked.connect(self.send_message)
 
+        self.attach_button = QPushButton("📎")
+        self.attach_button.setToolTip("Dosya ekle")
+        self.attach_button.setCursor(Qt.PointingHandCursor)
+        self.attach_button.clicked.connect(self.attach_file)
+
         bottom_layout = QHBoxLayout()
         bottom_layout.addWidget(self.message_input)
+        bottom_layout.addWidget(self.attach_button)
         bottom_layout.addWidget(self.send_button)
         bottom_layout.setContentsMargins(0, 10, 0, 10)
 
@@ -316,7 +4747,7 @@ class ChatUI(QMainWindow):
 
         right_widget = QWidget()
         right_widget.setLayout(right_layout)
-        right_widget.setStyleSheet("background-color: #1E272E; border-top-right-radius: 20px; border-bottom-right-radius: 20px;")
+        right_widget.setObjectName("chatPanel")
 
         # --- Main layout ---
         main_layout = QHBoxLayout()
@@ -328,100 +4759,170 @@ class ChatUI(QMainWindow):
         container.setLayout(main_layout)
         self.setCentralWidget(container)
 
+        self.current_contact_phone = None
+        self.set_loading(True)
+
+        self.profiler_panel = None
+        if PROFILER.enabled:
+            self.profiler_panel = ProfilerPanel(PROFILER)
+            shortcut = QShortcut(QKeySequence("Ctrl+Shift+D"), self)
+            shortcut.activated.connect(self.profiler_panel.toggle)
+
+        # Loader verilmezse veriler burada senkron yüklenir
+        if loader is None:
+            loader = StoreLoader(self.data_dir, country_code_of(user_phone))
+            loader.run()
+        self.loader = loader
+        loader.finished.connect(self.on_store_loaded)
+        if loader.done:
+            self.on_store_loaded()
+
+    def on_store_loaded(self):
+        if self.store is not None:
+            return
+        self.store, self.contacts, self.messages, self.search_index = self.loader.result
+        if self.store.load_warnings:
+            QMessageBox.warning(self, "Uyarı", "Kayıtlı veriler yüklenirken sorun oluştu:\n" + "\n".join(self.store.load_warnings))
+
+        self.persistence = PersistenceWorker(self.store, read_only=self.loader.failed)
+        self.persistence.signals.failed.connect(self.on_save_failed)
+        self.persistence.signals.recovered.connect(self.on_save_recovered)
+        self.persistence.start()
+        QApplication.instance().aboutToQuit.connect(self.shutdown_persistence)
+        self.compact_timer.start(COMPACT_INTERVAL_MS)
+        self.mark_startup("data_loaded")
+
         # Load or initialize contacts and messages
         if not self.contacts:
             # Example users
-            self.contacts = [("Kullanıcı 1", "+905551112233"), ("Kullanıcı 2", "+905559998877")]
-            for name, phone in self.contacts:
-                self.add_contact_list_item(name, phone)
+            for name, phone in [("Kullanıcı 1", "+905551112233"), ("Kullanıcı 2", "+905559998877")]:
+                self.contacts.add(name, phone)
                 if phone not in self.messages:
-                    self.messages[phone] = []
-        else:
-            for name, phone in self.contacts:
-                self.add_contact_list_item(name, phone)
+                    self.messages[phone] = Conversation()
+                self.record_change({"op": "add_contact", "name": name, "phone": phone})
 
-        self.current_contact_phone = None
-        if self.contact_list.count() > 0:
-            self.contact_list.setCurrentRow(0)
-
-    def button_style(self):
-        return """
-            QPushButton {
-                border-radius: 18px;
-                background-color: #2980B9;
-                color: white;
-                font-weight: bold;
-                padding: 10px 20px;
-                border: none;
-                font-size: 14px;
-            }
-            QPushButton:hover {
-                background-color: #3498DB;
-            }
-            QPushButton:pressed {
-                background-color: #1B6CA8;
-            }
-        """
+        self.set_loading(False)
+        self.contact_model.set_contacts(self.contacts)
+        if self.contact_model.rowCount() > 0:
+            self.contact_list.setCurrentIndex(self.contact_model.index(0))
+        self.mark_startup("contacts_listed")
+
+        # Salt okunur oturumda gelen mesajlar kaydedilemez; sunucuda beklemeye devam eder
+        if self.relay_address and not self.persistence.read_only:
+            self.relay = RelayClient(self.user_phone, self.relay_address, relay_token(self.data_dir),
+                                     os.path.join(self.data_dir, RELAY_OUTBOX_FILE))
+            self.relay.received.connect(self.receive_messages)
+            self.relay.connection_changed.connect(self.on_relay_connection)
+            self.relay.rejected.connect(self.on_relay_rejected)
+            self.statusBar().showMessage(f"Sunucuya bağlanılıyor: {self.relay_address}")
+            self.relay.start()
+
+        self.sync_state = SyncState(self.data_dir).load()
+        if self.sync_address and not self.persistence.read_only:
+            host, port = parse_address(self.sync_address)
+            self.sync_server = QTcpServer(self)
+            self.sync_server.newConnection.connect(self.on_sync_connection)
+            if not self.sync_server.listen(QHostAddress(host), port):
+                self.statusBar().showMessage(f"Eşitleme adresi dinlenemiyor: {self.sync_server.errorString()}")
+
+    def set_loading(self, loading):
+        for widget in (self.add_contact_btn, self.edit_contact_btn, self.delete_contact_btn,
+                       self.import_contacts_btn, self.export_contacts_btn, self.sync_btn, self.search_input, self.contact_filter,
+                       self.message_input, self.attach_button, self.send_button):
+            widget.setEnabled(not loading)
+        self.chat_label.setText("Yükleniyor..." if loading else "Sohbet")
+
+    def mark_startup(self, name):
+        if self.startup_timer is None or self.startup_reported:
+            return
+        self.startup_timer.mark(name)
+        marks = self.startup_timer.marks
+        if "first_paint" in marks and "contacts_listed" in marks:
+            self.startup_reported = True
+            self.startup_timer.report()
+
+    def paintEvent(self, event):
+        super().paintEvent(event)
+        if self.startup_timer is not None and "first_paint" not in self.startup_timer.marks:
+            self.mark_startup("first_paint")
 
-    def add_contact_list_item(self, name, phone):
-        display_text = f"{name} ({phone})"
-        self.contact_list.addItem(display_text)
+    def activate_window(self):
+        # Aynı hesap ikinci kez açılmak istendi: bu pencere öne getirilir
+        self.setWindowState(self.windowState() & ~Qt.WindowMinimized | Qt.WindowActive)
+        self.raise_()
+        self.activateWindow()
 
-    def parse_contact_list_item(self, text):
-        if "(" in text and text.endswith(")"):
-            name = text[: text.rfind("(")].strip()
-            phone = text[text.rfind("(") + 1 : -1].strip()
-            return name, phone
-        return text, ""
+    def toggle_theme(self):
+        name = apply_theme(QApplication.instance(), "light" if current_theme() == "dark" else "dark")
+        self.chat_area.set_theme(name)
+        self.update_theme_button()
+
+    def update_theme_button(self):
+        dark = current_theme() == "dark"
+        self.theme_btn.setText("☀" if dark else "☾")
+        self.theme_btn.setToolTip("Açık temaya geç" if dark else "Koyu temaya geç")
+
+    def select_contact(self, phone):
+        row = self.contact_model.row_of(phone)
+        if row is None:
+            # Filtre bu kişiyi gizliyor
+            self.contact_filter.clear()
+            row = self.contact_model.row_of(phone)
+        if row is not None:
+            self.contact_list.setCurrentIndex(self.contact_model.index(row))
+
+    def filter_contacts(self, text):
+        # Model sıfırlanınca seçim kaybolur; açık sohbet kapanmasın diye
+        # change_contact bu sırada yok sayılır ve seçim geri yüklenir
+        self.filtering = True
+        self.contact_model.set_filter(text)
+        self.filtering = False
+        if self.current_contact_phone is not None:
+            row = self.contact_model.row_of(self.current_contact_phone)
+            if row is not None:
+                self.contact_list.setCurrentIndex(self.contact_model.index(row))
 
     def add_contact(self):
-        dialog = AddContactDialog()
+        dialog = AddContactDialog(country_code_of(self.user_phone))
         if dialog.exec() == QDialog.Accepted:
             name = dialog.contact_name
             phone = dialog.contact_phone
 
             # kontrol: telefon numarası zaten var mı
-            for n, p in self.contacts:
-                if p == phone:
-                    QMessageBox.warning(self, "Uyarı", "Bu telefon numarası zaten kayıtlı.")
-                    return
-
-            self.contacts.append((name, phone))
-            self.messages[phone] = []
-            self.add_contact_list_item(name, phone)
-            self.save_messages()
+            if phone in self.contacts:
+                QMessageBox.warning(self, "Uyarı", "Bu telefon numarası zaten kayıtlı.")
+                return
+
+            self.contacts.add(name, phone)
+            self.messages[phone] = Conversation()
+            self.contact_model.insert_contact(phone)
+            self.record_change({"op": "add_contact", "name": name, "phone": phone})
 
     def edit_contact(self):
-        current = self.contact_list.currentItem()
-        if not current:
+        phone = self.current_contact_phone
+        if not phone:
             QMessageBox.warning(self, "Uyarı", "Lütfen düzenlemek için bir kişi seçin.")
             return
 
-        old_name, old_phone = self.parse_contact_list_item(current.text())
+        old_name = self.contacts.name(phone)
 
         text, ok = QInputDialog.getText(self, "Kişi Düzenle", "Yeni isim:", text=old_name)
         if ok and text.strip():
             new_name = text.strip()
-            if new_name != old_name:
-                idx = -1
-                for i, (n, p) in enumerate(self.contacts):
-                    if p == old_phone:
-                        idx = i
-                        break
-                if idx != -1:
-                    self.contacts[idx] = (new_name, old_phone)
-                    current.setText(f"{new_name} ({old_phone})")
-                    if self.chat_label.text() == f"{old_name} ({old_phone})":
-                        self.chat_label.setText(f"{new_name} ({old_phone})")
-                    self.save_messages()
+            if new_name != old_name and phone in self.contacts:
+                self.contacts.rename(phone, new_name)
+                self.contact_model.refresh_contact(phone)
+                if self.current_contact_phone == phone:
+                    self.chat_label.setText(f"{new_name} ({phone})")
+                self.record_change({"op": "edit_contact", "name": new_name, "phone": phone})
 
     def delete_contact(self):
-        current = self.contact_list.currentItem()
-        if not current:
+        phone = self.current_contact_phone
+        if not phone:
             QMessageBox.warning(self, "Uyarı", "Lütfen silmek için bir kişi seçin.")
             return
 
-        name, phone = self.parse_contact_list_item(current.text())
+        name = self.contacts.name(phone)
 
         confirm = QMessageBox.question(
             self,
@@ -430,39 +4931,87 @@ class ChatUI(QMainWindow):
             QMessageBox.Yes | QMessageBox.No
         )
         if confirm == QMessageBox.Yes:
-            idx = self.contact_list.row(current)
-            self.contact_list.takeItem(idx)
-            self.contacts = [(n, p) for n, p in self.contacts if p != phone]
+            self.contact_model.remove_contact(phone)
+            self.contacts.remove(phone)
             if phone in self.messages:
                 del self.messages[phone]
-            self.chat_area.clear()
-            self.chat_label.setText("Sohbet")
+            self.search_index.remove(phone)
+            # Satır silinince Qt komşu kişiyi seçmiş olabilir; görünüm ve
+            # current_contact_phone listede seçili olan kişiye göre yeniden kurulur
+            self.current_contact_phone = None
+            self.change_contact(self.contact_list.currentIndex(), QModelIndex())
+            self.record_change({"op": "delete_contact", "phone": phone})
+
+    def import_contacts(self):
+        path, _ = QFileDialog.getOpenFileName(
+            self, "Kişileri İçe Aktar", "", "Kişi dosyaları (*.vcf *.vcard *.csv);;Tüm dosyalar (*)"
+        )
+        if not path:
+            return
+        try:
+            added, skipped = collect_new_contacts(
+                read_contacts_file(path), self.contacts, country_code_of(self.user_phone)
+            )
+        except (OSError, csv.Error) as e:
+            QMessageBox.warning(self, "Uyarı", f"Dosya okunamadı:\n{e}")
+            return
+
+        for name, phone in added:
+            self.contacts.add(name, phone)
+            self.messages[phone] = Conversation()
+        self.contact_model.insert_contacts([phone for _, phone in added])
+        if self.current_contact_phone is not None:
+            self.select_contact(self.current_contact_phone)
+        # Tüm kişiler tek batch olarak yazılır
+        if added:
+            self.persistence.submit_many(contact_records(added))
             self.save_messages()
+        QMessageBox.information(self, "İçe Aktar", f"{len(added)} kişi eklendi, {skipped} kayıt atlandı.")
+
+    def export_contacts(self):
+        path, _ = QFileDialog.getSaveFileName(
+            self, "Kişileri Dışa Aktar", "kisiler.vcf", "vCard (*.vcf);;CSV (*.csv)"
+        )
+        if not path:
+            return
+        try:
+            write_contacts_file(path, self.contacts)
+        except OSError as e:
+            QMessageBox.warning(self, "Uyarı", f"Dosya yazılamadı:\n{e}")
 
     def change_contact(self, current, previous):
-        if current:
-            name, phone = self.parse_contact_list_item(current.text())
+        if self.filtering:
+            return
+        if current.isValid():
+            phone = current.data(PHONE_ROLE)
+            if phone == self.current_contact_phone:
+                return  # filtre/sıralama sonrası aynı kişi yeniden seçildi
+            name = self.contacts.name(phone)
             self.current_contact_phone = phone
             self.chat_label.setText(f"{name} ({phone})")
             self.load_chat_messages(phone)
+            if self.contacts.mark_read(phone):
+                self.contact_model.refresh_contact(phone)
+                self.record_change({"op": "read", "phone": phone})
         else:
             self.current_contact_phone = None
             self.chat_area.clear()
             self.chat_label.setText("Sohbet")
 
     def load_chat_messages(self, phone):
-        self.chat_area.clear()
-        if phone in self.messages:
-            for msg in self.messages[phone]:
-                sender = msg.get("sender", "")
-                text = msg.get("text", "")
-                if sender == self.user_phone:
-                    # Gönderen kendimizse sağda göster
-                    self.chat_area.append(f'<div style="text-align:right; color:#58D68D;">{text}</div>')
-                else:
-                    # Diğer kullanıcıdan mesaj solda
-                    self.chat_area.append(f'<div style="text-align:left; color:#F0F0F0;">{sender}: {text}</div>')
-            self.chat_area.moveCursor(QTextCursor.End)
+        # Tam yükleme sadece kişi değişince yapılır; model yalnızca son sayfayı sunar
+        msgs = self.messages.setdefault(phone, Conversation())
+        pin_conversation(self.messages, phone)
+        self.search_index.sync(phone, msgs)
+        read_archive = None
+        if self.store.archive is not None and msgs.archived:
+            read_archive = functools.partial(self.store.archive.read, phone)
+        self.chat_area.set_conversation(msgs, read_archive)
+
+    def append_chat_message(self, phone, msg):
+        # Mesaj self.messages'taki sohbete eklenir; açık sohbetse görünüme sadece
+        # yeni satır eklenir, süre sohbet uzunluğundan bağımsız
+        self.chat_area.append_message(self.messages.setdefault(phone, Conversation()), msg)
 
     def send_message(self):
         if not self.current_contact_phone:
@@ -472,80 +5021,284 @@ class ChatUI(QMainWindow):
         if not text:
             return
         # Mesajı ekle
-        msg = {"sender": self.user_phone, "text": text}
-        self.messages.setdefault(self.current_contact_phone, []).append(msg)
-        self.load_chat_messages(self.current_contact_phone)
+        msg = {"sender": self.user_phone, "text": text, "timestamp": time.time(), "id": new_message_id()}
         self.message_input.clear()
-        self.save_messages()
+        self.add_own_message(self.current_contact_phone, msg)
+
+    def add_own_message(self, phone, msg):
+        self.append_chat_message(phone, msg)
+        self.search_index.sync(phone, self.messages[phone])
+        self.contacts.note_message(phone, msg)
+        self.contact_model.update_contact(phone)
+        self.record_change({"op": "message", "phone": phone, "msg": msg})
+        if self.relay is not None:
+            self.relay.send(phone, msg)
+
+    def attach_file(self):
+        if not self.current_contact_phone:
+            QMessageBox.warning(self, "Uyarı", "Lütfen dosya göndermek için bir kişi seçin.")
+            return
+        path, _ = QFileDialog.getOpenFileName(self, "Dosya Ekle", "", "Tüm dosyalar (*)")
+        if not path:
+            return
+        # Hash ve kopyalama işçi thread'inde; mesaj dosya hazır olunca eklenir
+        self.attachments.add(self.current_contact_phone, path)
+        self.statusBar().showMessage(f"Dosya hazırlanıyor: {os.path.basename(path)}")
+
+    def on_attachment_added(self, phone, attachment):
+        self.statusBar().clearMessage()
+        self.thumbnails.available.pop(attachment["sha256"], None)
+        if phone not in self.contacts:
+            return  # dosya hazırlanırken kişi silindi
+        msg = {
+            "sender": self.user_phone, "text": attachment["name"], "timestamp": time.time(),
+            "id": new_message_id(), "attachment": attachment,
+        }
+        self.add_own_message(phone, msg)
+
+    def on_attachment_failed(self, message):
+        self.statusBar().showMessage(f"Dosya işlemi başarısız: {message}", 5000)
+
+    def open_attachment(self, index):
+        attachment = index.data(MESSAGE_ROLE).get("attachment")
+        if attachment is None or not self.thumbnails.exists(attachment["sha256"]):
+            return
+        path, _ = QFileDialog.getSaveFileName(self, "Dosyayı Kaydet", attachment.get("name", ""))
+        if path:
+            self.attachments.export(attachment["sha256"], path)
+
+    def receive_messages(self, batch, ack):
+        # RelayClient thread'inden kuyruklu sinyalle gelir; ağ beklemesi GUI'de yapılmaz
+        for phone, msg in batch:
+            if phone == self.user_phone:
+                continue
+            if phone in self.contacts and phone in self.messages and self.messages[phone].contains_id(msg["id"]):
+                continue  # teslim onayı kaybolduğu için tekrar gönderilmiş
+            if phone not in self.contacts:
+                # Tanınmayan numaradan gelen mesaj yeni kişi olarak eklenir
+                self.contacts.add(phone, phone)
+                self.messages.setdefault(phone, Conversation())
+                self.contact_model.insert_contact(phone)
+                self.record_change({"op": "add_contact", "name": phone, "phone": phone})
+            record = {"op": "message", "phone": phone, "msg": msg}
+            self.append_chat_message(phone, msg)
+            if phone != self.current_contact_phone:
+                record["unread"] = True
+            self.search_index.sync(phone, self.messages[phone])
+            self.contacts.note_message(phone, msg, record.get("unread", False))
+            self.contact_model.update_contact(phone)
+            self.record_change(record)
+        # Sunucu mesajları biz diske yazdığımızı onaylayana kadar saklar
+        relay = self.relay
+        self.persistence.after_saved(lambda: relay.confirm(ack))
+
+    def on_relay_connection(self, connected):
+        if connected:
+            self.statusBar().showMessage(f"Sunucuya bağlı: {self.relay_address}")
+        else:
+            self.statusBar().showMessage("Sunucu bağlantısı koptu, yeniden deneniyor...")
+
+    def on_relay_rejected(self, message):
+        self.statusBar().showMessage(f"Sunucu bu hesabı reddetti: {message}")
+
+    def run_search(self):
+        query = self.search_input.text().strip()
+        self.search_results.clear()
+        if not query:
+            self.search_results.hide()
+            self.contact_list.show()
+            return
+
+        shown = 0
+        for phone, positions in search_messages(self.search_index, self.messages, query):
+            msgs = self.messages[phone]
+            name = self.contacts.name(phone) or phone
+            for position in reversed(positions):
+                if shown >= SEARCH_RESULT_LIMIT:
+                    break
+                item = QListWidgetItem(f"{name}: {msgs[position].get('text', '')}")
+                item.setData(Qt.UserRole, (phone, position))
+                self.search_results.addItem(item)
+                shown += 1
+        if shown == 0:
+            item = QListWidgetItem("Sonuç bulunamadı")
+            item.setFlags(Qt.NoItemFlags)
+            self.search_results.addItem(item)
+        self.contact_list.hide()
+        self.search_results.show()
+
+    def open_search_result(self, item):
+        hit = item.data(Qt.UserRole)
+        if not hit:
+            return
+        phone, position = hit
+        if phone in self.contacts:
+            self.select_contact(phone)
+            self.chat_area.scroll_to_message(position)
+
+    def sync_devices(self):
+        if self.persistence.read_only:
+            QMessageBox.warning(self, "Uyarı", "Kayıtlı veriler yüklenemediği için eşitleme kapalı.")
+            return
+        actions = ["Cihaza bağlan...", "Paketi dışa aktar...", "Paketi içe aktar..."]
+        action, ok = QInputDialog.getItem(
+            self, "Eşitle", f"Bu cihaz: {self.sync_state.device}\nNe yapılsın?", actions, 0, False
+        )
+        if not ok:
+            return
+        if action == actions[0]:
+            self.connect_sync_peer()
+        elif action == actions[1]:
+            self.export_sync_bundle()
+        else:
+            self.import_sync_bundle()
 
-    def load_messages(self):
-        if not os.path.exists(DATA_FILE):
-            # data klasörünü oluştur
-            os.makedirs(os.path.dirname(DATA_FILE), exist_ok=True)
-            with open(DATA_FILE, "w", encoding="utf-8") as f:
-                json.dump({"contacts": [], "messages": {}}, f, indent=4)
+    def sync_endpoint(self):
+        return SyncEndpoint(self.user_phone, self.sync_state, self.store, self.contacts, self.messages,
+                            self.apply_sync_changes, self.persistence.flush, lambda: self.current_contact_phone)
 
+    def apply_sync_changes(self, changes):
+        # Bir sohbete eşitlemeyle gelen mesajlar self.messages'a eklendi: görünüm
+        # güncellenir, kayıtlar tek batch olarak yazılır
+        phone = changes[0]["phone"]
+        if changes[0]["op"] == "add_contact":
+            self.contact_model.insert_contact(phone)
+        if phone == self.current_contact_phone:
+            self.load_chat_messages(phone)  # mesajlar modelin listesine doğrudan eklendi
+        else:
+            self.search_index.sync(phone, self.messages[phone])
+        self.contact_model.update_contact(phone)
+        self.persistence.submit_many(changes)
+        if self.persistence.unsaved >= COMPACT_EVERY:
+            self.save_messages()
+
+    def connect_sync_peer(self):
+        address, ok = QInputDialog.getText(
+            self, "Cihaza Bağlan", "Diğer cihazın eşitleme adresi (HOST:PORT):", text=f"127.0.0.1:{SYNC_DEFAULT_PORT}"
+        )
+        if not ok or not address.strip():
+            return
         try:
-            with open(DATA_FILE, "r", encoding="utf-8") as f:
-                data = json.load(f)
-                self.contacts = data.get("contacts", [])
-                self.messages = data.get("messages", {})
-        except Exception:
-            self.contacts = []
-            self.messages = {}
+            host, port = parse_address(address.strip())
+        except ValueError:
+            QMessageBox.warning(self, "Uyarı", f"Geçersiz adres: {address}")
+            return
+        socket = QTcpSocket(self)
+        connection = self.start_sync(socket)
+        socket.connected.connect(connection.start)
+        socket.connectToHost(host, port)
+        self.statusBar().showMessage(f"Eşitleniyor: {host}:{port}")
+
+    def on_sync_connection(self):
+        while self.sync_server.hasPendingConnections():
+            self.start_sync(self.sync_server.nextPendingConnection()).start()
+            self.statusBar().showMessage("Başka bir cihaz eşitleniyor...")
+
+    def start_sync(self, socket):
+        connection = SyncConnection(socket, SyncExchange(self.sync_endpoint()))
+        connection.finished.connect(functools.partial(self.on_sync_finished, connection))
+        self.sync_connections.add(connection)
+        return connection
+
+    def on_sync_finished(self, connection, error):
+        self.sync_connections.discard(connection)
+        exchange = connection.exchange
+        if error:
+            self.statusBar().showMessage(f"Eşitleme başarısız: {error}", 10000)
+        else:
+            self.statusBar().showMessage(
+                f"Eşitleme tamamlandı: {exchange.merged} mesaj alındı, {exchange.sent} mesaj gönderildi", 10000
+            )
+
+    def export_sync_bundle(self):
+        # Eşin henüz almadığı mesajlar; eş seçilmezse tüm geçmiş (yeni cihaz)
+        peers = list(self.sync_state.peers)
+        choices = ["Tüm geçmiş (yeni cihaz)"] + [
+            f"{device} ({self.sync_state.peers[device].get('host', '?')})" for device in peers
+        ]
+        choice, ok = QInputDialog.getItem(self, "Paketi Dışa Aktar", "Paket hangi cihaz için?", choices, 0, False)
+        if not ok:
+            return
+        peer = peers[choices.index(choice) - 1] if choice != choices[0] else None
+        path, _ = QFileDialog.getSaveFileName(
+            self, "Paketi Dışa Aktar", "turkline" + SYNC_BUNDLE_SUFFIX, f"Türkline eşitleme paketi (*{SYNC_BUNDLE_SUFFIX})"
+        )
+        if not path:
+            return
+        try:
+            count = write_sync_bundle(path, self.sync_endpoint(), peer)
+        except OSError as e:
+            QMessageBox.warning(self, "Uyarı", f"Paket yazılamadı:\n{e}")
+            return
+        self.statusBar().showMessage(f"{count} mesaj dışa aktarıldı: {path}", 10000)
+
+    def import_sync_bundle(self):
+        path, _ = QFileDialog.getOpenFileName(
+            self, "Paketi İçe Aktar", "", f"Türkline eşitleme paketi (*{SYNC_BUNDLE_SUFFIX});;Tüm dosyalar (*)"
+        )
+        if not path:
+            return
+        try:
+            count = read_sync_bundle(path, self.sync_endpoint())
+        except (OSError, ValueError) as e:
+            QMessageBox.warning(self, "Uyarı", f"Paket içe aktarılamadı:\n{e}")
+            return
+        self.statusBar().showMessage(f"Eşitleme tamamlandı: {count} yeni mesaj", 10000)
+
+    def record_change(self, record):
+        # Sadece kuyruğa eklenir; journal'a yazma ve sıkıştırma işçi thread'inde yapılır
+        self.persistence.submit(record)
+        if self.persistence.unsaved >= COMPACT_EVERY:
+            self.save_messages()
 
     def save_messages(self):
-        data = {
-            "contacts": self.contacts,
-            "messages": self.messages
-        }
-        with open(DATA_FILE, "w", encoding="utf-8") as f:
-            json.dump(data, f, indent=4)
+        # Açık sohbetin başı arşive taşınmaz, görünümdeki sıralar kaymasın
+        self.persistence.request_compact(self.contacts, self.messages, (self.current_contact_phone,))
+        self.persistence.save_index(self.search_index)
+
+    def on_save_failed(self, error):
+        # Değişiklikler işçide bekler ve yeniden denenir; kullanıcı farkında olmalı
+        self.save_error_label.setText("Kaydedilemiyor, yeniden deneniyor...")
+        self.save_error_label.setToolTip(error)
+        self.save_error_label.show()
+        QMessageBox.warning(self, "Uyarı", f"Değişiklikler diske yazılamadı:\n{error}\n\n"
+                            "Program açık kaldıkça yazma birkaç saniyede bir yeniden denenecek.")
+
+    def on_save_recovered(self):
+        self.save_error_label.hide()
+        self.statusBar().showMessage("Bekleyen değişiklikler kaydedildi", 5000)
+
+    def shutdown_persistence(self):
+        self.compact_timer.stop()
+        self.attachments.stop()
+        if self.relay is not None:
+            self.relay.stop()
+        if self.sync_server is not None:
+            self.sync_server.close()
+        for connection in list(self.sync_connections):
+            connection.socket.abort()
+        if self.persistence is None:
+            return
+        self.persistence.stop()
+        if self.persistence.read_only:
+            return
+        try:
+            self.search_index.save()
+        except OSError as e:
+            print(f"Arama indeksi kaydedilemedi: {e}", file=sys.stderr)
+
+    def closeEvent(self, event):
+        self.shutdown_persistence()
+        super().closeEvent(event)
 
 # ========== Add Contact Dialog ==========
 class AddContactDialog(QDialog):
-    def __init__(self):
+    def __init__(self, default_code="+90"):
         super().__init__()
+        self.default_code = default_code
         self.setWindowTitle("Yeni Kişi Ekle")
         self.setFixedSize(400, 180)
-        self.setStyleSheet("""
-            QDialog {
-                background-color: #1F2937;
-                color: #E5E7EB;
-                font-family: 'Segoe UI', Tahoma, Geneva, Verdana, sans-serif;
-            }
-            QLabel {
-                font-size: 16px;
-                font-weight: bold;
-            }
-            QLineEdit {
-                background-color: #374151;
-                border: 1.5px solid #4B5563;
-                border-radius: 8px;
-                padding: 10px 14px;
-                color: #F9FAFB;
-                font-size: 15px;
-            }
-            QLineEdit:focus {
-                border: 1.5px solid #3B82F6;
-                background-color: #2563EB;
-                color: white;
-            }
-            QPushButton {
-                background-color: #3B82F6;
-                border-radius: 10px;
-                padding: 10px 25px;
-                color: white;
-                font-weight: bold;
-                font-size: 16px;
-            }
-            QPushButton:hover {
-                background-color: #2563EB;
-            }
-            QPushButton:pressed {
-                background-color: #1D4ED8;
-            }
-        """)
+        self.setProperty("form", True)
 
         layout = QFormLayout()
         self.name_input = QLineEdit()
@@ -553,8 +5306,8 @@ class AddContactDialog(QDialog):
         layout.addRow(QLabel("Ad:"), self.name_input)
 
         self.phone_input = QLineEdit()
-        self.phone_input.setPlaceholderText("Telefon numarası (başında 0 olmadan)")
-        self.phone_input.setMaxLength(15)
+        self.phone_input.setPlaceholderText("Telefon numarası (ör. 0555 111 22 33)")
+        self.phone_input.setMaxLength(24)
         layout.addRow(QLabel("Telefon:"), self.phone_input)
 
         buttons = QDialogButtonBox(QDialogButtonBox.Ok | QDialogButtonBox.Cancel)
@@ -582,37 +5335,244 @@ class AddContactDialog(QDialog):
             QMessageBox.warning(self, "Uyarı", "Lütfen telefon numarası girin.")
             return
 
-        if not re.fullmatch(r"\d{7,15}", phone):
-            QMessageBox.warning(self, "Uyarı", "Telefon numarası sadece rakamlardan oluşmalı ve 7 ile 15 hane arasında olmalıdır.")
+        # İçe aktarma ve aktarma sunucusuyla aynı biçim: +<ülke kodu><numara>
+        normalized = normalize_phone(phone, self.default_code)
+        if normalized is None:
+            QMessageBox.warning(self, "Uyarı", "Geçerli bir telefon numarası girin (ör. 0555 111 22 33 veya +49 30 1234567).")
             return
 
         self.contact_name = name
-        self.contact_phone = phone
+        self.contact_phone = normalized
         self.accept()
 
 # ========== Main ==========
-def main():
-    app = QApplication(sys.argv)
+def enable_profiling(app):
+    # ChatUI oluşturulmadan önce çağrılmalı: sinyaller sarılmış slotlara bağlanır
+    PROFILER.enable()
+    PROFILER.instrument(ChatUI, PROFILED_SLOTS)
+    PROFILER.start_monitor()
+    app.aboutToQuit.connect(PROFILER.stop)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="türkline.py", description="Türkline sohbet uygulaması")
+    parser.add_argument("--profile", action="store_true",
+                        help=f"slot süreleri, G/Ç ve takılmaları {os.path.join(DATA_ROOT, PROFILE_LOG_FILE)} dosyasına yaz (panel: Ctrl+Shift+D)")
+    parser.add_argument("--theme", default=THEME, choices=sorted(THEMES), help="arayüz teması (TURKLINE_THEME)")
+    parser.add_argument("--relay", default=RELAY_ADDRESS, metavar="HOST:PORT",
+                        help="mesajları bu aktarma sunucusu üzerinden gönder/al (TURKLINE_RELAY)")
+    parser.add_argument("--sync-listen", default=SYNC_LISTEN, metavar="HOST:PORT",
+                        help="diğer cihazların eşitleme bağlantılarını bu adreste kabul et (TURKLINE_SYNC_LISTEN)")
+    # Tanınmayan argümanlar (ör. -platform) Qt'ye bırakılır
+    args, qt_args = parser.parse_known_args(sys.argv[1:] if argv is None else argv)
+
+    startup_timer = StartupTimer()
+    app = QApplication(sys.argv[:1] + qt_args)
+    apply_theme(app, args.theme)
+    if args.profile or PROFILE_ENABLED:
+        enable_profiling(app)
+
+    # Son kullanılan hesabın geçmişi, splash ve giriş ekranı açıkken arka planda
+    # okunur. Hesap başka bir süreçte açıksa önceden yüklenmez.
+    preload = None
+    last_phone = read_last_account()
+    if last_phone:
+        lock = AccountLock(account_dir(last_phone))
+        if lock.acquire():
+            loader = StoreLoader(lock.directory, country_code_of(last_phone))
+            loader.start()
+            preload = (lock, loader)
 
     splash = SplashScreen()
     splash.show()
+    app.processEvents()
+    startup_timer.mark("splash_shown")
+
+    def open_account(phone):
+        # (kilit, loader) ya da hesap başka bir süreçte açıksa None
+        nonlocal preload
+        directory = account_dir(phone)
+        if preload is not None:
+            lock, loader = preload
+            preload = None
+            if lock.directory == directory:
+                return lock, loader
+            # Kilit, önceden yüklenen store kapanınca bırakılır
+            loader.discard(lock.release)
+        lock = AccountLock(directory)
+        if not lock.acquire():
+            return None
+        adopt_legacy_data(directory)
+        loader = StoreLoader(directory, country_code_of(phone))
+        loader.start()
+        return lock, loader
 
     def start_app():
+        # Uygulama kullanılabilir olduğu anda splash kapanır
         splash.close()
-        login = LoginDialog()
-        if login.exec() == QDialog.Accepted:
-            try:
-                window = ChatUI(login.user_name, login.user_phone)
-                window.show()
-                app.window = window  # Önemli: pencerenin çöp toplamasını önler
-            except Exception as e:
-                QMessageBox.critical(None, "Hata", f"Uygulama başlatılırken hata oluştu:\n{e}")
+        while True:
+            login = LoginDialog()
+            QTimer.singleShot(0, lambda: startup_timer.mark("login_shown"))
+            if login.exec() != QDialog.Accepted:
                 app.quit()
-        else:
+                return
+            startup_timer.mark("login_accepted")
+            opened = open_account(login.user_phone)
+            if opened is not None:
+                break
+            # Hesap başka bir pencerede açık: o pencere öne getirilir, giriş ekranına dönülür
+            activated = request_activation(account_dir(login.user_phone))
+            QMessageBox.information(
+                None, "Türkline",
+                f"{login.user_phone} hesabı başka bir Türkline penceresinde zaten açık"
+                + (" ve öne getirildi." if activated else ".")
+            )
+        lock, loader = opened
+        write_last_account(login.user_phone)
+        try:
+            instance_server = InstanceServer(lock.directory)
+            window = ChatUI(login.user_name, login.user_phone, loader, startup_timer, args.relay, args.sync_listen)
+            instance_server.activated.connect(window.activate_window)
+            window.show()
+            app.window = window  # Önemli: pencerenin çöp toplamasını önler
+            app.account = (lock, instance_server)  # kilit süreç boyunca tutulur
+        except Exception as e:
+            QMessageBox.critical(None, "Hata", f"Uygulama başlatılırken hata oluştu:\n{e}")
             app.quit()
 
-    QTimer.singleShot(2000, start_app)
+    QTimer.singleShot(0, start_app)
     sys.exit(app.exec())
 
+def account_parser():
+    # Hesap dizininde çalışan alt komutların ortak seçeneği
+    account = argparse.ArgumentParser(add_help=False)
+    account.add_argument("--account", default=read_last_account(), metavar="TELEFON",
+                         help="hesabın telefon numarası, ör. +905551112233 (varsayılan: son giriş yapılan)")
+    return account
+
+
+def lock_account(parser, phone):
+    # Hesap açık bir pencerede kullanılıyorsa None
+    if not phone:
+        parser.error("--account gerekli (henüz giriş yapılmış bir hesap yok)")
+    lock = AccountLock(account_dir(phone))
+    if not lock.acquire():
+        print(f"{phone} hesabı açık bir Türkline penceresinde kullanılıyor; önce pencereyi kapatın.", file=sys.stderr)
+        return None
+    adopt_legacy_data(lock.directory)
+    return lock
+
+
+def contacts_cli(argv):
+    # Arayüz açmadan toplu kişi aktarımı: python türkline.py contacts import kisiler.vcf
+    parser = argparse.ArgumentParser(prog="türkline.py contacts", description="Toplu kişi içe/dışa aktarma")
+    account = account_parser()
+    commands = parser.add_subparsers(dest="command", required=True)
+    import_parser = commands.add_parser("import", parents=[account], help="vCard/CSV dosyasından kişi ekle")
+    import_parser.add_argument("path")
+    import_parser.add_argument("--country", default="+90", help="ülke kodu olmayan numaralar için (varsayılan: +90)")
+    export_parser = commands.add_parser("export", parents=[account], help="kişileri vCard/CSV olarak yaz")
+    export_parser.add_argument("path")
+    args = parser.parse_args(argv)
+    lock = lock_account(parser, args.account)
+    if lock is None:
+        return 1
+    store = create_store(lock.directory)
+    try:
+        contacts, messages = store.load()
+        if args.command == "import":
+            renumber_bare_contacts(store, contacts, messages, args.country)
+            added, skipped = collect_new_contacts(read_contacts_file(args.path), contacts, args.country)
+            for name, phone in added:
+                contacts.add(name, phone)
+                messages[phone] = Conversation()
+            if added:
+                store.append_many(contact_records(added))
+                store.compact(store.prepare_compact(contacts, messages))
+            print(f"{len(added)} kişi eklendi, {skipped} kayıt atlandı.")
+        else:
+            write_contacts_file(args.path, contacts)
+            print(f"{len(contacts)} kişi yazıldı: {args.path}")
+    finally:
+        store.close()
+        lock.release()
+    return 0
+
+def sync_cli(argv):
+    # Arayüz açmadan paketle eşitleme:
+    #   python türkline.py sync export dizustu.tlsync --peer <cihaz>
+    #   python türkline.py sync import masaustu.tlsync
+    parser = argparse.ArgumentParser(prog="türkline.py sync", description="Cihazlar arası mesaj eşitleme paketleri")
+    account = account_parser()
+    commands = parser.add_subparsers(dest="command", required=True)
+    export_parser = commands.add_parser("export", parents=[account], help="eşin henüz almadığı mesajları pakete yaz")
+    export_parser.add_argument("path")
+    export_parser.add_argument("--peer", metavar="CİHAZ",
+                               help="paketin gideceği cihazın kimliği; verilmezse tüm geçmiş yazılır")
+    import_parser = commands.add_parser("import", parents=[account], help="paketteki yeni mesajları ekle")
+    import_parser.add_argument("path")
+    args = parser.parse_args(argv)
+    lock = lock_account(parser, args.account)
+    if lock is None:
+        return 1
+    store = create_store(lock.directory)
+    try:
+        contacts, messages = store.load()
+        state = SyncState(lock.directory).load()
+        endpoint = SyncEndpoint(args.account, state, store, contacts, messages, store.append_many)
+        print(f"Bu cihaz: {state.device}")
+        if args.command == "export":
+            if args.peer and args.peer not in state.peers:
+                parser.error(f"bilinmeyen cihaz: {args.peer} (bilinenler: {', '.join(state.peers) or 'yok'})")
+            count = write_sync_bundle(args.path, endpoint, args.peer)
+            print(f"{count} mesaj yazıldı: {args.path}")
+        else:
+            try:
+                count = read_sync_bundle(args.path, endpoint)
+            except (OSError, ValueError) as e:
+                print(f"Paket içe aktarılamadı: {e}", file=sys.stderr)
+                return 1
+            if count:
+                store.compact(store.prepare_compact(contacts, messages))
+            print(f"{count} yeni mesaj eklendi.")
+    finally:
+        store.close()
+        lock.release()
+    return 0
+
+def relay_cli(argv):
+    # Ayrı giriş noktası: python türkline.py relay --port 8765
+    parser = argparse.ArgumentParser(prog="türkline.py relay", description="Türkline aktarma sunucusu")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=RELAY_DEFAULT_PORT)
+    parser.add_argument("--queue-limit", type=int, default=RELAY_QUEUE_LIMIT,
+                        help="çevrimdışı alıcı başına bekletilecek en fazla mesaj")
+    parser.add_argument("--accounts", metavar="PATH",
+                        help="numara/token kayıtlarını bu dosyada sakla (verilmezse sadece bellekte)")
+    args = parser.parse_args(argv)
+
+    try:
+        import resource
+        # Binlerce bağlantı için açık dosya sınırını izin verilen en üst değere çek
+        soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+        target = 65536 if hard == resource.RLIM_INFINITY else hard
+        if soft != resource.RLIM_INFINITY and soft < target:
+            resource.setrlimit(resource.RLIMIT_NOFILE, (target, hard))
+    except (ImportError, ValueError, OSError):
+        pass
+
+    server = RelayServer(args.queue_limit, args.accounts)
+    try:
+        asyncio.run(server.serve(args.host, args.port))
+    except KeyboardInterrupt:
+        pass
+    return 0
+
 if __name__ == "__main__":
+    if sys.argv[1:2] == ["contacts"]:
+        sys.exit(contacts_cli(sys.argv[2:]))
+    if sys.argv[1:2] == ["relay"]:
+        sys.exit(relay_cli(sys.argv[2:]))
+    if sys.argv[1:2] == ["sync"]:
+        sys.exit(sync_cli(sys.argv[2:]))
     main()